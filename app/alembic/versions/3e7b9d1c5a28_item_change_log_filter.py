@@ -0,0 +1,66 @@
+"""
+
+Revision ID: 3e7b9d1c5a28
+Revises: 8c4e2a6f1d93
+Create Date: 2026-10-17 21:12:08.904117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3e7b9d1c5a28'
+down_revision = '8c4e2a6f1d93'
+branch_labels = None
+depends_on = None
+
+
+# only the redis indexer consumes the change log, so changes of collections using other indexers aren't logged
+def upgrade():
+    op.execute("""
+        CREATE OR REPLACE FUNCTION log_item_inserts() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO item_change (collection_id, item_id, operation)
+            SELECT new_items.collection_id, new_items.id, 'insert'
+            FROM new_items JOIN collection ON collection.id = new_items.collection_id
+            WHERE collection._config->>'indexer' = 'redis';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION log_item_deletes() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO item_change (collection_id, item_id, operation)
+            SELECT old_items.collection_id, old_items.id, 'delete'
+            FROM old_items JOIN collection ON collection.id = old_items.collection_id
+            WHERE collection._config->>'indexer' = 'redis';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        DELETE FROM item_change USING collection
+        WHERE collection.id = item_change.collection_id AND collection._config->>'indexer' IS DISTINCT FROM 'redis'
+    """)
+
+
+def downgrade():
+    op.execute("""
+        CREATE OR REPLACE FUNCTION log_item_inserts() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO item_change (collection_id, item_id, operation)
+            SELECT collection_id, id, 'insert' FROM new_items;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION log_item_deletes() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO item_change (collection_id, item_id, operation)
+            SELECT collection_id, id, 'delete' FROM old_items;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
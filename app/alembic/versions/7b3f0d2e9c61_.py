@@ -0,0 +1,34 @@
+"""
+
+Revision ID: 7b3f0d2e9c61
+Revises: 9e2d5b7c1a48
+Create Date: 2026-10-17 14:21:07.530412
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3f0d2e9c61'
+down_revision = '9e2d5b7c1a48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # events used to create items and persons without any uniqueness guarantee, keep the oldest row of each
+    op.execute("""
+        DELETE FROM item a USING item b
+        WHERE a.collection_id = b.collection_id AND a.external_id = b.external_id AND a.id > b.id
+    """)
+    op.execute("""
+        DELETE FROM person a USING person b
+        WHERE a.collection_id = b.collection_id AND a.external_id = b.external_id AND a.id > b.id
+    """)
+    op.create_index('item_collection_external_id_idx', 'item', ['collection_id', 'external_id'], unique=True)
+    op.create_index('person_collection_external_id_idx', 'person', ['collection_id', 'external_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('person_collection_external_id_idx', table_name='person')
+    op.drop_index('item_collection_external_id_idx', table_name='item')
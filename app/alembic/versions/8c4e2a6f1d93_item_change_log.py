@@ -0,0 +1,65 @@
+"""
+
+Revision ID: 8c4e2a6f1d93
+Revises: 5f1c9a3d7e20
+Create Date: 2026-10-17 19:05:41.517209
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e2a6f1d93'
+down_revision = '5f1c9a3d7e20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('item_change',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('collection_id', sa.BigInteger(), nullable=False),
+    sa.Column('item_id', sa.BigInteger(), nullable=False),
+    sa.Column('operation', sa.String(), nullable=False),
+    sa.Column('created', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('item_change_collection_id_idx', 'item_change', ['collection_id', 'id'], unique=False)
+
+    # statement level triggers with transition tables, so that bulk inserts and deletes log their rows in one go
+    op.execute("""
+        CREATE FUNCTION log_item_inserts() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO item_change (collection_id, item_id, operation)
+            SELECT collection_id, id, 'insert' FROM new_items;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION log_item_deletes() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO item_change (collection_id, item_id, operation)
+            SELECT collection_id, id, 'delete' FROM old_items;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER item_change_insert AFTER INSERT ON item
+        REFERENCING NEW TABLE AS new_items FOR EACH STATEMENT EXECUTE FUNCTION log_item_inserts()
+    """)
+    op.execute("""
+        CREATE TRIGGER item_change_delete AFTER DELETE ON item
+        REFERENCING OLD TABLE AS old_items FOR EACH STATEMENT EXECUTE FUNCTION log_item_deletes()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER item_change_delete ON item")
+    op.execute("DROP TRIGGER item_change_insert ON item")
+    op.execute("DROP FUNCTION log_item_deletes()")
+    op.execute("DROP FUNCTION log_item_inserts()")
+    op.drop_index('item_change_collection_id_idx', table_name='item_change')
+    op.drop_table('item_change')
@@ -1,4 +1,7 @@
-from app.api.types import HealthCheck
+from app.api.types import HealthCheck, StatsResponse
+from app.core.searcher.cache import get_search_cache
+from app.core.searcher.hydration import get_hydration_cache
+from app.resources.manager import get_resources_stats
 
 from fastapi import APIRouter, HTTPException, Depends
 
@@ -9,3 +12,13 @@ router = APIRouter()
 async def health(
 ) -> HealthCheck:
     return HealthCheck(message="hello world")
+
+
+@router.get("/api/stats", response_model=StatsResponse)
+async def stats(
+) -> StatsResponse:
+    return StatsResponse(
+        hydration_cache=get_hydration_cache().stats(),
+        search_cache=get_search_cache().stats(),
+        pools=get_resources_stats()
+    )
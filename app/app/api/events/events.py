@@ -11,9 +11,12 @@ from app.api.events.types import (
     EventsIngestResponse,
     CollectionEventsResetResponse,
 )
+from app.api.ingest.types import IngestJobResponse
+from app.core.ingest import IngestJob, stream_ingest
+from app.core.types import SimpleEvent
 from app.tasks.events import ingest_events, cleanup_events
 from more_itertools import batched
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 
 router = APIRouter()
 
@@ -39,6 +42,22 @@ def events_ingest(
     )
 
 
+@router.post("/api/events/stream", response_model=IngestJobResponse)
+async def events_stream_ingest(
+        request: Request, collection: str, db: Session = Depends(get_database),
+        organization: Organization = Depends(get_organization),
+) -> IngestJobResponse:
+    collection = m.Collection.objects(db).get_or_create(collection, organization)
+    job = await IngestJob.create("events", collection.name)
+
+    await stream_ingest(
+        request.stream(), request.headers.get("content-encoding") == "gzip", SimpleEvent, job,
+        lambda batch: ingest_events.delay(collection.id, batch, job_id=job.id)
+    )
+
+    return IngestJobResponse(**await job.get())
+
+
 @router.delete("/api/events", response_model=CollectionEventsResetResponse)
 def events_delete(
         delete_request: CollectionDeleteRequest, db: Session = Depends(get_database)
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, HTTPException
+
+from app.api.ingest.types import IngestJobResponse
+from app.core.ingest import IngestJob
+
+router = APIRouter()
+
+
+@router.get("/api/ingest/jobs/{job_id}", response_model=IngestJobResponse)
+async def ingest_job(job_id: str) -> IngestJobResponse:
+    job = await IngestJob(job_id).get()
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Ingest job {job_id} not found")
+
+    return IngestJobResponse(**job)
@@ -0,0 +1,15 @@
+from typing import List
+
+from pydantic.main import BaseModel
+
+
+class IngestJobResponse(BaseModel):
+    id: str
+    kind: str
+    collection: str
+    status: str
+    received: int
+    invalid: int
+    scheduled: int
+    processed: int
+    errors: List[str] = []
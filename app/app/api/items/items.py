@@ -11,9 +11,12 @@ from app.api.items.types import (
     ItemsIngestResponse,
     ItemsDeletionResponse,
 )
+from app.api.ingest.types import IngestJobResponse
+from app.core.ingest import IngestJob, stream_ingest
+from app.core.types import SimpleItem
 from app.tasks.items import ingest_items, delete_items
 from more_itertools import batched
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 
 from app.utils.base import chunks
 
@@ -44,6 +47,22 @@ async def items_ingest(
     )
 
 
+@router.post("/api/items/stream", response_model=IngestJobResponse)
+async def items_stream_ingest(
+        request: Request, collection: str, recalculate_vectors: bool = False, db: Session = Depends(get_database),
+        organization: Organization = Depends(get_organization),
+) -> IngestJobResponse:
+    collection = m.Collection.objects(db).get_or_create(collection, organization)
+    job = await IngestJob.create("items", collection.name)
+
+    await stream_ingest(
+        request.stream(), request.headers.get("content-encoding") == "gzip", SimpleItem, job,
+        lambda batch: ingest_items.delay(collection.id, batch, recalculate_vectors, job_id=job.id)
+    )
+
+    return IngestJobResponse(**await job.get())
+
+
 @router.delete("/api/items", response_model=ItemsDeletionResponse)
 async def items_delete(
         delete_request: ItemsDeletionRequest, db: Session = Depends(get_database)
@@ -2,4 +2,9 @@ from pydantic import BaseModel
 
 
 class HealthCheck(BaseModel):
-    message: str
\ No newline at end of file
+    message: str
+
+class StatsResponse(BaseModel):
+    hydration_cache: dict
+    search_cache: dict
+    pools: dict
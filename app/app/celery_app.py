@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 
 celery_app = Celery("nextlike", broker="redis://redis:6379/0")
 celery_app.conf.update(
@@ -13,20 +14,8 @@ celery_app.autodiscover_tasks(["app.tasks.events"])
 celery_app.autodiscover_tasks(["app.tasks.beat"])
 
 celery_app.conf.beat_schedule = {
-    "cleanup_events": {
-        "task": "app.tasks.beat.cleanup_events",
-        "schedule": 3600
-    },
-    "cleanup_search_history": {
-        "task": "app.tasks.beat.cleanup_search_history",
-        "schedule": 3600
-    },
-    "cleanup_lone_person_events": {
-        "task": "app.tasks.beat.cleanup_lone_person_events",
-        "schedule": 3600
-    },
-    "cleanup_events_limit_per_user": {
-        "task": "app.tasks.beat.cleanup_events_limit_per_user",
+    "apply_retention": {
+        "task": "app.tasks.beat.apply_retention",
         "schedule": 60 * 10
     },
     "indexers_cleanup": {
@@ -36,7 +25,28 @@ celery_app.conf.beat_schedule = {
     "clean_dirty_items": {
         "task": "app.tasks.beat.clean_dirty_items",
         "schedule": 10
+    },
+    "update_item_cooccurrences": {
+        "task": "app.tasks.beat.update_item_cooccurrences",
+        "schedule": 60 * 5
+    },
+    "update_item_similarities": {
+        "task": "app.tasks.beat.update_item_similarities",
+        "schedule": 3600 * 6
     }
 }
 
 CELERY_ACCEPT_CONTENT = ["pickle"]
+
+
+# every worker process runs its tasks on one long lived loop, which owns the process' pools
+@worker_process_init.connect
+def init_worker_resources(**kwargs):
+    from app.resources.manager import init_resources, run_async
+    run_async(init_resources())
+
+
+@worker_process_shutdown.connect
+def close_worker_resources(**kwargs):
+    from app.resources.manager import close_resources, run_async
+    run_async(close_resources())
@@ -16,7 +16,7 @@ from app.core.types import (
     AggregationFieldConfig,
 )
 from app.settings import get_settings
-from app.utils.base import listify, stable_hash
+from app.utils.base import listify
 from app.utils.timeit import Timeit
 
 
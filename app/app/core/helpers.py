@@ -1,15 +1,22 @@
+from datetime import datetime
 from typing import List, Tuple
 
 from app.resources.database import m
-from app.utils.base import time_string_to_datetime_from_now
+from app.utils.base import time_string_to_datetime_from_now, parse_time_string
 
 
 def get_vectors_of_events_for_user(
-        db, external_person_ids, time, limit
+        db, external_person_ids, time, limit, recency_half_life=None
 ) -> List[Tuple[List[int], float]]:
-    external_item_ids = get_external_item_ids_of_events_for_user(
-        db=db, external_person_ids=external_person_ids, time=time, limit=limit
-    )
+    if recency_half_life:
+        external_item_ids = get_recency_weighted_item_ids_of_events_for_user(
+            db=db, external_person_ids=external_person_ids, time=time, limit=limit,
+            half_life_seconds=parse_time_string(recency_half_life)
+        )
+    else:
+        external_item_ids = get_external_item_ids_of_events_for_user(
+            db=db, external_person_ids=external_person_ids, time=time, limit=limit
+        )
     weights = {item[0]: item[1] for item in external_item_ids}
 
     items = m.Item.objects(db).filter(
@@ -35,3 +42,30 @@ def get_external_item_ids_of_events_for_user(
         events = events.limit(limit)
 
     return [(event.item_external_id, event.weight) for event in events]
+
+
+def get_recency_weighted_item_ids_of_events_for_user(
+        db, external_person_ids, half_life_seconds, time=None, limit=None
+) -> List[Tuple[str, float]]:
+    events = (
+        m.Event.objects(db)
+        .select(m.Event.item_external_id, m.Event.weight, m.Event.created)
+        .filter(m.Event.person_external_id.in_(external_person_ids))
+        .order_by(m.Event.created.desc())
+    )
+
+    if time:
+        events = events.filter(m.Event.created > time_string_to_datetime_from_now(time))
+
+    if limit:
+        events = events.limit(limit)
+
+    now = datetime.now()
+
+    weights = {}
+    for event in events:
+        age_seconds = max((now - event.created).total_seconds(), 0) if event.created else 0
+        decayed_weight = (event.weight or 0) * 0.5 ** (age_seconds / half_life_seconds)
+        weights[event.item_external_id] = weights.get(event.item_external_id, 0) + decayed_weight
+
+    return list(weights.items())
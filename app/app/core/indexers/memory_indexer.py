@@ -0,0 +1,569 @@
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func
+
+from app.core.indexers.indexer import Indexer
+from app.core.indexers.sql_indexer import SQLIndexer
+from app.core.indexers.stemmer.generic import stem
+from app.core.indexers.types import IndexerResultItem
+from app.resources.database import m
+from app.settings import get_settings
+from app.utils.base import listify, stream_query_per_chunk
+from app.utils.logging import log
+
+_indexes: Dict[int, "MemoryIndex"] = {}
+_build_locks: Dict[int, threading.Lock] = {}
+_refreshing = set()
+_registry_lock = threading.Lock()
+
+
+def get_build_lock(collection_id) -> threading.Lock:
+    with _registry_lock:
+        return _build_locks.setdefault(collection_id, threading.Lock())
+
+
+class MemoryIndex(object):
+    def __init__(self, dims, stemmer=None):
+        self.dims = dims
+        self.stemmer = stemmer
+        # guards the index of a single collection, so that searches of the others never wait on it
+        self.lock = threading.RLock()
+        self.size = 0
+        self.matrix = np.zeros((1024, dims), dtype=np.float32)
+        self.alive = np.zeros(1024, dtype=bool)
+        self.has_vector = np.zeros(1024, dtype=bool)
+        self.ids = np.zeros(1024, dtype=np.int64)
+        self.external_ids = []
+        self.descriptions = []
+        self.hashes = []
+        self.terms = []
+        self.fields = []
+        self.rows = {}
+        # sum of the id hashes of the live items, compared with postgres to find the gone ones, see Item.get_id_hash
+        self.id_hashes = 0
+
+        self.centroids = None
+        self.assignments = np.zeros(1024, dtype=np.int32)
+        self.lists = []
+        self.lists_cache = {}
+        self.trained_on = 0
+
+        self.watermark = None
+        self.last_refresh = 0
+        self.stale = False
+
+    def __len__(self):
+        return int(self.alive[:self.size].sum())
+
+    def grow(self, needed):
+        capacity = self.matrix.shape[0]
+        if needed <= capacity:
+            return
+
+        while capacity < needed:
+            capacity *= 2
+
+        for name in ["matrix", "alive", "has_vector", "ids", "assignments"]:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def upsert(self, item_id, external_id, description, item_hash, terms, fields, vector):
+        row = self.rows.get(item_id)
+        if row is None:
+            row = self.size
+            self.grow(row + 1)
+            self.size += 1
+            self.rows[item_id] = row
+            self.id_hashes += m.Item.get_id_hash(item_id)
+            self.external_ids.append(external_id)
+            self.descriptions.append(description)
+            self.hashes.append(item_hash)
+            self.terms.append(terms)
+            self.fields.append(fields)
+        else:
+            self.external_ids[row] = external_id
+            self.descriptions[row] = description
+            self.hashes[row] = item_hash
+            self.terms[row] = terms
+            self.fields[row] = fields
+
+        self.ids[row] = item_id
+        self.alive[row] = True
+
+        if vector is not None:
+            vector = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            self.matrix[row] = vector / norm if norm else vector
+            self.has_vector[row] = True
+        else:
+            self.matrix[row] = 0
+            self.has_vector[row] = False
+
+        if self.centroids is not None and self.has_vector[row]:
+            self.assign(np.array([row]))
+
+    def remove(self, item_id):
+        row = self.rows.pop(item_id, None)
+        if row is not None:
+            self.id_hashes -= m.Item.get_id_hash(item_id)
+            self.alive[row] = False
+            self.fields[row] = None
+            self.terms[row] = None
+
+    def compact(self):
+        live_rows = np.flatnonzero(self.alive[:self.size])
+        if len(live_rows) == self.size:
+            return
+
+        self.matrix[:len(live_rows)] = self.matrix[live_rows]
+        self.has_vector[:len(live_rows)] = self.has_vector[live_rows]
+        self.ids[:len(live_rows)] = self.ids[live_rows]
+        self.external_ids = [self.external_ids[row] for row in live_rows]
+        self.descriptions = [self.descriptions[row] for row in live_rows]
+        self.hashes = [self.hashes[row] for row in live_rows]
+        self.terms = [self.terms[row] for row in live_rows]
+        self.fields = [self.fields[row] for row in live_rows]
+        self.size = len(live_rows)
+        self.alive[:self.size] = True
+        self.alive[self.size:] = False
+        self.rows = {int(item_id): row for row, item_id in enumerate(self.ids[:self.size])}
+        self.centroids = None
+        self.trained_on = 0
+
+    def train(self, iterations=10):
+        vector_rows = np.flatnonzero(self.alive[:self.size] & self.has_vector[:self.size])
+        nlist = max(1, int(np.sqrt(len(vector_rows))))
+
+        rng = np.random.default_rng(0)
+        sample = vector_rows
+        if len(sample) > nlist * 256:
+            sample = rng.choice(vector_rows, nlist * 256, replace=False)
+
+        data = self.matrix[sample]
+        centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[labels == c]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    centroids[c] = centroid / norm if norm else centroid
+
+        self.centroids = centroids
+        self.lists = [[] for _ in range(nlist)]
+        self.lists_cache = {}
+        self.trained_on = len(vector_rows)
+        self.assign(vector_rows)
+
+    def assign(self, rows, batch_size=4096):
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            labels = np.argmax(self.matrix[batch] @ self.centroids.T, axis=1)
+            self.assignments[batch] = labels
+            for row, label in zip(batch, labels):
+                self.lists[label].append(row)
+                self.lists_cache.pop(label, None)
+
+    def maybe_train(self):
+        vectors_count = int((self.alive[:self.size] & self.has_vector[:self.size]).sum())
+        if vectors_count < get_settings().MEMORY_INDEXER_IVF_MIN_ITEMS:
+            self.centroids = None
+            return
+
+        if self.centroids is None or vectors_count > self.trained_on * 2:
+            self.train()
+
+    def get_list(self, label):
+        if label not in self.lists_cache:
+            rows = np.unique(np.array(self.lists[label], dtype=np.int64))
+            rows = rows[self.assignments[rows] == label]
+            self.lists[label] = rows.tolist()
+            self.lists_cache[label] = rows
+        return self.lists_cache[label]
+
+    def candidate_rows(self, vector, nprobe):
+        if self.centroids is None:
+            return np.flatnonzero(self.alive[:self.size] & self.has_vector[:self.size])
+
+        probe = np.argsort(-(self.centroids @ vector))[:nprobe]
+        rows = np.concatenate([self.get_list(label) for label in probe])
+        return rows[self.alive[rows] & self.has_vector[rows]]
+
+
+class MemoryIndexer(Indexer):
+    def __init__(self, db, collection, index_embeddings=True):
+        super(MemoryIndexer, self).__init__(db, collection)
+        self.index_embeddings = index_embeddings
+        self.embeddings_calculator = collection.get_embeddings_calculator()
+        self.vectors_size = self.embeddings_calculator.get_size() if self.embeddings_calculator else 0
+
+    def is_current(self, index):
+        return index is not None and index.dims == max(self.vectors_size, 1) and \
+            index.stemmer == self.collection.config.stemmer
+
+    # searches are the only path that loads a collection, and only wait for it the first time. Later loads build the
+    # replacement in a background thread, while searches keep using the previous index as long as its vectors fit the
+    # collection, or postgres otherwise
+    def get_index(self) -> Optional[MemoryIndex]:
+        index = _indexes.get(self.collection.id)
+        if index is None:
+            with get_build_lock(self.collection.id):
+                index = _indexes.get(self.collection.id)
+                if index is None:
+                    index = self.build()
+        elif index.stale or not self.is_current(index):
+            self.schedule_background(rebuild_in_background)
+            if index.dims != max(self.vectors_size, 1):
+                return None
+        elif time.time() - index.last_refresh > get_settings().MEMORY_INDEXER_REFRESH_SECONDS:
+            self.schedule_background(refresh_in_background, index)
+
+        return index
+
+    def build(self) -> MemoryIndex:
+        index = MemoryIndex(max(self.vectors_size, 1), self.collection.config.stemmer)
+        self.load(index)
+        _indexes[self.collection.id] = index
+        return index
+
+    def schedule_background(self, target, *args):
+        with _registry_lock:
+            if self.collection.id in _refreshing:
+                return
+            _refreshing.add(self.collection.id)
+
+        threading.Thread(target=target, args=(self.collection.id,) + args, daemon=True).start()
+
+    def get_items_query(self):
+        columns = [m.Item.id, m.Item.external_id, m.Item.description, m.Item.description_hash, m.Item.fields]
+        if self.vectors_size:
+            columns.append(getattr(m.Item, "vectors_%s" % self.vectors_size).label("vector"))
+
+        return m.Item.objects(self.db).select(*columns).filter(m.Item.collection_id == self.collection.id)
+
+    def get_db_time(self):
+        # the watermark is taken from the clock that stamps last_update, never from the local one
+        return self.db.execute(func.localtimestamp().select()).scalar()
+
+    def add_rows(self, index, rows):
+        stemmer = self.collection.config.stemmer
+        for row in rows:
+            stemmed_description = stem(stemmer, row.description or "")
+            index.upsert(
+                item_id=row.id,
+                external_id=row.external_id,
+                description=row.description or "",
+                item_hash=row.description_hash,
+                terms=set(stemmed_description.lower().split()),
+                fields=row.fields or {},
+                vector=getattr(row, "vector", None),
+            )
+
+    def load(self, index):
+        log("info", "MemoryIndexer[Loading collection %s into memory]" % self.collection.name)
+
+        index.watermark = self.get_db_time()
+        for chunk in stream_query_per_chunk(self.get_items_query(), 5000):
+            self.add_rows(index, chunk)
+
+        index.maybe_train()
+        index.last_refresh = time.time()
+
+        log("info", "MemoryIndexer[Loaded %s items of collection %s]" % (len(index), self.collection.name))
+
+    def refresh(self, index):
+        now = self.get_db_time()
+
+        # rows are stamped when their statement starts, so the ones committing around the previous refresh are read
+        # again rather than missed
+        overlap = timedelta(seconds=get_settings().MEMORY_INDEXER_REFRESH_OVERLAP_SECONDS)
+        updated = self.get_items_query().filter(m.Item.last_update >= index.watermark - overlap).all()
+
+        # deleting items and adding as many others keeps the count, but not the sum of the id hashes
+        db_checksum = m.Item.objects(self.db).get_id_checksum(self.collection.id)
+
+        with index.lock:
+            self.add_rows(index, updated)
+            index.watermark = now
+            checksum = (len(index), index.id_hashes)
+
+        if db_checksum != checksum:
+            self.remove_gone_items(index)
+
+        with index.lock:
+            index.maybe_train()
+            index.last_refresh = time.time()
+
+    def remove_gone_items(self, index):
+        existing_db_item_ids = set(
+            item.id for item in m.Item.objects(self.db)
+            .select(m.Item.id)
+            .filter(m.Item.collection_id == self.collection.id)
+            .all()
+        )
+
+        with index.lock:
+            gone_item_ids = [item_id for item_id in index.rows.keys() if item_id not in existing_db_item_ids]
+            for item_id in gone_item_ids:
+                index.remove(item_id)
+
+            if index.size > 2 * max(len(index), 1):
+                index.compact()
+                index.maybe_train()
+
+        log("info", "MemoryIndexer[Removed %s gone items from memory]" % len(gone_item_ids))
+
+        return existing_db_item_ids
+
+    # the paths below run in celery workers as well, which hold no indexes, so they only ever touch an index this
+    # process has already loaded for its searches
+
+    async def recreate(self):
+        log("info", "MemoryIndexer[Recreating index for collection %s]" % self.collection.name)
+        index = _indexes.get(self.collection.id)
+        if index is not None:
+            index.stale = True
+
+    async def cleanup(self):
+        index = _indexes.get(self.collection.id)
+        if index is None:
+            return
+
+        existing_db_item_ids = self.remove_gone_items(index)
+
+        missing_item_ids = [item_id for item_id in existing_db_item_ids if item_id not in index.rows]
+        if missing_item_ids:
+            log("info", "MemoryIndexer[Indexing %s missing items to memory]" % len(missing_item_ids))
+            rows = self.get_items_query().filter(m.Item.id.in_(missing_item_ids)).all()
+            with index.lock:
+                self.add_rows(index, rows)
+                index.maybe_train()
+
+    @classmethod
+    async def cleanup_all(cls, db):
+        memory_indexer_collection_ids = set(
+            collection.id
+            for collection in m.Collection.objects(db).filter().all()
+            if collection.config.indexer == "memory"
+        )
+
+        for collection_id in list(_indexes.keys()):
+            if collection_id not in memory_indexer_collection_ids:
+                log("info", "MemoryIndexer[Dropping gone collection %s from memory]" % collection_id)
+                _indexes.pop(collection_id, None)
+
+    async def index_items(self, items=None):
+        if items is None:
+            await self.recreate()
+            return
+
+        index = _indexes.get(self.collection.id)
+        if index is None or not items:
+            return
+
+        rows = self.get_items_query().filter(m.Item.id.in_([item.id for item in items])).all()
+        with index.lock:
+            self.add_rows(index, rows)
+            index.maybe_train()
+
+        log("info", "MemoryIndexer[Indexed %s items of collection %s]" % (len(items), self.collection.name))
+
+    async def search(
+            self,
+            filters=None,
+            text_search_query=None,
+            text_search_similarity_function=None,
+            vector=None,
+            limit=10,
+            offset=0,
+            exclude_external_ids=None,
+            raw_query=None,
+            score_threshold=0
+    ) -> List[IndexerResultItem]:
+        index = self.get_index()
+        if index is None:
+            log("info", "MemoryIndexer[Searching collection %s in postgres while it's rebuilt]" % self.collection.name)
+            return await SQLIndexer(self.db, self.collection).search(
+                filters=filters, text_search_query=text_search_query,
+                text_search_similarity_function=text_search_similarity_function, vector=vector, limit=limit,
+                offset=offset, exclude_external_ids=exclude_external_ids, raw_query=raw_query,
+                score_threshold=score_threshold
+            )
+
+        with index.lock:
+            if not index.size:
+                return []
+
+            exclude_external_ids = set(map(str, exclude_external_ids or []))
+
+            def is_valid(row):
+                return index.alive[row] and \
+                    index.external_ids[row] not in exclude_external_ids and \
+                    (not filters or self.matches(filters, index.fields[row]))
+
+            if vector is not None and len(vector):
+                vector = np.asarray(vector, dtype=np.float32)
+                if len(vector) != index.dims:
+                    raise ValueError("Query vector must be of length %s" % index.dims)
+
+                norm = np.linalg.norm(vector)
+                if norm:
+                    vector = vector / norm
+
+                nprobe = get_settings().MEMORY_INDEXER_IVF_NPROBE
+                rows = index.candidate_rows(vector, nprobe)
+                similarities = index.matrix[rows] @ vector
+                ranked = self.select(rows, similarities, is_valid, limit + offset, score_threshold)
+
+                if len(ranked) < limit + offset and index.centroids is not None:
+                    rows = index.candidate_rows(vector, len(index.centroids))
+                    similarities = index.matrix[rows] @ vector
+                    ranked = self.select(rows, similarities, is_valid, limit + offset, score_threshold)
+            elif text_search_query:
+                query_terms = set(stem(self.collection.config.stemmer, text_search_query).lower().split())
+                rows = np.flatnonzero(index.alive[:index.size])
+                similarities = np.array([
+                    len(query_terms & index.terms[row]) / len(query_terms) if query_terms else 0
+                    for row in rows
+                ], dtype=np.float32)
+                keep = similarities > 0
+                ranked = self.select(rows[keep], similarities[keep], is_valid, limit + offset, score_threshold)
+            else:
+                rows = np.flatnonzero(index.alive[:index.size])
+                ranked = self.select(rows, np.ones(len(rows), dtype=np.float32), is_valid, limit + offset,
+                                     score_threshold)
+
+            return [IndexerResultItem(
+                id=str(index.ids[row]),
+                description=index.descriptions[row],
+                similarity=float(similarity),
+                hash=index.hashes[row]
+            ) for row, similarity in ranked[offset:offset + limit]]
+
+    def select(self, rows, similarities, is_valid, count, score_threshold):
+        ranked = []
+
+        order = np.argsort(-similarities, kind="stable")
+        for position in order:
+            similarity = similarities[position]
+            if score_threshold and similarity < score_threshold:
+                break
+
+            row = rows[position]
+            if is_valid(row):
+                ranked.append((row, similarity))
+                if len(ranked) >= count:
+                    break
+
+        return ranked
+
+    def matches(self, filters, fields):
+        for key, value in filters.items():
+            if key in ["$and", "and"]:
+                if not all(self.matches(sub_filter, fields) for sub_filter in value):
+                    return False
+            elif key in ["$or", "or"]:
+                if not any(self.matches(sub_filter, fields) for sub_filter in value):
+                    return False
+            elif key in ["$not", "not"]:
+                if self.matches(value, fields):
+                    return False
+            elif not self.matches_field(fields.get(key), value):
+                return False
+
+        return True
+
+    def matches_field(self, field_value, value):
+        if isinstance(value, dict):
+            for op, op_value in value.items():
+                if op == "not":
+                    if self.matches_field(field_value, op_value):
+                        return False
+                elif op in ["gte", "lte", "eq"]:
+                    try:
+                        number = float(field_value)
+                    except (TypeError, ValueError):
+                        return False
+
+                    if op == "gte" and not number >= float(op_value):
+                        return False
+                    elif op == "lte" and not number <= float(op_value):
+                        return False
+                    elif op == "eq" and not number == float(op_value):
+                        return False
+                elif op == "contains":
+                    field_values = set(map(self.normalize_value, listify(field_value, ignore_none=True)))
+                    if not set(map(self.normalize_value, listify(op_value))) <= field_values:
+                        return False
+                elif op == "in":
+                    if self.normalize_value(field_value) not in set(map(self.normalize_value, listify(op_value))):
+                        return False
+                elif op == "overlaps":
+                    field_values = set(map(self.normalize_value, listify(field_value, ignore_none=True)))
+                    if not field_values & set(map(self.normalize_value, listify(op_value))):
+                        return False
+
+            return True
+        elif isinstance(field_value, list):
+            return self.normalize_value(value) in set(map(self.normalize_value, field_value))
+        else:
+            return self.normalize_value(field_value) == self.normalize_value(value)
+
+    def normalize_value(self, value):
+        if isinstance(value, bool):
+            return str(value).lower()
+        return str(value)
+
+
+def rebuild_in_background(collection_id):
+    from app.db.session import Database
+
+    try:
+        with Database() as db, get_build_lock(collection_id):
+            collection = m.Collection.objects(db).get(collection_id)
+            if collection is not None:
+                MemoryIndexer(db, collection).build()
+    except Exception as e:
+        log("error", "MemoryIndexer[Rebuilding collection %s failed: %s]" % (collection_id, e))
+    finally:
+        with _registry_lock:
+            _refreshing.discard(collection_id)
+
+
+def refresh_in_background(collection_id, index):
+    from app.db.session import Database
+
+    try:
+        with Database() as db:
+            collection = m.Collection.objects(db).get(collection_id)
+            if collection is not None:
+                MemoryIndexer(db, collection).refresh(index)
+    except Exception as e:
+        log("error", "MemoryIndexer[Refreshing collection %s failed: %s]" % (collection_id, e))
+    finally:
+        with _registry_lock:
+            _refreshing.discard(collection_id)
+
+
+# loads the memory collections when the api starts, so that their first searches don't wait for the load
+def warm_up_in_background():
+    def warm_up():
+        from app.db.session import Database
+
+        with Database() as db:
+            for collection in m.Collection.objects(db).filter().all():
+                if collection.config.indexer == "memory":
+                    try:
+                        MemoryIndexer(db, collection).get_index()
+                    except Exception as e:
+                        log("error", "MemoryIndexer[Warming up collection %s failed: %s]" % (collection.name, e))
+
+    threading.Thread(target=warm_up, daemon=True).start()
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import numpy as np
+
+
+def encode_vector(vector, dtype) -> memoryview:
+    # pgvector already hands out float32 arrays, which are written as they are instead of being copied into bytes.
+    # The view is cast to bytes, as redis takes the length of a memoryview as the length of the argument
+    return memoryview(np.ascontiguousarray(vector, dtype=dtype)).cast("B")
+
+
+# keeps up to max_in_flight pipelines executing concurrently on the client's connection pool, each holding about
+# max_pipeline_bytes of commands
+class RedisBulkLoader(object):
+    def __init__(self, client, max_pipeline_bytes=4 * 1024 * 1024, max_in_flight=4):
+        self.client = client
+        self.max_pipeline_bytes = max_pipeline_bytes
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = set()
+        self.pipe = None
+        self.pipe_bytes = 0
+        self.error = None
+        self.began = time.monotonic()
+        self.stats = {"commands": 0, "bytes": 0, "pipelines": 0, "seconds": 0.0}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        if value is None:
+            await self.flush()
+        elif self.in_flight:
+            await asyncio.gather(*self.in_flight, return_exceptions=True)
+
+    async def run_script(self, script, keys, args):
+        if self.error:
+            raise self.error
+
+        if self.pipe is None:
+            self.pipe = self.client.pipeline(transaction=False)
+
+        await script(keys=keys, args=args, client=self.pipe)
+        self.pipe_bytes += sum(len(key) for key in keys) + sum(len(arg) for arg in args)
+        self.stats["commands"] += 1
+
+        if self.pipe_bytes >= self.max_pipeline_bytes:
+            await self.send()
+
+    async def send(self):
+        if self.pipe is None:
+            return
+
+        pipe, pipe_bytes = self.pipe, self.pipe_bytes
+        self.pipe, self.pipe_bytes = None, 0
+
+        await self.slots.acquire()
+        task = asyncio.ensure_future(self.execute(pipe, pipe_bytes))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    async def execute(self, pipe, pipe_bytes):
+        try:
+            await pipe.execute()
+            self.stats["bytes"] += pipe_bytes
+            self.stats["pipelines"] += 1
+        except Exception as e:
+            # kept instead of raised, as the task may have left in_flight before anyone awaits it
+            self.error = self.error or e
+        finally:
+            self.slots.release()
+
+    async def flush(self):
+        await self.send()
+        if self.in_flight:
+            await asyncio.gather(*self.in_flight)
+        if self.error:
+            raise self.error
+
+        self.stats["seconds"] = time.monotonic() - self.began
+        return self.stats
@@ -1,14 +1,120 @@
+import asyncio
+import time
+
 import numpy as np
+from sqlalchemy.orm import undefer
+from redis.exceptions import ResponseError
 from redis.commands.search.query import Query
 from redis.commands.search.field import TagField, VectorField, TextField, NumericField
 from redis.commands.search.indexDefinition import IndexDefinition, IndexType
 from app.core.indexers.indexer import Indexer
+from app.core.indexers.redis_bulk_loader import RedisBulkLoader, encode_vector
 from app.core.indexers.stemmer.generic import stem
 from app.core.indexers.types import IndexerResultItem
 from app.resources.database import m
 from app.resources.rdb import get_redis
-from app.utils.base import chunks, clear, listify, query_per_chunk
+from app.settings import get_settings
+from app.utils.base import chunks, clear, listify, keyset_query_per_chunk
 from app.utils.logging import log
+from app.utils.temporal_lock import RedisTemporalLock
+
+VECTOR_DTYPES = {
+    "FLOAT32": np.float32,
+    "FLOAT16": np.float16,
+}
+
+# item ids are drawn from [0, 10^12], see default_ns_id
+ID_SPACE = 10 ** 12 + 1
+CHECKSUM_RANGES = 4096
+
+# generations of every collection, mapped to the time they were replaced, or 0 while they are in use
+REGISTRY_KEY = "collection_index:registry"
+
+# documents are written and removed through these scripts, which keep the count and the sum of the id hashes of every
+# range of ids in the generation's checksums hash, so that they can be compared with postgres without scanning redis
+INDEX_DOCUMENT_SCRIPT = """
+local created = redis.call("EXISTS", KEYS[1]) == 0
+redis.call("HSET", KEYS[1], unpack(ARGV, 3))
+if created then
+    redis.call("HINCRBY", KEYS[2], ARGV[1] .. ":count", 1)
+    redis.call("HINCRBY", KEYS[2], ARGV[1] .. ":sum", ARGV[2])
+end
+"""
+
+DELETE_DOCUMENT_SCRIPT = """
+if redis.call("UNLINK", KEYS[1]) == 1 then
+    redis.call("HINCRBY", KEYS[2], ARGV[1] .. ":count", -1)
+    redis.call("HINCRBY", KEYS[2], ARGV[1] .. ":sum", ARGV[2])
+end
+"""
+
+
+# searches go through the collection_{id} alias, which points to the live generation of versioned indexes. Generation 0
+# is the unversioned index that predates them and holds the alias name itself
+def get_index_name(collection_id, generation):
+    if generation == 0:
+        return "collection_%s" % collection_id
+    return "collection_%s_v%s" % (collection_id, generation)
+
+
+def get_doc_prefix(collection_id, generation):
+    if generation == 0:
+        return "d:%s:" % collection_id
+    return "d:%sv%s:" % (collection_id, generation)
+
+
+def get_generations_key(collection_id):
+    return "collection_index:%s" % collection_id
+
+
+def get_checksums_key(collection_id, generation):
+    return "checksums:%s" % get_doc_prefix(collection_id, generation)
+
+
+def get_id_range(item_id):
+    return item_id * CHECKSUM_RANGES // ID_SPACE
+
+
+def get_id_range_bounds(id_range):
+    return -(-id_range * ID_SPACE // CHECKSUM_RANGES), -(-(id_range + 1) * ID_SPACE // CHECKSUM_RANGES)
+
+
+async def get_generations(client, collection_id):
+    generations = await client.hgetall(get_generations_key(collection_id))
+    building = int(generations[b"building"]) if b"building" in generations else None
+    if b"live" in generations:
+        return int(generations[b"live"]), building
+
+    try:
+        await client.ft(get_index_name(collection_id, 0)).info()
+        return 0, building
+    except ResponseError:
+        return None, building
+
+
+async def drop_generation(client, collection_id, generation):
+    if generation != 0:
+        try:
+            await client.ft(get_index_name(collection_id, generation)).dropindex()
+        except ResponseError:
+            pass
+
+    # documents are unlinked in small chunks rather than along with the index, which would block redis meanwhile
+    deleted = 0
+    cursor = 0
+    while True:
+        cursor, keys = await client.scan(cursor=cursor, match=f"{get_doc_prefix(collection_id, generation)}*", count=500)
+        if keys:
+            await client.unlink(*keys)
+            deleted += len(keys)
+        if cursor == 0:
+            break
+
+    await client.unlink(get_checksums_key(collection_id, generation))
+    await client.hdel(REGISTRY_KEY, f"{collection_id}:{generation}")
+
+    log("info", "RedisIndexer[Dropped generation %s of collection %s, %s documents]" % (
+        generation, collection_id, deleted))
 
 
 class RedisIndexer(Indexer):
@@ -16,16 +122,20 @@ class RedisIndexer(Indexer):
         super(RedisIndexer, self).__init__(db, collection)
 
         self.index_name = "collection_%s" % collection.id
-        self.doc_name_prefix = "d:%s:" % collection.id
+        self.generations_key = get_generations_key(collection.id)
         self.index_embeddings = index_embeddings
         self.embeddings_calculator = collection.get_embeddings_calculator()
+        self.vector_config = collection.config.redis_vector_index
+        self.vector_dtype = VECTOR_DTYPES[self.vector_config.type]
 
         self.client = get_redis()
+        self.index_document_script = self.client.register_script(INDEX_DOCUMENT_SCRIPT)
+        self.delete_document_script = self.client.register_script(DELETE_DOCUMENT_SCRIPT)
 
     def normalize_field(self, field_name):
         return field_name.replace(" ", "_").replace("-", "_").replace(".", "_").lower()
 
-    async def create_index(self):
+    async def create_index(self, generation):
         fields = (
             m.ItemsField.objects(self.db)
             .filter(m.ItemsField.collection_id == self.collection.id)
@@ -35,21 +145,24 @@ class RedisIndexer(Indexer):
         index_fields = [
             TextField("description", no_stem=True),
             TagField("_external_id"),
+            NumericField("_id", sortable=True),
         ]
 
         vectors_size = self.embeddings_calculator.get_size() if self.embeddings_calculator else 0
         if vectors_size:
-            index_fields.append(
-                VectorField(
-                    "embedding",
-                    "FLAT",
-                    {
-                        "TYPE": "FLOAT32",
-                        "DIM": vectors_size,
-                        "DISTANCE_METRIC": "COSINE",
-                    },
-                )
-            )
+            attributes = {
+                "TYPE": self.vector_config.type,
+                "DIM": vectors_size,
+                "DISTANCE_METRIC": self.vector_config.distance_metric,
+            }
+            if self.vector_config.algorithm == "HNSW":
+                attributes.update({
+                    "M": self.vector_config.m,
+                    "EF_CONSTRUCTION": self.vector_config.ef_construction,
+                    "EF_RUNTIME": self.vector_config.ef_runtime,
+                })
+
+            index_fields.append(VectorField("embedding", self.vector_config.algorithm, attributes))
 
         for field in fields:
             if field.field_name.startswith("_"):
@@ -64,21 +177,68 @@ class RedisIndexer(Indexer):
                     NumericField(self.normalize_field(field.field_name))
                 )
 
-        await self.client.ft(self.index_name).create_index(
-            index_fields, definition=IndexDefinition(prefix=[self.doc_name_prefix])
+        await self.client.ft(get_index_name(self.collection.id, generation)).create_index(
+            index_fields, definition=IndexDefinition(prefix=[get_doc_prefix(self.collection.id, generation)])
         )
+        await self.client.hset(get_checksums_key(self.collection.id, generation), "version", 1)
+        await self.client.hset(REGISTRY_KEY, f"{self.collection.id}:{generation}", 0)
 
-    async def drop_index(self):
-        try:
-            await self.client.ft(self.index_name).dropindex()
-        except:
-            pass
+    async def get_generations(self):
+        return await get_generations(self.client, self.collection.id)
 
     async def recreate(self):
-        log("info", "RedisIndexer[Recreating index for collection %s]" % self.collection.name)
-        await self.drop_index()
-        await self.create_index()
-        await self.index_items()
+        async with RedisTemporalLock(f"redis-indexer-recreate:{self.collection.id}") as unlocked:
+            if not unlocked:
+                return
+
+            live, _ = await self.get_generations()
+            generation = await self.client.hincrby(self.generations_key, "last", 1)
+
+            log("info", "RedisIndexer[Building generation %s of collection %s]" % (generation, self.collection.name))
+
+            # writes go to both generations meanwhile, so that items changing during the build aren't lost
+            await self.client.hset(self.generations_key, "building", generation)
+            try:
+                await self.create_index(generation)
+                await self.index_items(generation=generation)
+                await self.wait_until_indexed(generation)
+                await self.switch_alias(live, generation)
+            except Exception:
+                await self.client.hdel(self.generations_key, "building")
+                await self.drop_generation(generation)
+                raise
+
+            log("info", "RedisIndexer[Switched collection %s to generation %s]" % (self.collection.name, generation))
+
+        if live is not None:
+            from app.tasks.collections import drop_redis_index_generation
+            drop_redis_index_generation.apply_async(
+                (self.collection.id, live), countdown=get_settings().REDIS_INDEX_GENERATION_GC_DELAY
+            )
+
+    async def wait_until_indexed(self, generation):
+        while True:
+            info = await self.client.ft(get_index_name(self.collection.id, generation)).info()
+            if not int(info.get("indexing", 0)):
+                return
+            await asyncio.sleep(0.5)
+
+    async def switch_alias(self, live, generation):
+        pipe = self.client.pipeline(transaction=True)
+        if live == 0:
+            # the unversioned index holds the alias name, so it's dropped in the same transaction the alias is added
+            pipe.execute_command("FT.DROPINDEX", self.index_name)
+            pipe.execute_command("FT.ALIASADD", self.index_name, get_index_name(self.collection.id, generation))
+        else:
+            pipe.execute_command("FT.ALIASUPDATE", self.index_name, get_index_name(self.collection.id, generation))
+        if live is not None:
+            pipe.hset(REGISTRY_KEY, f"{self.collection.id}:{live}", time.time())
+        pipe.hset(self.generations_key, "live", generation)
+        pipe.hdel(self.generations_key, "building")
+        await pipe.execute()
+
+    async def drop_generation(self, generation):
+        await drop_generation(self.client, self.collection.id, generation)
 
     async def index_exists(self):
         try:
@@ -91,190 +251,241 @@ class RedisIndexer(Indexer):
     async def cleanup_all(cls, db):
         client = get_redis()
 
-        existing_collections = m.Collection.objects(db).filter().all()
-        redis_indexer_collections = [
-            collection
-            for collection in existing_collections
+        collection_ids = {
+            collection.id for collection in m.Collection.objects(db).filter().all()
             if collection.config.indexer == "redis"
-        ]
+        }
 
-        collection_prefixes = tuple(["d:%s:" % collection.id for collection in redis_indexer_collections])
+        # only this indexer consumes the change log
+        m.ItemChange.objects(db).remove_all_except(collection_ids)
 
-        cursor = 0
-        keys_to_delete = set()
-        keys_to_update = set()
-        while True:
-            cursor, partial_keys = await client.scan(
-                cursor=cursor, match=f"d:*", count=500
-            )
+        for collection_id in collection_ids:
+            _, building = await get_generations(client, collection_id)
+            if building is not None and not await RedisTemporalLock(
+                    f"redis-indexer-recreate:{collection_id}").is_locked():
+                log("info", f"RedisIndexer[Dropping abandoned generation {building} of collection {collection_id}]")
+                await client.hdel(get_generations_key(collection_id), "building")
+                await drop_generation(client, collection_id, building)
 
-            # pipe = client.pipeline()
-            # for key in partial_keys:
-            #     pipe.hget(key, "_hash")
-            #
-            # result = await pipe.execute()
-            # redis_hashes = {key.decode("utf-8"): value for key, value in zip(partial_keys, result)}
-            #
-            # item_ids = [int(key.split(":")[-1]) for key in redis_hashes.keys()]
-            #
-            # db_hashes = {
-            #     item.id: item.get_hash()
-            #     for item in m.Item.objects(db)
-            #     .filter(m.Item.id.in_(item_ids))
-            #     .all()
-            # }
-            #
-            # for item_id, redis_hash in redis_hashes.items():
-            #     redis_item_id = int(item_id.split(":")[-1])
-            #
-            #     print("redis_item_id", redis_item_id, db_hashes.get(redis_item_id))
-            #
-            #     db_hash = db_hashes.get(int(item_id.split(":")[-1]))
-            #     if db_hash != redis_hash:
-            #         keys_to_update.add(item_id)
-            #
-            # print("hashes", len(keys_to_update))
-
-            for key in partial_keys:
-                key = key.decode("utf-8")
-                if not key.startswith(collection_prefixes):
-                    keys_to_delete.add(key)
-
-            if cursor == 0:
-                break
-
-        # if keys_to_update:
-        #     await self.index_items()
-
-        if keys_to_delete:
-            log("info", f"RedisIndexer[Deleting {len(keys_to_delete)} gone collection items from redis]")
-            for chunk in chunks(list(keys_to_delete), 100):
-                await client.delete(*chunk)
-        else:
-            log("info", "RedisIndexer[No collection items to delete from redis]")
+        gone_collection_ids = set()
+        for name, replaced in (await client.hgetall(REGISTRY_KEY)).items():
+            collection_id, generation = map(int, name.decode().split(":"))
+            replaced = float(replaced)
+
+            if collection_id not in collection_ids:
+                gone_collection_ids.add(collection_id)
+                await drop_generation(client, collection_id, generation)
+            elif replaced and time.time() - replaced > 2 * get_settings().REDIS_INDEX_GENERATION_GC_DELAY:
+                await drop_generation(client, collection_id, generation)
+
+        for collection_id in gone_collection_ids:
+            await client.delete(get_generations_key(collection_id))
 
     async def cleanup(self):
-        if not await self.index_exists():
-            await self.recreate()
+        live, building = await self.get_generations()
+        if live is None or not await self.client.hexists(get_checksums_key(self.collection.id, live), "version"):
+            # generations built before their checksums were kept are rebuilt once, by maintain_collection rather than
+            # under the cleanup lock of every collection
+            if not self.collection.is_index_dirty:
+                log("info", "RedisIndexer[Marking collection %s for a rebuild]" % self.collection.name)
+                self.collection.mark_index_dirty()
             return
 
-        existing_db_item_ids = [
-            item.id
-            for item in m.Item.objects(self.db)
-            .select(m.Item.id)
-            .filter(m.Item.collection_id == self.collection.id)
-            .all()
-        ]
+        await self.apply_changes(live, [generation for generation in (live, building) if generation is not None])
 
-        existing_db_item_ids = set(
-            [f"{self.doc_name_prefix}{item_id}" for item_id in existing_db_item_ids]
-        )
+        settings = get_settings()
+        if await self.client.set(
+                f"{self.generations_key}:reconciled", 1, ex=settings.REDIS_INDEXER_RECONCILE_INTERVAL, nx=True
+        ):
+            await self.reconcile(live)
 
-        cursor = 0
-
-        existing_redis_item_ids = set()
+    async def apply_changes(self, live, generations):
+        batch_size = get_settings().REDIS_INDEXER_CHANGES_BATCH_SIZE
 
         while True:
-            cursor, partial_keys = await self.client.scan(
-                cursor=cursor, match=f"{self.doc_name_prefix}*", count=100
-            )
-            for key in partial_keys:
-                existing_redis_item_ids.add(key.decode("utf-8"))
+            changes = m.ItemChange.objects(self.db).get_batch(self.collection.id, batch_size)
+            if not changes:
+                return
 
-            if cursor == 0:
-                break
+            changed_ids = {change.item_id for change in changes}
+            rows = m.Item.objects(self.db).filter(
+                m.Item.collection_id == self.collection.id, m.Item.id.in_(changed_ids)
+            ).with_entities(m.Item.id, m.Item.is_index_dirty, m.Item.is_embeddings_dirty).all()
 
-        keys_to_delete = existing_redis_item_ids - existing_db_item_ids
-        keys_to_index = existing_db_item_ids - existing_redis_item_ids
-        log("info",
-            "RedisIndexer[redis count: %s, db count: %s]" % (len(existing_redis_item_ids), len(existing_db_item_ids)))
+            gone_ids = changed_ids - {row.id for row in rows}
+            await self.delete_documents(generations, gone_ids)
 
-        log(
-            "info",
-            "RedisIndexer[Deleting %s gone items from redis]" % len(keys_to_delete),
-        )
-        log(
-            "info",
-            "RedisIndexer[Indexing %s missing items to redis]" % len(keys_to_index),
-        )
+            # dirty items are indexed by maintain_collection, once their embeddings are ready
+            clean_ids = [row.id for row in rows if not row.is_index_dirty and not row.is_embeddings_dirty]
+            missing_ids = await self.get_missing_ids(live, clean_ids)
+            await self.index_items_by_id(missing_ids)
 
-        for chunk in chunks(list(keys_to_delete), 100):
-            await self.client.delete(*chunk)
+            m.ItemChange.objects(self.db).remove(changes)
 
-        if keys_to_index:
-            items = m.Item.objects(self.db).filter(
-                m.Item.id.in_([int(key.split(":")[-1]) for key in keys_to_index])
-            ).all()
+            log("info", "RedisIndexer[Applied %s changes to collection %s: %s gone, %s missing]" % (
+                len(changes), self.collection.name, len(gone_ids), len(missing_ids)))
 
-            await self.index_items(items)
+            if len(changes) < batch_size:
+                return
 
-    async def index_items(self, items=None):
-        async def index(chunk_of_items):
-            vectors_size = self.embeddings_calculator.get_size() if self.embeddings_calculator else 0
+    async def reconcile(self, live):
+        checksums = await self.client.hgetall(get_checksums_key(self.collection.id, live))
+        indexed = {}
+        for name, value in checksums.items():
+            id_range, _, kind = name.decode().partition(":")
+            if kind:
+                count, id_hashes = indexed.get(int(id_range), (0, 0))
+                indexed[int(id_range)] = (int(value), id_hashes) if kind == "count" else (count, int(value))
 
-            pipe = self.client.pipeline()
+        expected = m.Item.objects(self.db).get_id_checksums(self.collection.id, CHECKSUM_RANGES, ID_SPACE)
 
-            indexed_count = 0
+        drifted = sorted(
+            id_range for id_range in set(indexed) | set(expected)
+            if indexed.get(id_range, (0, 0)) != expected.get(id_range, (0, 0))
+        )
+        for id_range in drifted:
+            await self.reconcile_range(live, id_range, expected.get(id_range, (0, 0)))
 
-            stemmer = self.collection.config.stemmer
+        log("info", "RedisIndexer[Reconciled %s of %s id ranges of collection %s]" % (
+            len(drifted), len(set(indexed) | set(expected)), self.collection.name))
 
-            for i, item in enumerate(chunk_of_items):
+    async def reconcile_range(self, live, id_range, expected):
+        low, high = get_id_range_bounds(id_range)
 
-                stemmed_description = stem(stemmer, item.description)
+        item_ids = {
+            row.id for row in m.Item.objects(self.db).filter(
+                m.Item.collection_id == self.collection.id, m.Item.id >= low, m.Item.id < high
+            ).with_entities(m.Item.id)
+        }
+        indexed_ids = await self.get_indexed_ids(live, low, high)
 
-                log("info", f"RedisIndexer[stemmed_description: {item.description}->{stemmed_description}]")
+        await self.delete_documents([live], indexed_ids - item_ids)
+        await self.index_items_by_id(item_ids - indexed_ids)
 
-                mapping = {
-                    "description": stemmed_description,
-                    "_hash": item.get_hash(),
-                    "_external_id": item.external_id,
-                }
+        # documents written or removed around the scripts leave the checksums off, so they are reset to the expected ones
+        await self.client.hset(get_checksums_key(self.collection.id, live), mapping={
+            f"{id_range}:count": expected[0],
+            f"{id_range}:sum": expected[1],
+        })
 
-                if vectors_size:
-                    vector = getattr(item, "vectors_%s" % vectors_size, None)
+    async def get_indexed_ids(self, generation, low, high):
+        indexed_ids = set()
+        lower_bound = low
 
-                    if vector is not None:
-                        mapping["embedding"] = np.array(
-                            list(vector), dtype=np.float32
-                        ).tobytes()
-                    else:
-                        mapping["embedding"] = np.zeros(
-                            vectors_size, dtype=np.float32
-                        ).tobytes()
+        while True:
+            query = Query(f"@_id:[{lower_bound} ({high}]").no_content().sort_by("_id").paging(0, 1000).dialect(2)
+            result = await self.client.ft(get_index_name(self.collection.id, generation)).search(query)
 
-                for name, value in item.fields.items():
-                    if name.startswith("_"):
-                        continue
+            page = [int(doc.id.split(":")[-1]) for doc in result.docs]
+            indexed_ids.update(page)
 
-                    if isinstance(value, list):
-                        value = ",".join(map(str, value))
+            if len(page) < 1000:
+                return indexed_ids
+            lower_bound = f"({page[-1]}"
 
-                    if isinstance(value, bool):
-                        if value:
-                            value = 1
-                        else:
-                            value = 0
+    async def get_missing_ids(self, generation, item_ids):
+        if not item_ids:
+            return []
 
-                    mapping[self.normalize_field(name)] = str(value)
+        doc_prefix = get_doc_prefix(self.collection.id, generation)
+        pipe = self.client.pipeline(transaction=False)
+        for item_id in item_ids:
+            pipe.exists(f"{doc_prefix}{item_id}")
 
-                indexed_count += 1
-                pipe.hset(f"{self.doc_name_prefix}{item.id}", mapping=mapping)
+        return [item_id for item_id, exists in zip(item_ids, await pipe.execute()) if not exists]
 
-            log(
-                "info",
-                "RedisIndexer[Indexed %s items of collection %s]"
-                % (indexed_count, self.collection.name),
-            )
+    async def delete_documents(self, generations, item_ids):
+        if not item_ids:
+            return
+
+        async with RedisBulkLoader(self.client, get_settings().REDIS_INDEXER_PIPELINE_BYTES) as loader:
+            for generation in generations:
+                doc_prefix = get_doc_prefix(self.collection.id, generation)
+                checksums_key = get_checksums_key(self.collection.id, generation)
+                for item_id in item_ids:
+                    await loader.run_script(
+                        self.delete_document_script, [f"{doc_prefix}{item_id}", checksums_key],
+                        [str(get_id_range(item_id)), str(-m.Item.get_id_hash(item_id))]
+                    )
+
+    def get_items_query(self, vectors_size):
+        query = m.Item.objects(self.db).filter(m.Item.collection_id == self.collection.id)
+        if vectors_size:
+            query = query.options(undefer(getattr(m.Item, "vectors_%s" % vectors_size)))
+        return query
 
-            await pipe.execute()
+    async def index_items_by_id(self, item_ids):
+        vectors_size = self.embeddings_calculator.get_size() if self.embeddings_calculator else 0
+
+        for chunk in chunks(list(item_ids), 2000):
+            await self.index_items(self.get_items_query(vectors_size).filter(m.Item.id.in_(chunk)).all())
+
+    async def index_items(self, items=None, generation=None):
+        if generation is None:
+            generations = [generation for generation in await self.get_generations() if generation is not None]
+        else:
+            generations = [generation]
+
+        vectors_size = self.embeddings_calculator.get_size() if self.embeddings_calculator else 0
+        settings = get_settings()
 
-        if not items:
-            query = query_per_chunk(m.Item.objects(self.db)
-                                    .filter(m.Item.collection_id == self.collection.id), 500)
-            for chunk in query:
-                await index(chunk)
+        if items:
+            chunks_of_items = [items]
         else:
-            await index(items)
+            # the chunks come from the prefetching session, so the vectors are loaded upfront instead of lazily
+            chunks_of_items = keyset_query_per_chunk(self.get_items_query(vectors_size), m.Item.id, 2000, prefetch=True)
+
+        loader = RedisBulkLoader(
+            self.client, settings.REDIS_INDEXER_PIPELINE_BYTES, settings.REDIS_INDEXER_PIPELINES_IN_FLIGHT
+        )
+        async with loader:
+            for chunk_of_items in chunks_of_items:
+                for item in chunk_of_items:
+                    mapping = self.get_mapping(item, vectors_size)
+                    checksum_args = [str(get_id_range(item.id)), str(m.Item.get_id_hash(item.id))]
+                    for generation in generations:
+                        await loader.run_script(self.index_document_script, [
+                            f"{get_doc_prefix(self.collection.id, generation)}{item.id}",
+                            get_checksums_key(self.collection.id, generation)
+                        ], checksum_args + [value for field in mapping.items() for value in field])
+
+        stats = loader.stats
+        log("info", "RedisIndexer[Indexed %s documents of collection %s in %.1fs, %.0f docs/s, %.1f MB/s]" % (
+            stats["commands"], self.collection.name, stats["seconds"],
+            stats["commands"] / max(stats["seconds"], 1e-6), stats["bytes"] / 1024 / 1024 / max(stats["seconds"], 1e-6)
+        ))
+        return stats
+
+    def get_mapping(self, item, vectors_size):
+        mapping = {
+            "description": stem(self.collection.config.stemmer, item.description),
+            "_hash": item.get_hash(),
+            "_external_id": item.external_id,
+            "_id": str(item.id),
+        }
+
+        if vectors_size:
+            vector = getattr(item, "vectors_%s" % vectors_size, None)
+            if vector is None:
+                vector = np.zeros(vectors_size, dtype=self.vector_dtype)
+            mapping["embedding"] = encode_vector(vector, self.vector_dtype)
+
+        for name, value in item.fields.items():
+            if name.startswith("_"):
+                continue
+
+            if isinstance(value, list):
+                value = ",".join(map(str, value))
+
+            if isinstance(value, bool):
+                if value:
+                    value = 1
+                else:
+                    value = 0
+
+            mapping[self.normalize_field(name)] = str(value)
+
+        return mapping
 
     async def search(
             self,
@@ -345,16 +556,18 @@ class RedisIndexer(Indexer):
         full_query_string = """({filters_query}){vector_search}""".format(
             filters_query=filters_query,
             score_function=text_search_similarity_function,
-            vector_search=f"=>[KNN {limit} @embedding $vec as vector_score]" if vector else "",
+            vector_search=f"=>[KNN {limit} @embedding $vec{self.get_knn_attributes()} as vector_score]"
+            if vector is not None else "",
         )
 
         log("info", f"RedisIndexer[searching with query: {full_query_string}, {vector}]")
 
-        if vector:
+        if vector is not None:
             query = (
                 Query(raw_query or full_query_string)
                 .return_field("vector_score")
                 .return_field("description")
+                .return_field("_hash")
                 .scorer(text_search_similarity_function)
                 .sort_by("vector_score")
                 .with_scores()
@@ -365,6 +578,7 @@ class RedisIndexer(Indexer):
             query = (
                 Query(raw_query or full_query_string)
                 .return_field("description")
+                .return_field("_hash")
                 .scorer(text_search_similarity_function)
                 .with_scores()
                 .dialect(2)
@@ -375,8 +589,8 @@ class RedisIndexer(Indexer):
             query,
             query_params=clear(
                 {
-                    "vec": np.array(vector, dtype=np.float32).tobytes()
-                    if vector
+                    "vec": np.asarray(vector, dtype=self.vector_dtype).tobytes()
+                    if vector is not None
                     else None
                 }
             ),
@@ -386,8 +600,8 @@ class RedisIndexer(Indexer):
 
         items = []
         for doc in results.docs:
-            if vector:
-                similarity = 1 - float(doc.vector_score)
+            if vector is not None:
+                similarity = self.distance_to_similarity(float(doc.vector_score))
             else:
                 similarity = doc.score
 
@@ -398,10 +612,22 @@ class RedisIndexer(Indexer):
                 id=doc.id.split(":")[-1],
                 similarity=similarity,
                 description=doc.description,
+                hash=getattr(doc, "_hash", None),
             ))
 
         return items
 
+    def get_knn_attributes(self):
+        if self.vector_config.algorithm == "HNSW":
+            return f" EF_RUNTIME {self.vector_config.ef_runtime}"
+        return ""
+
+    def distance_to_similarity(self, distance):
+        # cosine and inner product distances are 1 - similarity, l2 is the squared euclidean distance
+        if self.vector_config.distance_metric == "L2":
+            return 1 / (1 + distance)
+        return 1 - distance
+
     def convert_filters_to_redisearch_filters(self, filters):
         return self._build_query(filters)
 
@@ -2,6 +2,7 @@ from typing import List, Dict
 from sqlalchemy import text
 from app.core.indexers.indexer import Indexer
 from app.core.indexers.types import IndexerResultItem
+from app.db.vectors import encode_vector, to_vector
 from app.resources.rdb import get_redis
 from app.utils.base import listify
 from app.utils.logging import log
@@ -80,9 +81,10 @@ class SQLIndexer(Indexer):
         distance_query = None
         distance_function = "cosine"
 
-        if vector and distance_function in ["cosine", "inner_product", "l1", "l2"]:
+        if vector is not None and distance_function in ["cosine", "inner_product", "l1", "l2"]:
+            vector = to_vector(vector)
             query_params.update({
-                "vector": "[%s]" % (",".join(map(str, vector)))
+                "vector": encode_vector(vector)
             })
 
             if len(vector) == 1536:
@@ -95,13 +97,13 @@ class SQLIndexer(Indexer):
                 raise ValueError("Query vector must be of length 1536 or 3072")
 
             if distance_function == "cosine":
-                distance_query = f"1 - (item.{vector_field} <=> :vector) as similarity"
+                distance_query = f"1 - (item.{vector_field} <=> CAST(:vector AS vector)) as similarity"
             elif distance_function == "inner_product":
-                distance_query = f"(item.{vector_field} <#> :vector) * -1 as similarity"
+                distance_query = f"(item.{vector_field} <#> CAST(:vector AS vector)) * -1 as similarity"
             elif distance_function == "l1":
-                distance_query = f"(item.{vector_field} <+> :vector) as similarity"
+                distance_query = f"(item.{vector_field} <+> CAST(:vector AS vector)) as similarity"
             elif distance_function == "l2":
-                distance_query = f"1 - (item.{vector_field} <-> :vector) as similarity"
+                distance_query = f"1 - (item.{vector_field} <-> CAST(:vector AS vector)) as similarity"
         elif text_search_query:
             distance_query = "({all_query}) as similarity".format(
                 all_query=f"similarity(description, :query)"
@@ -117,8 +119,8 @@ class SQLIndexer(Indexer):
         pagination_query = "limit :limit offset :offset"
 
         query = text("""
-           select id,description,similarity from (
-               select item.id,item.external_id,item.description,item.fields,item.scores, {distance_query} from item {where_clauses}
+           select id,description,description_hash,similarity from (
+               select item.id,item.external_id,item.description,item.description_hash,item.fields,item.scores, {distance_query} from item {where_clauses}
                ) as similarity_table {score_threshold_query} order by {order_by} {pagination_query}
         """.format(
             where_clauses=f"where {' and '.join(all_where_clauses)}" if all_where_clauses else "",
@@ -138,7 +140,8 @@ class SQLIndexer(Indexer):
         return [IndexerResultItem(
             id=item.id,
             description=item.description,
-            similarity=item.similarity
+            similarity=item.similarity,
+            hash=item.description_hash
         ) for item in items]
 
     def transform_value(self, value, double_quote=False):
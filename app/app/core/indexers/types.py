@@ -5,3 +5,4 @@ class IndexerResultItem(BaseModel):
     id: str
     description: str
     similarity: float
+    hash: str = None
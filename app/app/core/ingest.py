@@ -0,0 +1,157 @@
+import json
+import uuid
+import zlib
+from typing import AsyncIterator, Callable, List, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+
+from app.resources.rdb import get_redis
+from app.settings import get_settings
+from app.utils.logging import log
+
+JOB_COUNTERS = ["received", "invalid", "scheduled", "processed", "unchanged", "created", "reindexed", "reembedded"]
+
+
+class IngestJob(object):
+    def __init__(self, job_id):
+        self.id = job_id
+        self.key = f"ingest-job:{job_id}"
+        self.errors_key = f"ingest-job:{job_id}:errors"
+
+    @classmethod
+    async def create(cls, kind, collection) -> "IngestJob":
+        job = cls(uuid.uuid4().hex)
+        rdb = get_redis()
+        await rdb.hset(job.key, mapping={
+            "kind": kind,
+            "collection": collection,
+            "status": "uploading",
+            **{counter: 0 for counter in JOB_COUNTERS}
+        })
+        await rdb.expire(job.key, get_settings().INGEST_JOB_EXPIRE)
+        return job
+
+    async def increment(self, **counters):
+        if not self.id:
+            return
+
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for counter, value in counters.items():
+                if value:
+                    pipe.hincrby(self.key, counter, value)
+            pipe.expire(self.key, get_settings().INGEST_JOB_EXPIRE)
+            await pipe.execute()
+
+    async def add_errors(self, errors: List[str]):
+        if not errors:
+            return
+
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.rpush(self.errors_key, *errors)
+            pipe.ltrim(self.errors_key, 0, get_settings().INGEST_JOB_MAX_ERRORS - 1)
+            pipe.expire(self.errors_key, get_settings().INGEST_JOB_EXPIRE)
+            await pipe.execute()
+
+    async def set_status(self, status):
+        await get_redis().hset(self.key, "status", status)
+
+    async def get(self):
+        rdb = get_redis()
+        job = {key.decode(): value.decode() for key, value in (await rdb.hgetall(self.key)).items()}
+        if not job:
+            return None
+
+        for counter in JOB_COUNTERS:
+            job[counter] = int(job.get(counter, 0))
+
+        if job["status"] == "uploaded" and job["processed"] >= job["received"] - job["invalid"]:
+            job["status"] = "done"
+
+        job["errors"] = [error.decode() for error in await rdb.lrange(self.errors_key, 0, -1)]
+        job["id"] = self.id
+        return job
+
+
+async def iter_decompressed(stream: AsyncIterator[bytes], max_length) -> AsyncIterator[bytes]:
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    try:
+        async for chunk in stream:
+            # a small chunk can inflate to gigabytes, so it is decompressed max_length bytes at a time
+            while chunk:
+                yield decompressor.decompress(chunk, max_length)
+                chunk = decompressor.unconsumed_tail
+
+        yield decompressor.flush()
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid gzip body: {e}")
+
+
+async def iter_ndjson_lines(stream: AsyncIterator[bytes], gzipped=False) -> AsyncIterator[bytes]:
+    max_line_bytes = get_settings().INGEST_STREAM_MAX_LINE_BYTES
+    buffer = b""
+
+    if gzipped:
+        stream = iter_decompressed(stream, max_line_bytes)
+
+    async for chunk in stream:
+        *lines, buffer = (buffer + chunk).split(b"\n")
+
+        if len(buffer) > max_line_bytes or any(len(line) > max_line_bytes for line in lines):
+            raise HTTPException(status_code=413, detail=f"NDJSON lines must be shorter than {max_line_bytes} bytes")
+
+        for line in lines:
+            if line.strip():
+                yield line
+
+    if buffer.strip():
+        yield buffer
+
+
+async def stream_ingest(
+        stream: AsyncIterator[bytes], gzipped, Model: Type[BaseModel], job: IngestJob,
+        schedule_batch: Callable[[List[BaseModel]], None]
+):
+    batch_size = get_settings().INGEST_BATCH_SIZE
+    batch = []
+    errors = []
+    received = invalid = 0
+    line_number = 0
+
+    async def flush():
+        nonlocal batch, errors, received, invalid
+        if batch:
+            schedule_batch(batch)
+        await job.increment(received=received, invalid=invalid, scheduled=len(batch))
+        await job.add_errors(errors)
+        batch, errors, received, invalid = [], [], 0, 0
+
+    try:
+        async for line in iter_ndjson_lines(stream, gzipped):
+            line_number += 1
+            received += 1
+
+            try:
+                batch.append(Model.parse_raw(line))
+            except (ValidationError, ValueError) as e:
+                invalid += 1
+                if len(errors) < get_settings().INGEST_JOB_MAX_ERRORS:
+                    errors.append(json.dumps({"line": line_number, "error": str(e)}))
+
+            if received >= batch_size:
+                await flush()
+
+        await flush()
+    except Exception as e:
+        # batches that were already scheduled keep being processed, the job only stops waiting for the rest
+        error = getattr(e, "detail", None) or str(e)
+        errors.append(json.dumps({"line": line_number + 1, "error": error}))
+        await job.add_errors(errors)
+        await job.set_status("failed")
+        log("warning", f"IngestJob[{job.id}: failed after {line_number} {Model.__name__} lines: {error}]")
+        raise
+
+    await job.set_status("uploaded")
+
+    log("info", f"IngestJob[{job.id}: streamed {line_number} {Model.__name__} lines]")
@@ -0,0 +1,135 @@
+import asyncio
+import datetime
+import time
+
+from sqlalchemy import text
+
+from app.resources.database import m
+from app.settings import get_settings
+from app.utils.base import chunks, parse_time_string
+from app.utils.logging import log
+
+
+def seconds_ago(time_string):
+    return datetime.datetime.now() - datetime.timedelta(seconds=parse_time_string(time_string))
+
+
+# every policy selects the ctid and id of the rows of one collection to delete
+def expired_events():
+    return "event", """
+        SELECT ctid, id FROM event WHERE collection_id = :collection_id AND created < :before
+    """, {"before": seconds_ago(get_settings().EVENTS_CLEANUP_AFTER)}
+
+
+def expired_search_history():
+    return "search_history", """
+        SELECT ctid, id FROM search_history WHERE collection_id = :collection_id AND created < :before
+    """, {"before": seconds_ago(get_settings().SEARCH_HISTORY_CLEANUP_AFTER)}
+
+
+def lone_person_events():
+    return "event", """
+        SELECT ctid, id FROM event
+        WHERE collection_id = :collection_id AND person_external_id IN (
+            SELECT person_external_id FROM event
+            WHERE collection_id = :collection_id
+            GROUP BY person_external_id
+            HAVING count(*) <= :min_count AND max(created) < :before
+        )
+    """, {
+        "before": seconds_ago(get_settings().EVENTS_CLEANUP_LONE_EVENTS_AFTER),
+        "min_count": get_settings().EVENTS_CLEANUP_LONE_EVENTS_MIN_COUNT,
+    }
+
+
+def events_over_limit_per_person():
+    return "event", """
+        SELECT ctid, id FROM (
+            SELECT event.ctid, event.id, row_number() OVER (
+                PARTITION BY event.person_external_id, event.event_type ORDER BY event.created DESC
+            ) AS position
+            FROM event
+            JOIN (
+                SELECT person_external_id, event_type FROM event
+                WHERE collection_id = :collection_id
+                GROUP BY person_external_id, event_type
+                HAVING count(*) > :max_events
+            ) AS crowded USING (person_external_id, event_type)
+            WHERE event.collection_id = :collection_id
+        ) AS ranked
+        WHERE position > :max_events
+    """, {"max_events": get_settings().EVENTS_CLEANUP_MAX_PER_PERSON_AND_TYPE}
+
+
+RETENTION_POLICIES = {
+    "expired_events": expired_events,
+    "expired_search_history": expired_search_history,
+    "lone_person_events": lone_person_events,
+    "events_over_limit_per_person": events_over_limit_per_person,
+}
+
+
+class RetentionRunner(object):
+    def __init__(self, db, collection):
+        self.db = db
+        self.collection = collection
+        settings = get_settings()
+        self.batch_size = settings.RETENTION_BATCH_SIZE
+        self.throttle_ratio = settings.RETENTION_THROTTLE_RATIO
+        self.max_seconds = settings.RETENTION_MAX_SECONDS
+        self.max_rows = settings.RETENTION_MAX_ROWS_PER_RUN
+
+    # selects the candidates once, as some policies aggregate the whole collection to find them, then deletes them in
+    # bounded batches, pausing between them in proportion to how long each one took, and gives up after max_seconds
+    # so that the next run picks up where this one stopped
+    async def apply(self, policy):
+        table, select_query, params = RETENTION_POLICIES[policy]()
+
+        started = datetime.datetime.now()
+        began = time.monotonic()
+        rows_deleted = batches = 0
+
+        candidates = self.db.execute(text(f"{select_query} LIMIT :max_rows"), {
+            **params, "collection_id": self.collection.id, "max_rows": self.max_rows
+        }).all()
+
+        # a ctid freed by a deleted row can be reused by a new one before the batch runs, the id makes sure that the
+        # row at the ctid is still the candidate
+        delete_query = text(f"""
+            DELETE FROM {table} WHERE ctid = ANY(CAST(:ctids AS tid[])) AND id = ANY(CAST(:ids AS bigint[]))
+        """)
+
+        for batch in chunks(candidates, self.batch_size):
+            if time.monotonic() - began >= self.max_seconds:
+                break
+
+            batch_began = time.monotonic()
+            deleted = self.db.execute(delete_query, {
+                "ctids": [str(row.ctid) for row in batch],
+                "ids": [row.id for row in batch],
+            }).rowcount
+            self.db.commit()
+
+            rows_deleted += deleted
+            batches += 1
+
+            await asyncio.sleep((time.monotonic() - batch_began) * self.throttle_ratio)
+
+        seconds = time.monotonic() - began
+        m.RetentionRun.objects(self.db).record(
+            collection_id=self.collection.id,
+            policy=policy,
+            rows_deleted=rows_deleted,
+            batches=batches,
+            seconds=seconds,
+            started=started,
+        )
+
+        log("info", f"RetentionRunner[{self.collection.name}: {policy} deleted {rows_deleted} rows "
+                    f"in {batches} batches, {seconds:.1f}s]")
+
+        return rows_deleted
+
+    async def apply_all(self):
+        for policy in RETENTION_POLICIES:
+            await self.apply(policy)
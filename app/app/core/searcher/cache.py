@@ -0,0 +1,112 @@
+import asyncio
+import json
+import zlib
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+from app.core.types import SearchResult
+from app.resources.cache import get_async_cache
+from app.settings import get_settings
+from app.utils.hashing import hashed_key
+from app.utils.logging import log
+from app.utils.lru import LRUCache
+
+_search_cache = None
+
+
+def get_search_cache() -> "SearchCache":
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = SearchCache()
+    return _search_cache
+
+
+def get_search_cache_key(collection_id, config, context) -> str:
+    payload = json.dumps(
+        [collection_id, config.cache.key or config.dict(), context or {}],
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashed_key("search", payload)
+
+
+def serialize_search_result(search_result: SearchResult) -> bytes:
+    value = search_result.json(exclude={"id"}, separators=(",", ":")).encode("utf-8")
+    if len(value) > get_settings().SEARCH_CACHE_COMPRESS_ABOVE:
+        return b"z" + zlib.compress(value, 1)
+    return b"j" + value
+
+
+def deserialize_search_result(value: bytes) -> SearchResult:
+    if value[:1] == b"z":
+        return SearchResult.parse_raw(zlib.decompress(value[1:]))
+    return SearchResult.parse_raw(value[1:])
+
+
+class SearchCache(object):
+    def __init__(self):
+        settings = get_settings()
+        self.l1 = LRUCache(maxsize=settings.SEARCH_CACHE_L1_SIZE, expire=settings.SEARCH_CACHE_L1_EXPIRE)
+        self.inflight = {}
+        self.counters = defaultdict(lambda: {"l1_hits": 0, "l2_hits": 0, "coalesced": 0, "misses": 0})
+
+    async def get_from_l2(self, key):
+        value = await get_async_cache().get(key)
+        return value if isinstance(value, bytes) else None
+
+    async def set_in_l2(self, key, value, expire):
+        await get_async_cache().set(key, value, expire)
+
+    def set_in_l1(self, key, value, expire):
+        self.l1.set(key, value, expire if self.l1.expire is None else min(expire, self.l1.expire))
+
+    async def compute(self, key, expire, compute: Callable[[], Awaitable[SearchResult]]) -> bytes:
+        try:
+            search_result = await compute()
+            value = serialize_search_result(search_result)
+            # results missing the engines that timed out are served to the requests waiting for them, but not stored
+            if not search_result.partial:
+                await self.set_in_l2(key, value, expire)
+                self.set_in_l1(key, value, expire)
+            return value
+        finally:
+            if self.inflight.get(key) is asyncio.current_task():
+                del self.inflight[key]
+
+    async def get_or_compute(
+            self, collection_id, key, expire, compute: Callable[[], Awaitable[SearchResult]]
+    ) -> SearchResult:
+        counters = self.counters[collection_id]
+
+        value = self.l1.get(key)
+        if value is not None:
+            counters["l1_hits"] += 1
+            log("info", f"returning search results from l1 cache({key})")
+            return deserialize_search_result(value)
+
+        value = await self.get_from_l2(key)
+        if value is not None:
+            counters["l2_hits"] += 1
+            log("info", f"returning search results from l2 cache({key})")
+            self.set_in_l1(key, value, expire)
+            return deserialize_search_result(value)
+
+        task = self.inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            counters["coalesced"] += 1
+        else:
+            counters["misses"] += 1
+            task = self.inflight[key] = asyncio.ensure_future(self.compute(key, expire, compute))
+
+        return deserialize_search_result(await asyncio.shield(task))
+
+    def stats(self):
+        stats = {}
+        for collection_id, counters in list(self.counters.items()):
+            lookups = sum(counters.values())
+            l2_lookups = lookups - counters["l1_hits"]
+            stats[str(collection_id)] = {
+                **counters,
+                "l1_hit_rate": counters["l1_hits"] / lookups if lookups else 0,
+                "l2_hit_rate": counters["l2_hits"] / l2_lookups if l2_lookups else 0,
+            }
+        return stats
@@ -7,25 +7,29 @@ from app.core.searcher.clauses.vector_clauses import PersonToVectorClause, ItemT
 from app.core.types import TextClauseQuery
 
 
-def get_items_from_ofs(db, ofs, context):
-    items = []
+def collect_from_clauses(db, ofs, clauses, make_clause, get_results):
+    # clauses share the session of the engine and run one after the other, so that a search holds a single
+    # connection per engine
+    matching = [clause for of in ofs for Clause in clauses if (clause := make_clause(Clause, db, of))]
+
+    return [result for clause in matching for result in get_results(clause)]
+
+
+async def get_items_from_ofs(db, ofs, context):
     clauses = [
         PersonItemsClause,
         ItemToItemsClause,
         RecommendationsItemsClause
     ]
 
-    for of in ofs:
-        for Clause in clauses:
-            clause = Clause.from_of(db, of, context)
-            if clause:
-                items.extend(clause.get_items())
+    return collect_from_clauses(
+        db, ofs, clauses,
+        make_clause=lambda Clause, db, of: Clause.from_of(db, of, context),
+        get_results=lambda clause: clause.get_items()
+    )
 
-    return items
 
-
-def get_vectors_from_ofs(db, similarity_engine, ofs, context: dict):
-    vectors = []
+async def get_vectors_from_ofs(db, similarity_engine, ofs, context: dict):
     clauses = [
         PersonToVectorClause,
         ItemToVectorClause,
@@ -34,29 +38,24 @@ def get_vectors_from_ofs(db, similarity_engine, ofs, context: dict):
         EmbeddingsClause
     ]
 
-    for of in ofs:
-        for Clause in clauses:
-            clause = Clause.from_of(db, similarity_engine, of, context)
-            if clause:
-                vectors.extend(clause.get_vectors())
-
-    return vectors
+    return collect_from_clauses(
+        db, ofs, clauses,
+        make_clause=lambda Clause, db, of: Clause.from_of(db, similarity_engine, of, context),
+        get_results=lambda clause: clause.get_vectors()
+    )
 
 
-def get_text_queries_from_ofs(db, similarity_engine, ofs, context: dict):
-    queries: List[TextClauseQuery] = []
+async def get_text_queries_from_ofs(db, similarity_engine, ofs, context: dict) -> List[TextClauseQuery]:
     clauses = [
         TextSearchClause
     ]
 
-    for of in ofs:
-        for Clause in clauses:
-            clause = Clause.from_of(db, similarity_engine, of, context)
-            if clause:
-                queries.extend(clause.get_queries())
-
-    return queries
+    return collect_from_clauses(
+        db, ofs, clauses,
+        make_clause=lambda Clause, db, of: Clause.from_of(db, similarity_engine, of, context),
+        get_results=lambda clause: clause.get_queries()
+    )
 
 
-def get_item_ids_from_ofs(db, ofs, context):
-    return [item[0] for item in get_items_from_ofs(db, ofs, context)]
+async def get_item_ids_from_ofs(db, ofs, context):
+    return [item[0] for item in await get_items_from_ofs(db, ofs, context)]
@@ -28,7 +28,7 @@ class FieldsToVectorClause(SimilarityClause):
             return cls(db, similarity_engine, of.fields, of.weight)
 
     def get_vectors(self) -> List[Tuple[List[int], float]]:
-        return [(self.similarity_engine.get_query_vector_from_fields(self.fields), self.weight)]
+        return [(self.similarity_engine.get_query_vector_from_fields(self.fields, db=self.db), self.weight)]
 
 
 class ItemToVectorClause(SimilarityClause):
@@ -106,24 +106,27 @@ class PromptToVectorClause(SimilarityClause):
 
 class PersonToVectorClause(SimilarityClause):
     def __init__(self, db, similarity_engine, person: Union[List[str], str], time: str, limit: int,
-                 weight: float = 1.0):
+                 weight: float = 1.0, recency_half_life: str = None):
         self.db = db
         self.similarity_engine = similarity_engine
         self.person = person
         self.time = time
         self.limit = limit
         self.weight = weight
+        self.recency_half_life = recency_half_life
 
     @classmethod
     def from_of(cls, db, similarity_engine, of, context):
         if hasattr(of, 'person'):
-            return cls(db, similarity_engine, of.person, of.time, of.limit, of.weight)
+            return cls(db, similarity_engine, of.person, of.time, of.limit, of.weight,
+                       recency_half_life=getattr(of, 'recency_half_life', None))
 
     def get_vectors(self) -> List[Tuple[List[int], float]]:
         vectors_person_interacted_with = get_vectors_of_events_for_user(
             db=self.db,
             external_person_ids=listify(self.person),
             time=self.time,
-            limit=self.limit
+            limit=self.limit,
+            recency_half_life=self.recency_half_life
         )
         return [(vector, weight * self.weight) for vector, weight in vectors_person_interacted_with]
@@ -2,11 +2,13 @@ from sqlalchemy import text
 from typing import List, Union, Tuple
 
 from app.core.searcher.filtered_engine import FilteredEngine
+from app.core.searcher.hydration import ItemHydrator
 from app.models.collection import Collection
 from app.models.search.items.item import Item
 from app.core.searcher.clauses.base import get_items_from_ofs
 from app.core.helpers import get_external_item_ids_of_events_for_user
 from app.core.types import SearchItem, SearchConfig, FilterQueryConfig
+from app.settings import get_settings
 
 
 class CollaborativeEngine(FilteredEngine):
@@ -21,7 +23,7 @@ class CollaborativeEngine(FilteredEngine):
 
         items_to_search_for: List[Tuple[str, float]] = []
         items_to_search_for.extend(
-            get_items_from_ofs(self.db, config.collaborative.of, context)
+            await get_items_from_ofs(self.db, config.collaborative.of, context)
         )
 
         filters = config.filters
@@ -37,6 +39,7 @@ class CollaborativeEngine(FilteredEngine):
                 common_events_threshold=config.collaborative.minimum_interactions,
                 randomize=config.randomize,
                 export=config.export,
+                algorithm=config.collaborative.algorithm,
                 context=context
             )
 
@@ -73,6 +76,7 @@ class CollaborativeEngine(FilteredEngine):
             common_events_threshold=2,
             randomize=False,
             export=None,
+            algorithm="cooccurrence",
             context=None
     ):
         external_item_ids = [item[0] for item in items_and_weights]
@@ -90,16 +94,27 @@ class CollaborativeEngine(FilteredEngine):
 
         query_params = {
             "external_item_ids": external_item_ids,
+            "weights": [float(item[1]) for item in items_and_weights],
             "exclude_ids": exclude_external_ids or [],
             "offset": offset,
             "limit": limit,
             "common_events_threshold": common_events_threshold,
+            "collection_id": self.collection.id,
+            "algorithm": algorithm,
+            "max_events_per_person": get_settings().COOCCURRENCE_MAX_EVENTS_PER_PERSON,
         }
 
         query_params.update(all_where_params)
 
+        uses_item_similarities = algorithm in (self.collection.item_similarities_built or {})
+
+        # similarity scores are not interaction counts, so the threshold does not apply to them
+        if not uses_item_similarities:
+            all_where_clauses.append(
+                "common_events_count >= :common_events_threshold"
+            )
         all_where_clauses.append(
-            "common_events_count >= :common_events_threshold"
+            "item.collection_id = :collection_id"
         )
 
         if randomize:
@@ -107,21 +122,67 @@ class CollaborativeEngine(FilteredEngine):
         else:
             order_by = "common_events_count desc"
 
-        query = text(
+        if uses_item_similarities:
+            common_events_query = """
+                WITH seeds AS (
+                    SELECT *
+                    FROM unnest(CAST(:external_item_ids AS varchar[]), CAST(:weights AS float[]))
+                        AS seed(item_external_id, weight)
+                ),
+                filtered_events AS (
+                    SELECT item_similarity.other_item_external_id AS item_external_id,
+                           SUM(item_similarity.score * seeds.weight) AS common_events_count
+                    FROM seeds
+                    JOIN item_similarity ON item_similarity.collection_id = :collection_id
+                        AND item_similarity.algorithm = :algorithm
+                        AND item_similarity.item_external_id = seeds.item_external_id
+                    WHERE not item_similarity.other_item_external_id = any(:exclude_ids)
+                    GROUP BY item_similarity.other_item_external_id
+                )
             """
+        elif self.collection.cooccurrence_watermark is not None:
+            common_events_query = """
+                WITH seeds AS (
+                    SELECT *
+                    FROM unnest(CAST(:external_item_ids AS varchar[]), CAST(:weights AS float[]))
+                        AS seed(item_external_id, weight)
+                ),
+                filtered_events AS (
+                    SELECT item_cooccurrence.other_item_external_id AS item_external_id,
+                           SUM(item_cooccurrence.score * seeds.weight) AS common_events_count
+                    FROM seeds
+                    JOIN item_cooccurrence ON item_cooccurrence.collection_id = :collection_id
+                        AND item_cooccurrence.item_external_id = seeds.item_external_id
+                    WHERE not item_cooccurrence.other_item_external_id = any(:exclude_ids)
+                    GROUP BY item_cooccurrence.other_item_external_id
+                )
+            """
+        else:
+            common_events_query = """
                 WITH relevant_users AS (
-                    SELECT person_external_id
+                    SELECT DISTINCT person_external_id
                     FROM event
-                    WHERE item_external_id = any(:external_item_ids)
+                    WHERE collection_id = :collection_id AND item_external_id = any(:external_item_ids)
                 ),
                 filtered_events AS (
                     SELECT item_external_id, COUNT(*) AS common_events_count
-                    FROM event
-                    WHERE person_external_id IN (SELECT person_external_id FROM relevant_users)
-                    AND not item_external_id = any(:exclude_ids)
+                    FROM relevant_users
+                    CROSS JOIN LATERAL (
+                        SELECT event.item_external_id
+                        FROM event
+                        WHERE event.collection_id = :collection_id
+                          AND event.person_external_id = relevant_users.person_external_id
+                        ORDER BY event.created DESC
+                        LIMIT :max_events_per_person
+                    ) person_events
+                    WHERE not item_external_id = any(:exclude_ids)
                     GROUP BY item_external_id
                 )
-                SELECT item_external_id, common_events_count
+            """
+
+        query = text(
+            common_events_query + """
+                SELECT item.id, item.description_hash, item_external_id, common_events_count
                 FROM filtered_events join item on item.external_id = filtered_events.item_external_id
                 {where_clauses}
                 ORDER BY {order_by}
@@ -137,22 +198,18 @@ class CollaborativeEngine(FilteredEngine):
         if not searched_items:
             return []
 
-        items = Item.objects(self.db).filter(
-            Item.external_id.in_([i.item_external_id for i in searched_items])
+        items_by_id = ItemHydrator(self.db, self.collection).hydrate(
+            [(i.id, i.description_hash) for i in searched_items]
         )
-        items_by_id = {item.external_id: item for item in items}
-        counts_by_id = {
-            i.item_external_id: i.common_events_count for i in searched_items
-        }
-        max_count = max(counts_by_id.values())
+        max_count = max(i.common_events_count for i in searched_items)
 
         search_items = []
         for rec in searched_items:
-            db_item = items_by_id.get(rec.item_external_id)
+            db_item = items_by_id.get(rec.id)
             if not db_item:
                 continue
 
-            score = counts_by_id[rec.item_external_id] / max_count
+            score = rec.common_events_count / max_count
 
             if export is None:
                 exported_value = db_item.fields
@@ -0,0 +1,157 @@
+import threading
+import time
+import uuid
+from typing import Dict, List, Tuple
+
+from app.resources.cache import Cache
+from app.resources.database import m
+from app.settings import get_settings
+from app.utils.lru import LRUCache
+
+_cache = None
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def get_hydration_cache() -> LRUCache:
+    global _cache
+    if _cache is None:
+        _cache = LRUCache(
+            maxsize=get_settings().HYDRATION_CACHE_SIZE,
+            expire=get_settings().HYDRATION_CACHE_EXPIRE,
+        )
+    return _cache
+
+
+def get_version_key(collection_id, item_id=None):
+    if item_id is None:
+        return f"hydration_version:{collection_id}"
+    return f"hydration_version:{collection_id}:{item_id}"
+
+
+# items are written by the celery workers while they are cached by the api processes, so writers publish a new version
+# of the items they changed, and of their collection. Entries read under the current collection version are trusted,
+# the others are checked against the versions of their items
+def publish_versions(collection_id, item_ids):
+    version = uuid.uuid4().hex
+    with Cache() as cache:
+        cache.set_many({get_version_key(collection_id, item_id): version for item_id in item_ids}, 0)
+        cache.set(get_version_key(collection_id), version, 0)
+
+    with _versions_lock:
+        _versions[collection_id] = (version, time.monotonic())
+
+
+def invalidate_items(collection_id, item_ids):
+    if not item_ids:
+        return
+
+    cache = get_hydration_cache()
+    for item_id in item_ids:
+        cache.delete((collection_id, int(item_id)))
+    publish_versions(collection_id, item_ids)
+
+
+def invalidate_collection(collection_id):
+    get_hydration_cache().delete_where(lambda key: key[0] == collection_id)
+
+
+# kept for HYDRATION_VERSION_TTL seconds, so that hits don't wait on memcached, and changes of other processes are seen
+# by that much later
+def get_collection_version(collection_id):
+    now = time.monotonic()
+    with _versions_lock:
+        cached = _versions.get(collection_id)
+    if cached is not None and now - cached[1] < get_settings().HYDRATION_VERSION_TTL:
+        return cached[0]
+
+    with Cache() as cache:
+        version = cache.get(get_version_key(collection_id))
+
+    with _versions_lock:
+        _versions[collection_id] = (version, now)
+    return version
+
+
+def get_item_versions(collection_id, item_ids):
+    with Cache() as cache:
+        versions = cache.get_many([get_version_key(collection_id, item_id) for item_id in item_ids])
+    return {item_id: versions.get(get_version_key(collection_id, item_id)) for item_id in item_ids}
+
+
+class HydratedItem(object):
+    __slots__ = [
+        "id", "external_id", "fields", "scores", "description", "description_hash", "version", "item_version"
+    ]
+
+    def __init__(
+            self, id, external_id, fields, scores, description, description_hash, version=None, item_version=None
+    ):
+        self.id = id
+        self.external_id = external_id
+        self.fields = fields
+        self.scores = scores
+        self.description = description
+        self.description_hash = description_hash
+        self.version = version
+        self.item_version = item_version
+
+
+class ItemHydrator(object):
+    def __init__(self, db, collection):
+        self.db = db
+        self.collection = collection
+        self.cache = get_hydration_cache()
+
+    def hydrate(self, items: List[Tuple[int, str]]) -> Dict[int, HydratedItem]:
+        hydrated = {}
+        missing_item_ids = []
+        outdated = {}
+
+        version = get_collection_version(self.collection.id)
+
+        for item_id, description_hash in items:
+            item_id = int(item_id)
+            cached = self.cache.get((self.collection.id, item_id))
+            if cached is None or (description_hash is not None and cached.description_hash != description_hash):
+                missing_item_ids.append(item_id)
+            elif cached.version == version:
+                hydrated[item_id] = cached
+            else:
+                outdated[item_id] = cached
+
+        if outdated:
+            item_versions = get_item_versions(self.collection.id, list(outdated))
+            for item_id, cached in outdated.items():
+                if item_versions[item_id] == cached.item_version:
+                    cached.version = version
+                    hydrated[item_id] = cached
+                else:
+                    missing_item_ids.append(item_id)
+
+        if missing_item_ids:
+            # the versions are read before the rows, so that rows changed after them are stored under outdated ones
+            item_versions = get_item_versions(self.collection.id, missing_item_ids)
+            rows = m.Item.objects(self.db).select(
+                m.Item.id, m.Item.external_id, m.Item.fields, m.Item.scores, m.Item.description,
+                m.Item.description_hash
+            ).filter(
+                m.Item.collection_id == self.collection.id,
+                m.Item.id.in_(missing_item_ids)
+            ).all()
+
+            for row in rows:
+                item = HydratedItem(
+                    id=row.id,
+                    external_id=row.external_id,
+                    fields=row.fields or {},
+                    scores=row.scores or {},
+                    description=row.description,
+                    description_hash=row.description_hash,
+                    version=version,
+                    item_version=item_versions[row.id],
+                )
+                self.cache.set((self.collection.id, row.id), item)
+                hydrated[row.id] = item
+
+        return hydrated
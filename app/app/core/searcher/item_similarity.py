@@ -0,0 +1,178 @@
+from typing import Dict
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import text
+
+from app.resources.database import m
+from app.settings import get_settings
+from app.utils.logging import log
+from app.utils.timeit import Timeit
+
+ALGORITHMS = ["cosine", "jaccard", "bm25"]
+
+
+class ItemSimilarityBuilder(object):
+    def __init__(self, db, collection):
+        self.db = db
+        self.collection = collection
+        self.settings = get_settings()
+        self.person_indexes: Dict[str, int] = {}
+        self.item_indexes: Dict[str, int] = {}
+        self.item_counts = None
+
+    def get_index(self, indexes, external_id):
+        index = indexes.get(external_id)
+        if index is None:
+            index = indexes[external_id] = len(indexes)
+        return index
+
+    def stream_events(self):
+        last_id = 0
+        while True:
+            rows = self.db.execute(text("""
+                SELECT id, person_external_id, item_external_id, weight
+                FROM event
+                WHERE collection_id = :collection_id AND id > :last_id
+                  AND person_external_id IS NOT NULL AND item_external_id IS NOT NULL
+                ORDER BY id
+                LIMIT :limit
+            """).params({
+                "collection_id": self.collection.id,
+                "last_id": last_id,
+                "limit": self.settings.ITEM_SIMILARITY_EVENTS_CHUNK_SIZE,
+            })).all()
+
+            if not rows:
+                return
+
+            last_id = rows[-1].id
+            yield rows
+
+    def get_persons_items_matrix(self) -> sparse.csr_matrix:
+        person_indexes, item_indexes, weights = [], [], []
+
+        for rows in self.stream_events():
+            person_indexes.append(np.fromiter(
+                (self.get_index(self.person_indexes, row.person_external_id) for row in rows),
+                dtype=np.int32, count=len(rows)
+            ))
+            item_indexes.append(np.fromiter(
+                (self.get_index(self.item_indexes, row.item_external_id) for row in rows),
+                dtype=np.int32, count=len(rows)
+            ))
+            weights.append(np.fromiter(
+                (row.weight if row.weight is not None else 1 for row in rows),
+                dtype=np.float32, count=len(rows)
+            ))
+
+        if not weights:
+            return sparse.csr_matrix((0, 0), dtype=np.float32)
+
+        # repeated events of a person on an item are summed once, when the coordinates are converted
+        return sparse.coo_matrix(
+            (np.concatenate(weights), (np.concatenate(person_indexes), np.concatenate(item_indexes))),
+            shape=(len(self.person_indexes), len(self.item_indexes))
+        ).tocsr()
+
+    def get_items_vectors(self, matrix, algorithm) -> sparse.csr_matrix:
+        items_persons = matrix.T.tocsr()
+
+        if algorithm == "jaccard":
+            items_persons.data = np.ones_like(items_persons.data)
+            self.item_counts = np.diff(items_persons.indptr)
+            return items_persons
+
+        if algorithm == "bm25":
+            items_persons = bm25_weight(
+                items_persons, k1=self.settings.ITEM_SIMILARITY_BM25_K1, b=self.settings.ITEM_SIMILARITY_BM25_B
+            )
+
+        norms = np.sqrt(np.asarray(items_persons.multiply(items_persons).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms).dot(items_persons).tocsr()
+
+    def get_similarities_block(self, vectors, start, end, algorithm) -> sparse.csr_matrix:
+        similarities = vectors[start:end].dot(vectors.T).tocsr()
+
+        if algorithm == "jaccard":
+            counts = self.item_counts
+            rows = np.repeat(np.arange(similarities.shape[0]), np.diff(similarities.indptr))
+            intersections = similarities.data
+            similarities.data = intersections / (counts[start + rows] + counts[similarities.indices] - intersections)
+
+        similarities.setdiag(0, k=start)
+        similarities.eliminate_zeros()
+        return similarities
+
+    def get_top_neighbours(self, similarities, start, external_ids):
+        max_neighbours = self.settings.ITEM_SIMILARITY_MAX_NEIGHBOURS
+        neighbours = []
+
+        for row in range(similarities.shape[0]):
+            row_start, row_end = similarities.indptr[row], similarities.indptr[row + 1]
+            scores = similarities.data[row_start:row_end]
+            columns = similarities.indices[row_start:row_end]
+
+            if len(scores) > max_neighbours:
+                top = np.argpartition(-scores, max_neighbours)[:max_neighbours]
+                scores, columns = scores[top], columns[top]
+
+            item_external_id = external_ids[start + row]
+            neighbours.extend(
+                (item_external_id, external_ids[column], float(score)) for column, score in zip(columns, scores)
+            )
+
+        return neighbours
+
+    def build(self, algorithm):
+        if algorithm not in ALGORITHMS:
+            raise ValueError("Unknown item similarity algorithm %s" % algorithm)
+
+        started = m.ItemCooccurrence.objects(self.db).get_database_now()
+
+        with Timeit("ItemSimilarityBuilder[loading events]"):
+            matrix = self.get_persons_items_matrix()
+
+        vectors = self.get_items_vectors(matrix, algorithm)
+        del matrix
+
+        external_ids = [None] * len(self.item_indexes)
+        for external_id, index in self.item_indexes.items():
+            external_ids[index] = external_id
+
+        batch_size = self.settings.ITEM_SIMILARITY_BATCH_SIZE
+        with Timeit("ItemSimilarityBuilder[computing %s similarities]" % algorithm):
+            for start in range(0, vectors.shape[0], batch_size):
+                end = min(start + batch_size, vectors.shape[0])
+                similarities = self.get_similarities_block(vectors, start, end, algorithm)
+
+                m.ItemSimilarity.objects(self.db).upsert_neighbours(
+                    self.collection.id, algorithm, self.get_top_neighbours(similarities, start, external_ids), started
+                )
+
+                log("info", "ItemSimilarityBuilder[%s similarities of %s/%s items of collection %s]" % (
+                    algorithm, end, vectors.shape[0], self.collection.name))
+
+        m.ItemSimilarity.objects(self.db).delete_older_than(self.collection.id, algorithm, started)
+
+        self.collection.item_similarities_built = {
+            **(self.collection.item_similarities_built or {}),
+            algorithm: started.isoformat()
+        }
+        self.collection.flag_modified("item_similarities_built")
+        self.collection.flush()
+
+
+def bm25_weight(items_persons: sparse.csr_matrix, k1=100, b=0.8) -> sparse.csr_matrix:
+    weighted = items_persons.tocoo(copy=True)
+
+    # persons that interacted with many items say less about each of them
+    idf = np.maximum(np.log(weighted.shape[0]) - np.log1p(np.bincount(weighted.col, minlength=weighted.shape[1])), 0)
+
+    lengths = np.asarray(items_persons.sum(axis=1)).ravel()
+    average_length = lengths.mean() if len(lengths) else 1
+    length_norm = (1.0 - b) + b * lengths / (average_length or 1)
+
+    weighted.data = weighted.data * (k1 + 1.0) / (k1 * length_norm[weighted.row] + weighted.data) * idf[weighted.col]
+    return weighted.tocsr()
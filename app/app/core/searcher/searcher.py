@@ -1,4 +1,4 @@
-import json
+import asyncio
 from sqlalchemy.orm import Session
 from typing import List, Union
 from app.core.searcher.rankers import RandomRanker, ScoreRanker
@@ -7,9 +7,12 @@ from app.core.searcher.clauses.base import get_item_ids_from_ofs
 from app.core.searcher.collaboration import CollaborativeEngine
 from app.core.searcher.similarity import SimilarityEngine
 from app.core.types import SearchConfig, SearchResult, FieldsFilterConfig, SearchItem
-from app.resources.cache import get_cache
+from app.db.session import Database
+from app.core.searcher.cache import get_search_cache, get_search_cache_key
 from app.resources.database import m
-from app.utils.base import listify, stable_hash
+from app.resources.manager import get_engine_executor, run_async
+from app.settings import get_settings
+from app.utils.base import listify
 from app.utils.logging import log
 
 
@@ -22,22 +25,34 @@ class Searcher(object):
         self.db = db
         self.precalculated_embeddings = precalculated_embeddings or {}
         self.context = context or {}
-        self.collaborative_engine = CollaborativeEngine(db, collection)
-        self.similarity_engine = SimilarityEngine(
-            db,
-            collection,
-        )
 
-    def get_exclude_items(self) -> List[Union[str, int]]:
+    async def get_exclude_items(self) -> List[Union[str, int]]:
         items_to_exclude = []
 
         if self.config.exclude:
             items_to_exclude.extend(
-                listify(get_item_ids_from_ofs(self.db, self.config.exclude, self.context))
+                listify(await get_item_ids_from_ofs(self.db, self.config.exclude, self.context))
             )
 
         return items_to_exclude
 
+    async def search_with_engine(self, Engine, excluded, timeout) -> List[SearchItem]:
+        timeout = timeout or get_settings().SEARCH_ENGINE_TIMEOUT_SECONDS
+
+        def execute():
+            with Database() as db:
+                engine = Engine(db, db.merge(self.collection, load=False))
+                return run_async(engine.search(self.config, exclude=excluded, context=self.context))
+
+        # an engine that timed out keeps its thread, and its connection, until it is done, while one that is still
+        # queued for a thread is cancelled
+        try:
+            execution = asyncio.get_running_loop().run_in_executor(get_engine_executor(), execute)
+            return await asyncio.wait_for(execution, timeout)
+        except asyncio.TimeoutError:
+            log("warning", f"{Engine.__name__} timed out, returning results of the rest of the engines")
+            return None
+
     def log_search_history(self, external_person_id, search_result):
         item_ids = [item.id for item in search_result.items]
         return m.SearchHistory(
@@ -48,37 +63,43 @@ class Searcher(object):
         ).flush(self.db)
 
     def get_cache_key(self):
-        cache_key = self.config.cache.key or (
-                str(self.collection.id) + str(json.dumps(self.config.dict(), sort_keys=True)) + str(
-            json.dumps(self.context, sort_keys=True)))
-        return str(stable_hash(cache_key))
+        return get_search_cache_key(self.collection.id, self.config, self.context)
 
     async def get_search_results(self) -> SearchResult:
         if self.config.cache and self.config.cache.expire:
-            cache_key = self.get_cache_key()
-            cached = get_cache().get(cache_key)
+            return await get_search_cache().get_or_compute(
+                self.collection.id, self.get_cache_key(), self.config.cache.expire, self.compute_search_results
+            )
 
-            if cached:
-                log("info", f"returning search results from cache({cache_key})")
-                return cached
+        return await self.compute_search_results()
 
-        excluded = self.get_exclude_items()
+    async def compute_search_results(self) -> SearchResult:
+        excluded = await self.get_exclude_items()
 
         search_results: List[SearchItem] = []
 
         if self.config.filter:
             self.config.filters.append(FieldsFilterConfig(fields=self.config.filter))
 
+        engine_searches = []
+
         if self.config.collaborative:
-            search_results.extend(
-                await self.collaborative_engine.search(self.config, exclude=excluded, context=self.context)
+            engine_searches.append(
+                self.search_with_engine(CollaborativeEngine, excluded, self.config.collaborative.timeout)
             )
 
         if self.config.similar:
-            search_results.extend(
-                await self.similarity_engine.search(self.config, exclude=excluded, context=self.context)
+            engine_searches.append(
+                self.search_with_engine(SimilarityEngine, excluded, self.config.similar.timeout)
             )
 
+        partial = False
+        for engine_results in await asyncio.gather(*engine_searches):
+            if engine_results is None:
+                partial = True
+            else:
+                search_results.extend(engine_results)
+
         if self.config.rank and self.config.rank.randomize:
             ranker = RandomRanker()
         elif self.config.rank and self.config.rank.score_function:
@@ -88,14 +109,7 @@ class Searcher(object):
 
         search_results = ranker.rank(search_results, self.config.limit)
 
-        search_result = SearchResult(items=search_results)
-
-        if self.config.cache and self.config.cache.expire:
-            get_cache().set(
-                self.get_cache_key(), search_result, self.config.cache.expire
-            )
-
-        return search_result
+        return SearchResult(items=search_results, partial=partial)
 
     async def search(self) -> SearchResult:
         search_result = await self.get_search_results()
@@ -1,12 +1,14 @@
 import random
 
+import numpy as np
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from typing import List, Union, Tuple
 from app.core.searcher.filtered_engine import FilteredEngine
+from app.core.searcher.hydration import ItemHydrator
 from app.easytests.interact import interact
 from app.exceptions.query_config import QueryConfigError
-from app.models import Item, Collection
+from app.models import Collection
 from app.core.searcher.clauses.base import get_vectors_from_ofs, get_text_queries_from_ofs
 from app.core.types import SearchConfig, SortingModifier, SearchItem, FilterQueryConfig, TextClauseQuery
 from app.resources.database import m
@@ -20,38 +22,36 @@ class SimilarityEngine(FilteredEngine):
         self.db = db
         self.embeddings_calculator = collection.get_embeddings_calculator()
 
-    def filter_out_ingested_items(
-            self, items: List[Item]
-    ) -> List[Item]:
-        hashes_in_db = [item.description_hash for item in items]
+    def get_average_vector_of_vectors(self, vectors: np.ndarray, combine="mean") -> np.ndarray:
+        if combine == "max":
+            return vectors.max(axis=0)
 
-        changed_items = []
-        for item in items:
-            if item.get_hash() not in hashes_in_db:
-                changed_items.append(item)
+        average_vector = vectors.mean(axis=0)
 
-        return changed_items
+        if combine == "normalized_mean":
+            norm = np.linalg.norm(average_vector)
+            if norm:
+                average_vector = average_vector / norm
 
-    def get_average_vector_of_vectors(self, vectors):
-        return [
-            sum([vector[i] for vector in vectors]) / len(vectors)
-            for i in range(len(vectors[0]))
-        ]
+        return average_vector
 
-    def get_weighted_vectors(self, query_vectors: List[Tuple[List[int], float]]):
-        weighted_vectors = []
-        for vector, weight in query_vectors:
-            weighted_vectors.append([i * weight for i in vector])
+    def get_weighted_vectors(self, query_vectors: List[Tuple[List[int], float]], combine="mean") -> np.ndarray:
+        vectors = np.asarray([vector for vector, weight in query_vectors], dtype=np.float32)
+        weights = np.asarray([weight for vector, weight in query_vectors], dtype=np.float32)
 
-        return weighted_vectors
+        if combine == "normalized_mean":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+        return vectors * weights[:, None]
 
     async def search(self, config: SearchConfig, exclude: List[str], context: dict) -> List[SearchItem]:
         vectors: List[Tuple[List[int], float]] = []
         queries: List[TextClauseQuery] = []
 
         if config.similar:
-            vectors.extend(get_vectors_from_ofs(self.db, self, config.similar.of, context))
-            queries.extend(get_text_queries_from_ofs(self.db, self, config.similar.of, context))
+            vectors.extend(await get_vectors_from_ofs(self.db, self, config.similar.of, context))
+            queries.extend(await get_text_queries_from_ofs(self.db, self, config.similar.of, context))
 
         filters = config.filters
         if isinstance(filters, dict):
@@ -65,7 +65,8 @@ class SimilarityEngine(FilteredEngine):
             offset=config.offset,
             filters=filters,
             export=config.export,
-            context=context
+            context=context,
+            combine=config.similar.combine if config.similar else "mean"
         )
 
     def get_actual_limit_from_config(self, config):
@@ -84,14 +85,15 @@ class SimilarityEngine(FilteredEngine):
             offset: int = 0,
             filters: List[Union[FilterQueryConfig]] = None,
             export: Union[str, List[str]] = None,
-            context: dict = None
+            context: dict = None,
+            combine: str = "mean"
     ):
         filters_dict = await self.build_json_filters(filters)
 
         if query_vectors:
-            query_vectors = self.get_weighted_vectors(query_vectors)
+            weighted_vectors = self.get_weighted_vectors(query_vectors, combine)
 
-            query_vector = self.get_average_vector_of_vectors(query_vectors)
+            query_vector = self.get_average_vector_of_vectors(weighted_vectors, combine)
         else:
             query_vector = None
 
@@ -113,17 +115,18 @@ class SimilarityEngine(FilteredEngine):
                 exclude_external_ids=exclude_external_item_ids
             )
 
-        items = Item.objects(self.db).select(Item.id, Item.external_id, Item.fields, Item.scores,
-                                             Item.description).filter(
-            Item.id.in_([item.id for item in similar_items])).all()
+        with Timeit("hydrator.hydrate"):
+            items_per_id = ItemHydrator(self.db, self.collection).hydrate(
+                [(item.id, item.hash) for item in similar_items]
+            )
 
         items_similarity = {int(item.id): item.similarity for item in similar_items}
 
-        items_per_id = {item.id: item for item in items}
-
         recommendations = []
-        for similar_item in items:
-            item = items_per_id[similar_item.id]
+        for similar_item in similar_items:
+            item = items_per_id.get(int(similar_item.id))
+            if not item:
+                continue
 
             if export is None:
                 exported_value = item.fields
@@ -146,9 +149,9 @@ class SimilarityEngine(FilteredEngine):
 
         return recommendations
 
-    def get_query_vector_from_fields(self, fields) -> List[int]:
+    def get_query_vector_from_fields(self, fields, db=None) -> List[int]:
         description_hash = get_fields_hash(fields)
-        matching_item = m.Item.objects(self.db).filter(m.Item.description_hash == description_hash).first()
+        matching_item = m.Item.objects(db or self.db).filter(m.Item.description_hash == description_hash).first()
         if matching_item:
             return matching_item.vector
 
@@ -161,27 +164,6 @@ class SimilarityEngine(FilteredEngine):
 
         return self.embeddings_calculator.get_embeddings_from_string(prompt)
 
-    def get_embeddings_of_items(self, items, skip_ingested=True):
-        if skip_ingested:
-            changed_items = self.filter_out_ingested_items(items)
-        else:
-            changed_items = items
-
-        changed_item_embeddings = self.embeddings_calculator.get_embeddings_from_items(changed_items)
-
-        unchanged_items = [item for item in items if item not in changed_items]
-
-        all_embeddings = {}
-
-        for item, vector in zip(changed_items, changed_item_embeddings):
-            item.vector = vector
-            all_embeddings[item.id] = vector
-
-        for item in unchanged_items:
-            all_embeddings[item.id] = item.vector
-
-        return all_embeddings
-
 
 class SimilarItem(BaseModel):
     id: int
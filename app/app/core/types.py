@@ -3,9 +3,10 @@ from typing import Union, List, Dict, Any, Literal
 
 import json
 
+from pydantic.class_validators import validator
 from pydantic.fields import Field
 from pydantic.main import BaseModel
-from app.utils.base import uuid_or_int
+from app.utils.base import parse_time_string, uuid_or_int
 import hashlib
 
 
@@ -57,6 +58,8 @@ class SimpleEvent(BaseModel):
 class SearchResult(BaseModel):
     items: List[SearchItem]
     id: int = None
+    # set when an engine timed out and its results are missing
+    partial: bool = False
 
 
 class CombinedSearchConfig(BaseModel):
@@ -122,6 +125,13 @@ class SimilarityClausePerson(BaseModel):
     weight: float = 1.0
     limit: int = 10
     time: str = "1M"
+    recency_half_life: str = None
+
+    @validator("recency_half_life")
+    def check_recency_half_life(cls, value):
+        if value is not None and parse_time_string(value) <= 0:
+            raise ValueError("recency_half_life must be longer than 0s")
+        return value
 
 
 class CollaborativeClauseItem(BaseModel):
@@ -173,6 +183,8 @@ class SimilaritySearchConfig(BaseModel):
         ]
     ]
     type: Literal["text_then_vector", "vector_then_text"] = "text_then_vector"
+    combine: Literal["mean", "normalized_mean", "max"] = "mean"
+    timeout: float = None
 
 
 class CollaborativeSearchConfig(BaseModel):
@@ -180,6 +192,8 @@ class CollaborativeSearchConfig(BaseModel):
         Union[CollaborativeClausePerson, CollaborativeClauseItem, SearchPersonClause]
     ]
     minimum_interactions: int = 2
+    algorithm: Literal["cooccurrence", "cosine", "jaccard", "bm25"] = "cooccurrence"
+    timeout: float = None
 
 
 class FilterQueryConfig(BaseModel):
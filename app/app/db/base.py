@@ -4,7 +4,11 @@ from app.db.base_class import BaseAlchemyModel  # noqa
 from app.models.collection import Collection  # noqa
 from app.models.search.items.item import *  # noqa
 from app.models.search.events.event import *  # noqa
+from app.models.search.events.item_cooccurrence import *  # noqa
 from app.models.search.persons.person import *  # noqa
 from app.models.search.persons.persons_fields import *  # noqa
 from app.models.search.items.items_field import *  # noqa
+from app.models.search.items.item_similarity import *  # noqa
+from app.models.search.items.item_change import *  # noqa
 from app.models.search.history.search_history import *  # noqa
+from app.models.retention_run import *  # noqa
@@ -1,10 +1,18 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
+from app.db.vectors import register_vector_codec
 from app.settings import get_settings
 
 engine = create_engine(get_settings().POSTGRES_CONNECTION_STRING, pool_pre_ping=True, pool_size=30, max_overflow=0,
                        isolation_level="AUTOCOMMIT")
+
+
+@event.listens_for(engine, "connect")
+def on_connect(dbapi_connection, connection_record):
+    register_vector_codec(dbapi_connection)
+
+
 SessionLocal = sessionmaker(autoflush=False, bind=engine)
 
 
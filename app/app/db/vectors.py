@@ -0,0 +1,71 @@
+from functools import lru_cache
+
+import numpy as np
+import psycopg2
+from pgvector.sqlalchemy import Vector as PgVector
+from psycopg2.extensions import new_type, register_type
+
+from app.utils.logging import log
+
+
+@lru_cache(maxsize=16)
+def get_vector_format(dims):
+    # %.9g round-trips float32 exactly and keeps the literal ~40% shorter than str(float)
+    return "[" + ",".join(["%.9g"] * dims) + "]"
+
+
+def to_vector(value):
+    if value is None:
+        return None
+
+    vector = np.asarray(value, dtype=np.float32)
+    if vector.ndim != 1:
+        raise ValueError("expected a 1 dimensional vector, got %s dimensions" % vector.ndim)
+
+    return vector
+
+
+def encode_vector(value):
+    vector = to_vector(value)
+    if vector is None:
+        return None
+
+    return get_vector_format(len(vector)) % tuple(vector.tolist())
+
+
+def decode_vector(value, cursor=None):
+    if value is None or isinstance(value, np.ndarray):
+        return value
+
+    return np.fromstring(value[1:-1], dtype=np.float32, sep=",")
+
+
+def register_vector_codec(dbapi_connection):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT NULL::vector")
+        oid = cursor.description[0][1]
+    except psycopg2.Error:
+        log("warning", "vector type not found in the database, vector columns will be returned as text")
+        dbapi_connection.rollback()
+        return
+    finally:
+        cursor.close()
+
+    register_type(new_type((oid,), "VECTOR", decode_vector), dbapi_connection)
+
+
+class Vector(PgVector):
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        def process(value):
+            vector = to_vector(value)
+            if vector is not None and self.dim is not None and len(vector) != self.dim:
+                raise ValueError("expected %d dimensions, not %d" % (self.dim, len(vector)))
+            return encode_vector(vector)
+
+        return process
+
+    def result_processor(self, dialect, coltype):
+        return decode_vector
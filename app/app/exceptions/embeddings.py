@@ -0,0 +1,5 @@
+class EmbeddingsRetryableError(Exception):
+    def __init__(self, message, retry_after=None, rate_limited=False):
+        super(EmbeddingsRetryableError, self).__init__(message)
+        self.retry_after = retry_after
+        self.rate_limited = rate_limited
@@ -1,21 +1,110 @@
+import asyncio
 import os
-from typing import List
+from typing import List, Dict, Tuple
 
+import httpx
+import numpy as np
+import openai
 import requests
 from more_itertools import batched
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
+from app.exceptions.embeddings import EmbeddingsRetryableError
+from app.llm.embeddings_pipeline import RateLimits, parse_rate_limit_headers
 from app.models.search.items.item import Item
-from app.resources.cache import Cache
+from app.resources.cache import Cache, get_async_cache
 from app.settings import get_settings
-from app.utils.base import listify, stable_hash
+from app.utils.base import listify
+from app.utils.hashing import hashed_key, legacy_hashed_key
 from app.utils.timeit import Timeit
 
+EMBEDDINGS_CACHE_DTYPES = {
+    "float32": (b"4", np.float32),
+    "float16": (b"2", np.float16),
+}
+
+
+def encode_cached_embedding(vector, dtype) -> bytes:
+    marker, np_dtype = EMBEDDINGS_CACHE_DTYPES[dtype]
+    return marker + np.asarray(vector, dtype=np_dtype).tobytes()
+
+
+def decode_cached_embedding(value) -> List[float]:
+    if isinstance(value, list):
+        return value
+
+    for marker, np_dtype in EMBEDDINGS_CACHE_DTYPES.values():
+        if value[:1] == marker:
+            return np.frombuffer(value, dtype=np_dtype, offset=1).astype(np.float32).tolist()
+
+    return None
+
+
+class EmbeddingsCache(object):
+    def __init__(self, model):
+        self.model = model
+        self.prefix = f"embeddings:{model}"
+        self.dtype = get_settings().EMBEDDINGS_CACHE_DTYPE
+        self.expire = get_settings().EMBEDDINGS_CACHE_EXPIRE
+
+    def open(self):
+        return Cache()
+
+    # legacy hits are only served, like SafeCache.get_or_legacy does, as copying them to the new key would outlive the
+    # expiry they were written with
+    def get_many(self, strings) -> Dict[str, List[float]]:
+        keys = {hashed_key(self.prefix, string): string for string in set(strings)}
+
+        with self.open() as cache:
+            values = cache.get_many(list(keys.keys()))
+
+            embeddings = {}
+            for key, value in values.items():
+                vector = decode_cached_embedding(value)
+                if vector is not None:
+                    embeddings[keys[key]] = vector
+
+            if get_settings().CACHE_READ_LEGACY_KEYS:
+                legacy_keys = {
+                    legacy_hashed_key(self.prefix, string): string for string in keys.values()
+                    if string not in embeddings
+                }
+                legacy_embeddings = {
+                    legacy_keys[key]: value for key, value in cache.get_many(list(legacy_keys.keys())).items()
+                    if isinstance(value, list)
+                }
+                embeddings.update(legacy_embeddings)
+
+        return embeddings
+
+    def set_many(self, embeddings: Dict[str, List[float]]):
+        with self.open() as cache:
+            cache.set_many({
+                hashed_key(self.prefix, string): encode_cached_embedding(vector, self.dtype)
+                for string, vector in embeddings.items()
+            }, self.expire)
+
+    async def get_many_async(self, strings) -> Dict[str, List[float]]:
+        return await get_async_cache().run(self.get_many, strings)
+
+    async def set_many_async(self, embeddings: Dict[str, List[float]]):
+        await get_async_cache().run(self.set_many, embeddings)
+
+
+def get_retry_after(headers):
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
 
 class EmbeddingsCalculator(object):
     def get_size(self):
         raise NotImplementedError()
 
+    async def get_embeddings_from_strings_async(self, strings) -> Tuple[List[List[float]], RateLimits]:
+        raise NotImplementedError()
+
 
 class OpenAiEmbeddingsCalculator(EmbeddingsCalculator):
     def __init__(self, model):
@@ -23,6 +112,16 @@ class OpenAiEmbeddingsCalculator(EmbeddingsCalculator):
         self.model = model
         self.vectors_size = 1536
         self.client = OpenAI()
+        self.async_client = None
+        self.async_client_loop = None
+
+    # the async client is bound to the event loop it was first used in, and celery tasks run a new loop each time
+    def get_async_client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        if self.async_client_loop is not loop:
+            self.async_client = AsyncOpenAI(max_retries=0)
+            self.async_client_loop = loop
+        return self.async_client
 
     def item_to_string(self, item: Item):
         return item.description
@@ -35,16 +134,6 @@ class OpenAiEmbeddingsCalculator(EmbeddingsCalculator):
             ]
         )
 
-    def get_embedding_from_cache(self, string, model):
-        with Cache() as cache:
-            cache_key = f"embeddings:{model}:{stable_hash(string)}"
-            return cache.get(cache_key)
-
-    def set_embedding_to_cache(self, string, model, vector):
-        with Cache() as cache:
-            cache_key = f"embeddings:{model}:{stable_hash(string)}"
-            cache.set(cache_key, vector, 3600 * 24)
-
     def get_embedding(self, string, model):
         response = self.client.embeddings.create(
             model=model,
@@ -56,13 +145,10 @@ class OpenAiEmbeddingsCalculator(EmbeddingsCalculator):
         if not strings:
             return []
 
-        cached_embeddings = {}
-        for string in strings:
-            cached_embedding = self.get_embedding_from_cache(string, model)
-            if cached_embedding:
-                cached_embeddings[string] = cached_embedding
+        cache = EmbeddingsCache(model or self.model)
+        cached_embeddings = cache.get_many(strings)
 
-        uncached_strings = [string for string in strings if string not in cached_embeddings]
+        uncached_strings = list(dict.fromkeys(string for string in strings if string not in cached_embeddings))
 
         if uncached_strings:
             response = self.client.embeddings.create(
@@ -74,13 +160,44 @@ class OpenAiEmbeddingsCalculator(EmbeddingsCalculator):
                 uncached_strings[index]: i.embedding for index, i in enumerate(response.data)
             }
 
-            for string, embedding in calculated_embeddings.items():
-                self.set_embedding_to_cache(string, model, embedding)
+            cache.set_many(calculated_embeddings)
 
             cached_embeddings.update(calculated_embeddings)
 
         return [cached_embeddings[string] for string in strings]
 
+    async def get_embeddings_from_strings_async(self, strings) -> Tuple[List[List[float]], RateLimits]:
+        cache = EmbeddingsCache(self.model)
+        cached_embeddings = await cache.get_many_async(strings)
+
+        uncached_strings = list(dict.fromkeys(string for string in strings if string not in cached_embeddings))
+
+        limits = RateLimits()
+        if uncached_strings:
+            try:
+                raw_response = await self.get_async_client().embeddings.with_raw_response.create(
+                    model=self.model,
+                    input=uncached_strings
+                )
+            except openai.RateLimitError as e:
+                raise EmbeddingsRetryableError(str(e), retry_after=get_retry_after(e.response.headers),
+                                               rate_limited=True)
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                raise EmbeddingsRetryableError(str(e))
+
+            response = raw_response.parse()
+            limits = parse_rate_limit_headers(raw_response.headers, response.usage.total_tokens)
+
+            calculated_embeddings = {
+                uncached_strings[index]: i.embedding for index, i in enumerate(response.data)
+            }
+
+            await cache.set_many_async(calculated_embeddings)
+
+            cached_embeddings.update(calculated_embeddings)
+
+        return [cached_embeddings[string] for string in strings], limits
+
     def get_embeddings_from_item(self, item: Item):
         string = self.item_to_string(item)
         vector = list(self.get_embeddings_from_string(string, self.model))
@@ -113,22 +230,82 @@ class OpenAiEmbeddingsCalculator(EmbeddingsCalculator):
 
 
 class EmbeddingsProviderCalculator(EmbeddingsCalculator):
-    def __init__(self, model, vectors_size=768):
+    def __init__(self, model, vectors_size=768, backend="torch"):
         self.model = model
         self.vectors_size = vectors_size
+        self.backend = backend
+        self.cache_model = model if backend == "torch" else f"{model}:{backend}"
+        self.async_client = None
+        self.async_client_loop = None
+
+    def get_async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self.async_client_loop is not loop:
+            self.async_client = httpx.AsyncClient(base_url=get_settings().EMBEDDINGS_PROVIDER_URL, timeout=300)
+            self.async_client_loop = loop
+        return self.async_client
 
     def get_size(self):
         return self.vectors_size
 
     def get_embeddings_from_strings(self, strings):
-        with Timeit("embeddings_provider.request"):
-            return requests.post(
-                get_settings().EMBEDDINGS_PROVIDER_URL + "/embedding",
-                json={
+        if not strings:
+            return []
+
+        cache = EmbeddingsCache(self.cache_model)
+        cached_embeddings = cache.get_many(strings)
+
+        uncached_strings = list(dict.fromkeys(string for string in strings if string not in cached_embeddings))
+
+        if uncached_strings:
+            with Timeit("embeddings_provider.request"):
+                calculated_embeddings = dict(zip(uncached_strings, requests.post(
+                    get_settings().EMBEDDINGS_PROVIDER_URL + "/embedding",
+                    json={
+                        "model": self.model,
+                        "backend": self.backend,
+                        "documents": uncached_strings
+                    }
+                ).json().get("embeddings")))
+
+            cache.set_many(calculated_embeddings)
+
+            cached_embeddings.update(calculated_embeddings)
+
+        return [cached_embeddings[string] for string in strings]
+
+    async def get_embeddings_from_strings_async(self, strings) -> Tuple[List[List[float]], RateLimits]:
+        cache = EmbeddingsCache(self.cache_model)
+        cached_embeddings = await cache.get_many_async(strings)
+
+        uncached_strings = list(dict.fromkeys(string for string in strings if string not in cached_embeddings))
+
+        limits = RateLimits()
+        if uncached_strings:
+            try:
+                response = await self.get_async_client().post("/embedding", json={
                     "model": self.model,
-                    "documents": strings
-                }
-            ).json().get("embeddings")
+                    "backend": self.backend,
+                    "documents": uncached_strings
+                })
+            except httpx.TransportError as e:
+                raise EmbeddingsRetryableError(str(e))
+
+            if response.status_code == 429 or response.status_code >= 500:
+                raise EmbeddingsRetryableError(f"embeddings provider responded {response.status_code}",
+                                               retry_after=get_retry_after(response.headers),
+                                               rate_limited=response.status_code == 429)
+            response.raise_for_status()
+
+            limits = parse_rate_limit_headers(response.headers)
+
+            calculated_embeddings = dict(zip(uncached_strings, response.json().get("embeddings")))
+
+            await cache.set_many_async(calculated_embeddings)
+
+            cached_embeddings.update(calculated_embeddings)
+
+        return [cached_embeddings[string] for string in strings], limits
 
     def get_embeddings_from_string(self, string):
         return self.get_embeddings_from_strings([string])[0]
@@ -154,16 +331,6 @@ class EmbeddingsProviderCalculator(EmbeddingsCalculator):
     def get_embedding(self, string):
         return self.get_embeddings_from_string(string)
 
-    def get_embedding_from_cache(self, string, model):
-        with Cache() as cache:
-            cache_key = f"embeddings:{model}:{stable_hash(string)}"
-            return cache.get(cache_key)
-
-    def set_embedding_to_cache(self, string, model, vector):
-        with Cache() as cache:
-            cache_key = f"embeddings:{model}:{stable_hash(string)}"
-            cache.set(cache_key, vector, 3600 * 24)
-
 
 def get_embeddings_calculator(name):
     if name in ["text-embedding-3-small", "text-embedding-3-large"]:
@@ -173,8 +340,8 @@ def get_embeddings_calculator(name):
 
     if type == "st":
         if ":" in name:
-            model, vectors_size = name.split(":")
-            return EmbeddingsProviderCalculator(model, int(vectors_size))
+            model, vectors_size, *backend = name.split(":")
+            return EmbeddingsProviderCalculator(model, int(vectors_size), *backend)
         else:
             return EmbeddingsProviderCalculator(name)
     elif type == "openai":
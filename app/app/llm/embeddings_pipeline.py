@@ -0,0 +1,131 @@
+import asyncio
+import random
+import re
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from more_itertools import batched
+from pydantic import BaseModel
+
+from app.exceptions.embeddings import EmbeddingsRetryableError
+from app.settings import get_settings
+from app.utils.logging import log
+
+
+class RateLimits(BaseModel):
+    remaining_requests: Optional[int] = None
+    remaining_tokens: Optional[int] = None
+    reset_requests: Optional[float] = None
+    reset_tokens: Optional[float] = None
+    tokens: Optional[int] = None
+
+
+def parse_reset_duration(value) -> Optional[float]:
+    # openai sends resets as "1s", "6m0s", "120ms" or "1h2m3.5s"
+    if not value:
+        return None
+
+    seconds = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        seconds += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return seconds
+
+
+def parse_rate_limit_headers(headers, tokens=None) -> RateLimits:
+    def to_int(value):
+        return int(value) if value is not None and value.isdigit() else None
+
+    return RateLimits(
+        remaining_requests=to_int(headers.get("x-ratelimit-remaining-requests")),
+        remaining_tokens=to_int(headers.get("x-ratelimit-remaining-tokens")),
+        reset_requests=parse_reset_duration(headers.get("x-ratelimit-reset-requests")),
+        reset_tokens=parse_reset_duration(headers.get("x-ratelimit-reset-tokens")),
+        tokens=tokens,
+    )
+
+
+# additive increase / multiplicative decrease of the in flight requests, pausing everyone when the limits run out
+class AdaptiveLimiter(object):
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.active = 0
+        self.paused_until = 0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.active < self.concurrency)
+            self.active += 1
+
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def release(self):
+        async with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def on_success(self, limits: RateLimits):
+        if limits.remaining_requests is not None and limits.remaining_requests < self.concurrency:
+            self.pause(limits.reset_requests or 1)
+        elif limits.remaining_tokens is not None and limits.tokens and \
+                limits.remaining_tokens < limits.tokens * self.concurrency:
+            self.pause(limits.reset_tokens or 1)
+        else:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            return
+
+        self.concurrency = max(1, self.concurrency - 1)
+
+    def on_rate_limited(self, retry_after=None):
+        self.concurrency = max(1, self.concurrency // 2)
+        self.pause(retry_after or 1)
+
+
+class EmbeddingsPipeline(object):
+    def __init__(self, calculator, batch_size=None, concurrency=None):
+        settings = get_settings()
+        self.calculator = calculator
+        self.batch_size = batch_size or settings.EMBEDDINGS_PIPELINE_BATCH_SIZE
+        self.limiter = AdaptiveLimiter(concurrency or settings.EMBEDDINGS_PIPELINE_CONCURRENCY)
+        self.max_attempts = settings.EMBEDDINGS_PIPELINE_MAX_ATTEMPTS
+
+    async def embed_batch(self, indexes: List[int], strings: List[str]):
+        for attempt in range(self.max_attempts):
+            await self.limiter.acquire()
+            try:
+                vectors, limits = await self.calculator.get_embeddings_from_strings_async(strings)
+                self.limiter.on_success(limits)
+                return indexes, vectors
+            except EmbeddingsRetryableError as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+
+                if e.rate_limited:
+                    self.limiter.on_rate_limited(e.retry_after)
+
+                backoff = e.retry_after or min(60, 2 ** attempt) * (0.5 + random.random())
+                log("warning", f"EmbeddingsPipeline[retrying batch of {len(strings)} in {backoff:.1f}s: {e}]")
+            finally:
+                await self.limiter.release()
+
+            await asyncio.sleep(backoff)
+
+    async def run(self, strings: List[str], on_batch: Callable[[List[int], List[List[float]]], Awaitable[None]]):
+        tasks = [
+            asyncio.ensure_future(self.embed_batch(list(indexes), [strings[index] for index in indexes]))
+            for indexes in batched(range(len(strings)), self.batch_size)
+        ]
+
+        try:
+            for task in asyncio.as_completed(tasks):
+                indexes, vectors = await task
+                await on_batch(indexes, vectors)
+        finally:
+            for task in tasks:
+                task.cancel()
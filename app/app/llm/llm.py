@@ -10,7 +10,7 @@ from groq import Groq, AsyncGroq
 from app.core.types import LLMStats, CacheConfig
 from app.resources.cache import Cache
 from app.settings import get_settings
-from app.utils.base import stable_hash
+from app.utils.hashing import hashed_key, legacy_hashed_key
 from app.utils.logging import log
 from app.utils.timeit import Timeit
 from pdf2image import convert_from_bytes
@@ -90,8 +90,12 @@ class OpenAILLM(LLM):
     def single_query(self, question):
         with Cache(enabled=self.cache) as cache:
             with Timeit("OpenAILLM.single_query(%s)" % self.model):
-                cache_key = self.cache and self.cache.key or f"llm.single_query:{self.model}:{stable_hash(question)}"
-                answer = cache.get(cache_key)
+                if self.cache and self.cache.key:
+                    cache_key, legacy_cache_key = self.cache.key, None
+                else:
+                    cache_key = hashed_key(f"llm.single_query:{self.model}", question)
+                    legacy_cache_key = legacy_hashed_key(f"llm.single_query:{self.model}", question)
+                answer = cache.get_or_legacy(cache_key, legacy_cache_key)
                 if answer:
                     return answer
 
@@ -116,10 +120,17 @@ class OpenAILLM(LLM):
     async def function_query(self, question, functions, files=None):
         with Cache(enabled=self.cache) as cache:
             with Timeit("OpenAILLM.function_query(%s)" % self.model):
-                cache_key = self.cache and self.cache.key or f"OpenAILLM.function_query:{self.model}:{stable_hash(question)}:{stable_hash(json.dumps(functions, sort_keys=True))}"
+                functions_key = json.dumps(functions, sort_keys=True)
+                if self.cache and self.cache.key:
+                    cache_key, legacy_cache_key = self.cache.key, None
+                else:
+                    cache_key = hashed_key(f"OpenAILLM.function_query:{self.model}", question, functions_key)
+                    legacy_cache_key = legacy_hashed_key(
+                        f"OpenAILLM.function_query:{self.model}", question, functions_key
+                    )
                 print("cache key:", cache_key)
 
-                cached = cache.get(cache_key)
+                cached = cache.get_or_legacy(cache_key, legacy_cache_key)
                 if cached:
                     return cached[0], cached[1]
 
@@ -166,8 +177,10 @@ class GroqLLM(LLM):
     def single_query(self, question, system_prompts=None):
         with Cache(enabled=self.cache) as cache:
             with Timeit("GroqLLM.single_query(%s)" % self.model):
-                cache_key = f"llm.single_query:{self.model}:{stable_hash(question)}"
-                answer = cache.get(cache_key)
+                cache_key = hashed_key(f"llm.single_query:{self.model}", question)
+                answer = cache.get_or_legacy(
+                    cache_key, legacy_hashed_key(f"llm.single_query:{self.model}", question)
+                )
                 if answer:
                     return answer
 
@@ -209,8 +222,12 @@ class GroqLLM(LLM):
     async def function_query(self, question, functions, files):
         with Cache(enabled=self.cache) as cache:
             with Timeit("GroqLLM.function_query(%s)" % self.model):
-                cache_key = self.cache and self.cache.key or f"GroqLLM.function_query:{self.model}:{stable_hash(question)}:{stable_hash(str(functions))}"
-                cached = cache.get(cache_key)
+                if self.cache and self.cache.key:
+                    cache_key, legacy_cache_key = self.cache.key, None
+                else:
+                    cache_key = hashed_key(f"GroqLLM.function_query:{self.model}", question, str(functions))
+                    legacy_cache_key = legacy_hashed_key(f"GroqLLM.function_query:{self.model}", question, str(functions))
+                cached = cache.get_or_legacy(cache_key, legacy_cache_key)
                 if cached:
                     return cached[0], cached[1]
 
@@ -9,7 +9,9 @@ from starlette.requests import Request
 
 from app.api import base
 from app.api.suggest import suggestions
+from app.core.indexers.memory_indexer import warm_up_in_background
 from app.logger import initialize_logger
+from app.resources.manager import init_resources, close_resources
 from app.utils.api_errors_middleware import \
     validation_exception_handler, request_validation_exception_handler
 from app.utils.logging import log
@@ -18,6 +20,7 @@ from app.settings import get_settings
 from app.api.collections import collections
 from app.api.events import events
 from app.api.items import items
+from app.api.ingest import ingest
 from app.api.search import search
 from app.api.aggregations import aggregations
 
@@ -33,6 +36,17 @@ app.add_exception_handler(RequestValidationError, request_validation_exception_h
 app.add_exception_handler(ValidationError, validation_exception_handler)
 
 
+@app.on_event("startup")
+async def startup():
+    await init_resources()
+    warm_up_in_background()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_resources()
+
+
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     start_time = time.time()
@@ -47,6 +61,7 @@ app.include_router(collections.router)
 app.include_router(search.router)
 app.include_router(suggestions.router)
 app.include_router(aggregations.router)
+app.include_router(ingest.router)
 
 app.include_router(base.router)
 
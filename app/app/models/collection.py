@@ -2,9 +2,10 @@ from __future__ import annotations
 from datetime import datetime, timedelta
 from operator import index
 
-from sqlalchemy import Column, String, BigInteger, func, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, String, BigInteger, func, ForeignKey, JSON, Boolean, DateTime
 from sqlalchemy.orm import relationship
 
+from app.core.indexers.memory_indexer import MemoryIndexer
 from app.core.indexers.redis_indexer import RedisIndexer
 from app.core.indexers.sql_indexer import SQLIndexer
 from app.db.base_class import BaseAlchemyModel, BaseModelManager
@@ -30,6 +31,9 @@ class Collection(BaseAlchemyModel):
     items_fields = relationship("ItemsField", cascade="all, delete, delete-orphan", single_parent=True)
     persons_fields = relationship("PersonsField", cascade="all, delete, delete-orphan", single_parent=True)
     is_index_dirty = Column(Boolean, default=False)
+    cooccurrence_watermark = Column(DateTime, nullable=True)
+    cooccurrence_rebuilt = Column(DateTime, nullable=True)
+    item_similarities_built = Column(JSON, nullable=True)
 
     # items_fields = relationship("ItemsField",
     #                             cascade="all, delete, delete-orphan", single_parent=True)
@@ -81,6 +85,9 @@ class Collection(BaseAlchemyModel):
                 item for item in items if item.is_index_dirty or item.is_embeddings_dirty
             ]
 
+            for item in items_that_need_to_be_indexed:
+                item.last_update = func.now()
+
             await collection.get_indexer().index_items(items_that_need_to_be_indexed)
 
             for item in items:
@@ -96,8 +103,15 @@ class Collection(BaseAlchemyModel):
             self.db.flush()
 
     def update_config(self, config):
+        previous_config = self.config
+
         self._config = deep_merge(self._config or {}, config)
         self.flag_modified("_config")
+
+        if previous_config.redis_vector_index.get_index_signature() != \
+                self.config.redis_vector_index.get_index_signature():
+            self.is_index_dirty = True
+
         self.flush()
 
     @property
@@ -173,14 +187,21 @@ class Collection(BaseAlchemyModel):
     def delete(self, db=None):
         db = db or self.db
         m.Item.objects(db).filter(m.Item.collection == self).delete()
+        m.ItemChange.objects(db).filter(m.ItemChange.collection_id == self.id).delete()
         m.ItemsField.objects(db).filter(m.ItemsField.collection == self).delete()
         m.Person.objects(db).filter(m.Person.collection == self).delete()
         m.PersonsField.objects(db).filter(m.PersonsField.collection == self).delete()
         m.Event.objects(db).filter(m.Event.collection == self).delete()
+        m.ItemCooccurrence.objects(db).filter(m.ItemCooccurrence.collection_id == self.id).delete()
+        m.ItemSimilarity.objects(db).filter(m.ItemSimilarity.collection_id == self.id).delete()
+        m.RetentionRun.objects(db).filter(m.RetentionRun.collection_id == self.id).delete()
         super(Collection, self).delete(db)
         db.commit()
         db.flush()
 
+        from app.core.searcher.hydration import invalidate_collection
+        invalidate_collection(self.id)
+
         # self.get_logger().delete_all_logs()
 
     def get_indexer(self):
@@ -188,6 +209,8 @@ class Collection(BaseAlchemyModel):
             return RedisIndexer(self.db, self, index_embeddings=True)
         elif self.config.indexer == "postgres":
             return SQLIndexer(self.db, self, index_embeddings=True)
+        elif self.config.indexer == "memory":
+            return MemoryIndexer(self.db, self, index_embeddings=True)
         else:
             log("warning", f"Indexer {self.config.indexer} not found, using default")
             return SQLIndexer(self.db, self, index_embeddings=True)
@@ -202,10 +225,13 @@ class Collection(BaseAlchemyModel):
         ).search()
 
     async def calculate_embeddings_for_items(self, items):
-        embeddings = self.get_embeddings_calculator().get_embeddings_from_items(items)
-        for i, item in enumerate(items):
-            await item.update_vector(embeddings[i])
-            self.db.add(item)
+        from app.llm.embeddings_pipeline import EmbeddingsPipeline
+
+        async def write_back(indexes, vectors):
+            m.Item.objects(self.db).update_vectors(self.id, [items[index] for index in indexes], vectors)
+
+        pipeline = EmbeddingsPipeline(self.get_embeddings_calculator())
+        await pipeline.run([item.description for item in items], write_back)
 
         self.db.commit()
         self.db.flush()
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, String, BigInteger, ForeignKey, Float, Integer, DateTime, Index
+
+from app.db.base_class import BaseAlchemyModel, BaseModelManager
+from app.resources.database import m
+from app.schemas.retention_run import RetentionRunSchema
+from app.utils.base import default_ns_id
+
+
+class RetentionRun(BaseAlchemyModel):
+    PydanticModel = RetentionRunSchema
+
+    id = Column(BigInteger, primary_key=True, default=default_ns_id)
+    collection_id = Column(BigInteger, ForeignKey(m.Collection.id, ondelete="CASCADE"), nullable=False)
+    policy = Column(String, nullable=False)
+    rows_deleted = Column(BigInteger, nullable=False, default=0)
+    batches = Column(Integer, nullable=False, default=0)
+    seconds = Column(Float, nullable=False, default=0)
+    started = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("retention_run_collection_started_idx", "collection_id", started.desc()),
+    )
+
+    class Manager(BaseModelManager):
+        def record(self, collection_id, policy, rows_deleted, batches, seconds, started):
+            return RetentionRun().set(
+                collection_id=collection_id,
+                policy=policy,
+                rows_deleted=rows_deleted,
+                batches=batches,
+                seconds=seconds,
+                started=started,
+            ).flush(self.db)
+
+    @classmethod
+    def objects(cls, db=None) -> Manager:
+        return cls.create_objects_manager(cls.Manager, db=db)
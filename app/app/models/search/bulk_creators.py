@@ -1,14 +1,19 @@
 from typing import List, Tuple
 
+import csv
 import datetime
+import io
+import json
+from app.core.searcher.hydration import invalidate_items
 from app.core.searcher.similarity import SimilarityEngine
 from app.core.types import SimpleItem, SimplePerson
 from app.easytests.interact import interact
 from app.resources.database import m
 from app.settings import get_settings
+from app.utils.base import default_ns_ids
+from app.utils.logging import log
 from app.db.base_class import ObjectBulkCreator
 from app.models.collection import Collection
-from app.models.search.events.event import Event
 from app.models.search.items.item import Item
 from app.models.search.persons.person import Person
 
@@ -28,9 +33,8 @@ class EventsBulkCreator(ObjectBulkCreator):
         )
 
     async def flush(self):
-        collections = {}
-
-        all_events = []
+        if not self.objects:
+            return
 
         all_related_searches = m.SearchHistory.objects(self.db).filter(
             m.SearchHistory.collection_id.in_(
@@ -52,50 +56,47 @@ class EventsBulkCreator(ObjectBulkCreator):
                 if item not in items_to_searches:
                     items_to_searches[item] = recommendation.id
 
-        for obj in self.objects:
-            event = Event().set(
-                event_type=obj.get("event_type"),
-                person_external_id=obj.get("person_external_id"),
-                item_external_id=obj.get("item_external_id"),
-                collection_id=obj.get("collection_id"),
-                weight=obj.get("weight"),
-                created=obj.get("date"),
-                related_recommendation_id=items_to_searches.get(obj.get("item_external_id"))
-            )
-
-            self.db.add(event)
-
+        collections = {}
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        now = datetime.datetime.now()
+
+        for obj, event_id in zip(self.objects, default_ns_ids(len(self.objects))):
+            writer.writerow([
+                int(event_id),
+                obj.get("event_type"),
+                obj.get("person_external_id"),
+                obj.get("item_external_id"),
+                obj.get("weight"),
+                (obj.get("date") or now).isoformat(),
+                obj.get("collection_id"),
+                items_to_searches.get(obj.get("item_external_id")),
+            ])
+
+            collection = collections.setdefault(obj.get("collection_id"), {"items": set(), "persons": set()})
             if obj.get("person_external_id"):
-                collections.setdefault(obj.get("collection_id"), {}).setdefault("persons", []).append(
-                    obj.get("person_external_id") or {}
-                )
-
+                collection["persons"].add(str(obj.get("person_external_id")))
             if obj.get("item_external_id"):
-                collections.setdefault(obj.get("collection_id"), {}).setdefault("items", []).append(
-                    obj.get("item_external_id") or {}
-                )
-
-            all_events.append(event)
+                collection["items"].add(str(obj.get("item_external_id")))
+
+        # empty unquoted csv fields are loaded as NULL
+        buffer.seek(0)
+        with self.db.connection().connection.cursor() as cursor:
+            cursor.copy_expert(
+                "COPY event (id, event_type, person_external_id, item_external_id, weight, created, collection_id, "
+                "related_recommendation_id) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
 
         for collection_id, collection in collections.items():
-            items = collection.get("items")
-            persons = collection.get("persons")
-
-            collection = Collection.objects(self.db).get(collection_id)
+            if collection["items"]:
+                Item.objects(self.db).create_missing(collection_id, sorted(collection["items"]))
 
-            if items:
-                await ItemsBulkCreator(db=self.db).create_or_update(collection, [
-                    SimpleItem(id=item) for item in items
-                ])
-
-            if persons:
-                await PersonsBulkCreator(db=self.db).create_or_update(collection.id, [
-                    SimplePerson(id=person) for person in persons
-                ])
+            if collection["persons"]:
+                Person.objects(self.db).create_missing(collection_id, sorted(collection["persons"]))
 
         self.objects = []
         self.db.commit()
-        self.db.flush()
 
 
 class ItemsBulkCreator(ObjectBulkCreator):
@@ -105,6 +106,7 @@ class ItemsBulkCreator(ObjectBulkCreator):
         super(ItemsBulkCreator, self).__init__(*args, **kwargs)
         self.recalculate_vectors = recalculate_vectors
         self.refresh = refresh
+        self.stats = {"unchanged": 0, "created": 0, "reindexed": 0, "reembedded": 0}
 
     async def create(self, collection: Collection, item: SimpleItem):
         self.objects.append((collection, item))
@@ -126,50 +128,54 @@ class ItemsBulkCreator(ObjectBulkCreator):
     async def create_or_update(self, collection: Collection, items: List[SimpleItem]):
         from app.models.search.items.items_field import ItemsField
 
-        existing_items = Item.objects(self.db).filter(
-            Item.collection_id == collection.id,
-            Item.external_id.in_([item.id for item in items])
-        )
+        # a single upsert can't touch the same row twice, so repeated items are merged in order
+        unique_items = {}
+        for item in items:
+            previous = unique_items.get(str(item.id))
+            if previous:
+                item = item.copy(update={"fields": {**previous.fields, **item.fields}})
+            unique_items[str(item.id)] = item
 
-        existing_items = {
-            i.external_id: i for i in existing_items
-        }
+        # rows are locked in the order they are upserted, so concurrent batches of overlapping items lock them in the
+        # same order instead of deadlocking
+        unique_items = dict(sorted(unique_items.items()))
 
         all_field_names = {}
-
-        all_items = []
-        for item in items:
+        for item in unique_items.values():
             for field_name, field_value in item.fields.items():
                 all_field_names.setdefault(field_name, []).append(ItemsField.find_best_fit_value_type_of_value(
                     field_value
                 ))
 
-            db_item = existing_items.get(item.id)
-            if db_item:
-                db_item.update_from_simple_item(item)
-                old_description_hash = db_item.description_hash
-                db_item.description_hash = db_item.get_hash()
-
-                if db_item.description_hash != old_description_hash:
-                    db_item.is_index_dirty = True
-                    db_item.is_embeddings_dirty = True
-                else:
-                    db_item.is_index_dirty = True
-            else:
-                db_item = Item().set(
-                    collection_id=collection.id,
-                    external_id=item.id,
-                    scores=item.scores or {},
-                    is_index_dirty=True,
-                    is_embeddings_dirty=True,
-                )
-                db_item.update_from_simple_item(item)
-                db_item.description_hash = item.get_hash()
-                self.db.add(db_item)
+        descriptions = [Item.get_description_of_simple_item(item) for item in unique_items.values()]
+
+        rows = Item.objects(self.db).upsert(
+            collection.id,
+            external_ids=list(unique_items.keys()),
+            fields=[json.dumps(item.fields) for item in unique_items.values()],
+            scores=[json.dumps(item.scores or {}) for item in unique_items.values()],
+            descriptions=descriptions,
+            description_hashes=[Item.hash_description(description) for description in descriptions],
+        )
+        item_ids = [row.id for row in rows]
+
+        self.stats["unchanged"] += len(unique_items) - len(rows)
+        for row in rows:
+            if row.created:
+                self.stats["created"] += 1
+            elif row.description_changed:
+                self.stats["reembedded"] += 1
+            elif row.fields_changed:
+                self.stats["reindexed"] += 1
 
-            all_items.append(db_item)
+        log("info", "ItemsBulkCreator[collection %s: %i items, %i changed]" % (collection.id, len(unique_items),
+                                                                               len(rows)))
 
         if self.refresh:
+            all_items = Item.objects(self.db).filter(
+                Item.collection_id == collection.id,
+                Item.id.in_(item_ids)
+            ).all()
             await m.Collection.objects(self.db).refresh_items(collection, all_items)
 
         ItemsField.objects(self.db).create_fields_if_missing(collection, all_field_names)
@@ -177,6 +183,8 @@ class ItemsBulkCreator(ObjectBulkCreator):
         self.db.commit()
         self.db.flush()
 
+        invalidate_items(collection.id, item_ids)
+
 
 class PersonsBulkCreator(ObjectBulkCreator):
     async def create(self, collection_id, external_id, fields):
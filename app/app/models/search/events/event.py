@@ -21,6 +21,7 @@ class Event(BaseAlchemyModel):
     item_external_id = Column(String, index=True)
     weight = Column(Float, default=1)
     created: datetime = Column(DateTime, server_default=sqlalchemy.sql.func.now(), index=True)
+    ingested: datetime = Column(DateTime, server_default=sqlalchemy.sql.func.now(), index=True)
     collection_id = Column(BigInteger, ForeignKey(m.Collection.id, ondelete="CASCADE"), primary_key=True, index=True)
     related_recommendation_id = Column(BigInteger, ForeignKey(m.SearchHistory.id, ondelete="CASCADE"),
                                        nullable=True, index=True)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import Column, String, BigInteger, ForeignKey, Float, Index, text
+
+from app.db.base_class import BaseAlchemyModel, BaseModelManager
+from app.resources.database import m
+from app.schemas.search.item_cooccurrence import ItemCooccurrenceSchema
+from app.settings import get_settings
+from app.utils.base import parse_time_string
+from app.utils.logging import log
+
+
+class ItemCooccurrence(BaseAlchemyModel):
+    PydanticModel = ItemCooccurrenceSchema
+
+    collection_id = Column(BigInteger, ForeignKey(m.Collection.id, ondelete="CASCADE"), primary_key=True)
+    item_external_id = Column(String, primary_key=True)
+    other_item_external_id = Column(String, primary_key=True)
+    score = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("item_cooccurrence_neighbours_idx", "collection_id", "item_external_id", score.desc()),
+    )
+
+    class Manager(BaseModelManager):
+        def get_database_now(self) -> datetime:
+            return self.db.execute(text("select localtimestamp")).scalar()
+
+        # every person counts with their latest events only, as the live fallback does, so that a heavy user adds up
+        # to max_events_per_person^2 pairs rather than the square of their history. Returns the items whose
+        # neighbours changed, on both sides of the new pairs
+        def add_events_ingested_between(self, collection_id, from_date, to_date) -> List[str]:
+            return [row.item_external_id for row in self.db.execute(text("""
+                WITH window_persons AS (
+                    SELECT DISTINCT person_external_id
+                    FROM event
+                    WHERE collection_id = :collection_id AND ingested > :from_date AND ingested <= :to_date
+                ),
+                person_events AS (
+                    SELECT window_persons.person_external_id, latest.item_external_id, latest.is_new
+                    FROM window_persons
+                    CROSS JOIN LATERAL (
+                        SELECT event.item_external_id, event.ingested > :from_date AS is_new
+                        FROM event
+                        WHERE event.collection_id = :collection_id
+                          AND event.person_external_id = window_persons.person_external_id
+                          AND event.ingested <= :to_date
+                        ORDER BY event.ingested DESC
+                        LIMIT :max_events_per_person
+                    ) latest
+                ),
+                pairs AS (
+                    SELECT new_event.item_external_id, other_event.item_external_id AS other_item_external_id
+                    FROM person_events new_event
+                    JOIN person_events other_event ON other_event.person_external_id = new_event.person_external_id
+                    WHERE new_event.is_new AND other_event.item_external_id <> new_event.item_external_id
+                    UNION ALL
+                    SELECT other_event.item_external_id, new_event.item_external_id
+                    FROM person_events new_event
+                    JOIN person_events other_event ON other_event.person_external_id = new_event.person_external_id
+                    WHERE new_event.is_new AND NOT other_event.is_new
+                      AND other_event.item_external_id <> new_event.item_external_id
+                ),
+                upserted AS (
+                    INSERT INTO item_cooccurrence (collection_id, item_external_id, other_item_external_id, score)
+                    SELECT :collection_id, item_external_id, other_item_external_id, count(*)
+                    FROM pairs
+                    GROUP BY item_external_id, other_item_external_id
+                    ON CONFLICT (collection_id, item_external_id, other_item_external_id)
+                    DO UPDATE SET score = item_cooccurrence.score + excluded.score
+                    RETURNING item_external_id
+                )
+                SELECT DISTINCT item_external_id FROM upserted
+            """).params({
+                "collection_id": collection_id,
+                "from_date": from_date,
+                "to_date": to_date,
+                "max_events_per_person": get_settings().COOCCURRENCE_MAX_EVENTS_PER_PERSON,
+            }))]
+
+        def prune(self, collection_id, item_external_ids, max_neighbours):
+            self.db.execute(text("""
+                DELETE FROM item_cooccurrence
+                USING (
+                    SELECT item_external_id, other_item_external_id,
+                           row_number() OVER (PARTITION BY item_external_id ORDER BY score DESC) AS neighbour_rank
+                    FROM item_cooccurrence
+                    WHERE collection_id = :collection_id AND item_external_id = any(:item_external_ids)
+                ) ranked
+                WHERE item_cooccurrence.collection_id = :collection_id
+                  AND item_cooccurrence.item_external_id = ranked.item_external_id
+                  AND item_cooccurrence.other_item_external_id = ranked.other_item_external_id
+                  AND ranked.neighbour_rank > :max_neighbours
+            """).params({
+                "collection_id": collection_id,
+                "item_external_ids": item_external_ids,
+                "max_neighbours": max_neighbours,
+            }))
+
+        def build(self, collection):
+            settings = get_settings()
+            now = self.get_database_now()
+            # events committed by in-flight transactions carry an older ingested timestamp
+            to_date = now - timedelta(seconds=parse_time_string(settings.COOCCURRENCE_INGEST_LAG))
+
+            full_rebuild = (
+                    collection.cooccurrence_watermark is None
+                    or collection.cooccurrence_rebuilt is None
+                    or (now - collection.cooccurrence_rebuilt).total_seconds()
+                    > parse_time_string(settings.COOCCURRENCE_FULL_REBUILD_AFTER)
+            )
+
+            if full_rebuild:
+                log("info", "ItemCooccurrence[Rebuilding co-occurrences of collection %s]" % collection.name)
+                collection.cooccurrence_watermark = None
+                collection.flush()
+
+                ItemCooccurrence.objects(self.db).filter(ItemCooccurrence.collection_id == collection.id).delete()
+
+                from_date = self.db.execute(text(
+                    "select min(ingested) - interval '1 second' from event where collection_id = :collection_id"
+                ).params({"collection_id": collection.id})).scalar() or to_date
+            else:
+                from_date = collection.cooccurrence_watermark
+
+            window = timedelta(seconds=parse_time_string(settings.COOCCURRENCE_BUILD_WINDOW))
+            while from_date < to_date:
+                window_end = min(from_date + window, to_date)
+
+                touched_item_ids = self.add_events_ingested_between(collection.id, from_date, window_end)
+                if touched_item_ids:
+                    self.prune(collection.id, touched_item_ids, settings.COOCCURRENCE_MAX_NEIGHBOURS)
+
+                log("info", "ItemCooccurrence[Updated %s items of collection %s up to %s]" % (
+                    len(touched_item_ids), collection.name, window_end))
+
+                from_date = window_end
+
+            collection.cooccurrence_watermark = to_date
+            if full_rebuild:
+                collection.cooccurrence_rebuilt = now
+            collection.flush()
+
+    @classmethod
+    def objects(cls, db=None) -> Manager:
+        return cls.create_objects_manager(cls.Manager, db=db)
+
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import json
+from typing import List
 
 import hashlib
 from logging import INFO
@@ -8,20 +9,25 @@ from logging import INFO
 from sqlalchemy import Column, String, BigInteger, DateTime, func, ForeignKey, text, Index, Boolean
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import deferred
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.core.types import SimpleItem, CacheConfig
 from app.llm.llm import get_llm
 from app.resources.database import m
 from app.db.base_class import BaseAlchemyModel, BaseModelManager
+from app.db.vectors import Vector, encode_vector, to_vector
 from app.schemas.search.item import ItemSchema
 from app.settings import get_settings
-from app.utils.base import default_ns_id, repr_string, listify
-from pgvector.sqlalchemy import Vector
+from app.utils.base import default_ns_id, default_ns_ids, repr_string, listify
 from sqlalchemy.orm import mapped_column, relationship
 
 from app.utils.logging import log
 
 
+VECTOR_COLUMNS = ["vectors_384", "vectors_768", "vectors_1536", "vectors_3072"]
+ID_HASH_MULTIPLIER = 2654435761
+
+
 class Item(BaseAlchemyModel):
     PydanticModel = ItemSchema
 
@@ -31,6 +37,10 @@ class Item(BaseAlchemyModel):
     scores = Column(JSONB, default={}, nullable=True)
     description = Column(String, nullable=True, default=None)
     description_hash = Column(String, nullable=True, default=None, index=True)
+    fields_hash = Column(String, nullable=True, default=None)
+    scores_hash = Column(String, nullable=True, default=None)
+    # description_hash of the description the stored vector was calculated from
+    embeddings_hash = Column(String, nullable=True, default=None)
     created = Column(DateTime, default=func.now())
     last_update = Column(DateTime, default=func.now())
     collection_id = Column(BigInteger, ForeignKey(m.Collection.id, ondelete="CASCADE"), primary_key=True, index=True)
@@ -50,6 +60,7 @@ class Item(BaseAlchemyModel):
         Index("item_vectors_1536", "vectors_1536",
               postgresql_ops={"vectors_1536": "vector_cosine_ops"},
               postgresql_using='hnsw'),
+        Index("item_collection_external_id_idx", "collection_id", "external_id", unique=True),
         Index("item_vectors_768", "vectors_768",
               postgresql_ops={"vectors_768": "vector_cosine_ops"},
               postgresql_using='hnsw'),
@@ -99,6 +110,130 @@ class Item(BaseAlchemyModel):
             ##TODO: group the same items from differents orgs and return a unique id
             return self.get_internal_id_from_external_id(collection_id, external_id)
 
+        def create_missing(self, collection_id, external_ids: List[str]):
+            self.db.execute(text("""
+                INSERT INTO item (
+                    id, collection_id, external_id, fields, scores, description, description_hash, fields_hash,
+                    scores_hash, created, last_update, is_index_dirty, is_embeddings_dirty
+                )
+                SELECT new.id, :collection_id, new.external_id, '{}', '{}', '', :description_hash,
+                       md5('{}'::jsonb::text), md5('{}'::jsonb::text), now(), now(), true, true
+                FROM unnest(CAST(:ids AS bigint[]), CAST(:external_ids AS varchar[])) AS new(id, external_id)
+                ON CONFLICT (collection_id, external_id) DO NOTHING
+            """), {
+                "collection_id": collection_id,
+                "ids": default_ns_ids(len(external_ids)).tolist(),
+                "external_ids": external_ids,
+                "description_hash": Item.hash_description(""),
+            })
+
+        # unchanged items are left untouched and aren't returned, the previous hashes of the returned rows come from
+        # the statement's snapshot, which the upsert doesn't see
+        def upsert(self, collection_id, external_ids: List[str], fields: List[str], scores: List[str],
+                   descriptions: List[str], description_hashes: List[str]):
+            return self.db.execute(text("""
+                WITH previous AS (
+                    SELECT external_id, description_hash, fields_hash, scores_hash
+                    FROM item
+                    WHERE collection_id = :collection_id AND external_id = ANY(CAST(:external_ids AS varchar[]))
+                ), upserted AS (
+                    INSERT INTO item (
+                        id, collection_id, external_id, fields, scores, description, description_hash, fields_hash,
+                        scores_hash, created, last_update, is_index_dirty, is_embeddings_dirty
+                    )
+                    SELECT new.id, :collection_id, new.external_id, new.fields, new.scores, new.description,
+                           new.description_hash, md5(new.fields::text), md5(new.scores::text), now(), now(), true, true
+                    FROM unnest(
+                        CAST(:ids AS bigint[]), CAST(:external_ids AS varchar[]), CAST(:fields AS jsonb[]),
+                        CAST(:scores AS jsonb[]), CAST(:descriptions AS varchar[]),
+                        CAST(:description_hashes AS varchar[])
+                    ) AS new(id, external_id, fields, scores, description, description_hash)
+                    ON CONFLICT (collection_id, external_id) DO UPDATE SET
+                        fields = coalesce(item.fields, '{}') || excluded.fields,
+                        scores = excluded.scores,
+                        description = excluded.description,
+                        description_hash = excluded.description_hash,
+                        fields_hash = md5((coalesce(item.fields, '{}') || excluded.fields)::text),
+                        scores_hash = excluded.scores_hash,
+                        is_index_dirty = item.is_index_dirty
+                            OR item.fields_hash IS DISTINCT FROM md5((coalesce(item.fields, '{}') || excluded.fields)::text)
+                            OR item.scores_hash IS DISTINCT FROM excluded.scores_hash,
+                        is_embeddings_dirty = item.is_embeddings_dirty
+                            OR item.description_hash IS DISTINCT FROM excluded.description_hash
+                    WHERE item.description_hash IS DISTINCT FROM excluded.description_hash
+                        OR item.fields_hash IS DISTINCT FROM md5((coalesce(item.fields, '{}') || excluded.fields)::text)
+                        OR item.scores_hash IS DISTINCT FROM excluded.scores_hash
+                    RETURNING id, external_id, description_hash, fields_hash, scores_hash
+                )
+                SELECT upserted.id,
+                       previous.external_id IS NULL AS created,
+                       previous.description_hash IS DISTINCT FROM upserted.description_hash AS description_changed,
+                       previous.fields_hash IS DISTINCT FROM upserted.fields_hash
+                           OR previous.scores_hash IS DISTINCT FROM upserted.scores_hash AS fields_changed
+                FROM upserted
+                LEFT JOIN previous ON previous.external_id = upserted.external_id
+            """), {
+                "collection_id": collection_id,
+                "ids": default_ns_ids(len(external_ids)).tolist(),
+                "external_ids": external_ids,
+                "fields": fields,
+                "scores": scores,
+                "descriptions": descriptions,
+                "description_hashes": description_hashes,
+            }).all()
+
+        def get_id_checksums(self, collection_id, ranges, id_space):
+            rows = self.db.execute(text("""
+                SELECT div(id::numeric * :ranges, :id_space), count(*), sum(mod(id::numeric * :multiplier, 4294967296))
+                FROM item
+                WHERE collection_id = :collection_id
+                GROUP BY 1
+            """), {
+                "collection_id": collection_id,
+                "ranges": ranges,
+                "id_space": id_space,
+                "multiplier": ID_HASH_MULTIPLIER,
+            })
+            return {int(id_range): (count, int(id_hashes)) for id_range, count, id_hashes in rows}
+
+        def get_id_checksum(self, collection_id):
+            count, id_hashes = self.db.execute(text("""
+                SELECT count(*), coalesce(sum(mod(id::numeric * :multiplier, 4294967296)), 0)
+                FROM item
+                WHERE collection_id = :collection_id
+            """), {"collection_id": collection_id, "multiplier": ID_HASH_MULTIPLIER}).one()
+            return count, int(id_hashes)
+
+        def update_vectors(self, collection_id, items: List[Item], vectors):
+            if not items:
+                return
+
+            column = "vectors_%s" % len(vectors[0])
+            if column not in VECTOR_COLUMNS:
+                raise ValueError("Unsupported vectors size %s" % len(vectors[0]))
+
+            assignments = ", ".join(
+                f"{other} = CAST(new.vector AS vector)" if other == column else f"{other} = NULL"
+                for other in VECTOR_COLUMNS
+            )
+            self.db.execute(text(f"""
+                UPDATE item SET {assignments}, embeddings_hash = new.embeddings_hash
+                FROM unnest(CAST(:ids AS bigint[]), CAST(:vectors AS text[]), CAST(:embeddings_hashes AS varchar[]))
+                     AS new(id, vector, embeddings_hash)
+                WHERE item.collection_id = :collection_id AND item.id = new.id
+            """), {
+                "collection_id": collection_id,
+                "ids": [item.id for item in items],
+                "vectors": [encode_vector(vector) for vector in vectors],
+                "embeddings_hashes": [item.get_hash() for item in items],
+            })
+
+            # keep the loaded items in sync without leaving them dirty in the session
+            for item, vector in zip(items, vectors):
+                for other in VECTOR_COLUMNS:
+                    set_committed_value(item, other, to_vector(vector) if other == column else None)
+                set_committed_value(item, "embeddings_hash", item.get_hash())
+
     @property
     def vector(self):
         if self.vectors_3072 is not None:
@@ -129,6 +264,7 @@ class Item(BaseAlchemyModel):
     async def update_vector(self, vector):
         self.vector = vector
         self.description_hash = self.get_hash()
+        self.embeddings_hash = self.description_hash
 
     @classmethod
     def objects(cls, db=None) -> Manager:
@@ -140,22 +276,27 @@ class Item(BaseAlchemyModel):
         else:
             self.fields = item.fields
 
+        self.description = self.get_description_of_simple_item(item)
+
+        self.scores = item.scores or {}
+
+    @classmethod
+    def get_description_of_simple_item(cls, item: SimpleItem):
         if item.description:
             description = item.description
         elif item.description_from_fields:
-            description = self.fields_to_string(
+            description = cls.fields_to_string(
                 {k: v for k, v in item.fields.items() if k in item.description_from_fields})
         else:
-            description = self.fields_to_string(item.fields)
+            description = cls.fields_to_string(item.fields)
 
         if item.description_preprocess:
-            description = self.preprocess_description(description, item.description_preprocess)
+            description = cls.preprocess_description(description, item.description_preprocess)
 
-        self.description = description
+        return description
 
-        self.scores = item.scores or {}
-
-    def preprocess_description(self, description, preprocess):
+    @classmethod
+    def preprocess_description(cls, description, preprocess):
         llm = get_llm(preprocess.model or get_settings().DEFAULT_LLM_PROVIDER_AND_MODEL, cache=CacheConfig(
             expire=3600
         ))
@@ -166,7 +307,8 @@ class Item(BaseAlchemyModel):
 
         return processed_prompt
 
-    def fields_to_string(self, fields):
+    @classmethod
+    def fields_to_string(cls, fields):
         return "\n".join(
             [
                 f"{key} is {' '.join(map(str, listify(value)))}"
@@ -180,8 +322,17 @@ class Item(BaseAlchemyModel):
             "_hash": self.get_hash()
         }
 
+    @classmethod
+    def get_id_hash(cls, item_id):
+        # summed up per range of ids to compare them with the indexers, see Manager.get_id_checksums
+        return item_id * ID_HASH_MULTIPLIER % 4294967296
+
     def get_hash(self):
-        return hashlib.md5(f"${json.dumps(self.description)}".encode("utf-8")).hexdigest()
+        return self.hash_description(self.description)
+
+    @classmethod
+    def hash_description(cls, description):
+        return hashlib.md5(f"${json.dumps(description)}".encode("utf-8")).hexdigest()
 
     def __repr__(self):
         return repr_string(self, ["id", "external_id", "fields", "collection_id"])
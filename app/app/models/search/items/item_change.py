@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, String, BigInteger, DateTime, Index, text
+
+from app.db.base_class import BaseAlchemyModel, BaseModelManager
+from app.schemas.search.item_change import ItemChangeSchema
+
+
+# filled by the item_change_insert and item_change_delete triggers of the item table, for the indexers to catch up on
+class ItemChange(BaseAlchemyModel):
+    PydanticModel = ItemChangeSchema
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    collection_id = Column(BigInteger, nullable=False)
+    item_id = Column(BigInteger, nullable=False)
+    operation = Column(String, nullable=False)
+    created = Column(DateTime, nullable=False, server_default=text("now()"))
+
+    __table_args__ = (
+        Index("item_change_collection_id_idx", "collection_id", "id"),
+    )
+
+    class Manager(BaseModelManager):
+        def get_batch(self, collection_id, limit):
+            return self.filter(ItemChange.collection_id == collection_id).order_by(ItemChange.id).limit(limit).all()
+
+        def remove(self, changes):
+            # removed by id rather than up to the last one, as rows of transactions still in flight may get lower ids
+            self.db.execute(text("DELETE FROM item_change WHERE id = ANY(:ids)"), {
+                "ids": [change.id for change in changes]
+            })
+            self.db.commit()
+
+        def remove_all_except(self, collection_ids):
+            self.db.execute(text("DELETE FROM item_change WHERE collection_id <> ALL(:collection_ids)"), {
+                "collection_ids": list(collection_ids)
+            })
+            self.db.commit()
+
+    @classmethod
+    def objects(cls, db=None) -> Manager:
+        return cls.create_objects_manager(cls.Manager, db=db)
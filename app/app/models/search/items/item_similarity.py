@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, String, BigInteger, ForeignKey, Float, Index, DateTime, text
+
+from app.db.base_class import BaseAlchemyModel, BaseModelManager
+from app.resources.database import m
+from app.schemas.search.item_similarity import ItemSimilaritySchema
+
+
+class ItemSimilarity(BaseAlchemyModel):
+    PydanticModel = ItemSimilaritySchema
+
+    collection_id = Column(BigInteger, ForeignKey(m.Collection.id, ondelete="CASCADE"), primary_key=True)
+    algorithm = Column(String, primary_key=True)
+    item_external_id = Column(String, primary_key=True)
+    other_item_external_id = Column(String, primary_key=True)
+    score = Column(Float, nullable=False, default=0)
+    updated = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("item_similarity_neighbours_idx", "collection_id", "algorithm", "item_external_id", score.desc()),
+    )
+
+    class Manager(BaseModelManager):
+        def upsert_neighbours(self, collection_id, algorithm, neighbours, updated):
+            if not neighbours:
+                return
+
+            self.db.execute(text("""
+                INSERT INTO item_similarity
+                    (collection_id, algorithm, item_external_id, other_item_external_id, score, updated)
+                SELECT :collection_id, :algorithm, neighbour.item_external_id, neighbour.other_item_external_id,
+                       neighbour.score, :updated
+                FROM unnest(CAST(:item_external_ids AS varchar[]), CAST(:other_item_external_ids AS varchar[]),
+                            CAST(:scores AS float[]))
+                    AS neighbour(item_external_id, other_item_external_id, score)
+                ON CONFLICT (collection_id, algorithm, item_external_id, other_item_external_id)
+                DO UPDATE SET score = excluded.score, updated = excluded.updated
+            """).params({
+                "collection_id": collection_id,
+                "algorithm": algorithm,
+                "item_external_ids": [neighbour[0] for neighbour in neighbours],
+                "other_item_external_ids": [neighbour[1] for neighbour in neighbours],
+                "scores": [neighbour[2] for neighbour in neighbours],
+                "updated": updated,
+            }))
+
+        def delete_older_than(self, collection_id, algorithm, updated):
+            self.filter(
+                ItemSimilarity.collection_id == collection_id,
+                ItemSimilarity.algorithm == algorithm,
+                ItemSimilarity.updated < updated
+            ).delete()
+
+    @classmethod
+    def objects(cls, db=None) -> Manager:
+        return cls.create_objects_manager(cls.Manager, db=db)
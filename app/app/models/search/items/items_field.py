@@ -15,8 +15,7 @@ from sqlalchemy.orm import relationship
 from app.db.base_class import BaseAlchemyModel, BaseModelManager
 from app.resources.database import m
 from app.schemas.search.items_field import ItemsFieldSchema
-from app.utils.base import default_ns_id
-from app.utils.logging import log
+from app.utils.base import default_ns_id, default_ns_ids
 
 
 class ItemsField(BaseAlchemyModel):
@@ -37,34 +36,31 @@ class ItemsField(BaseAlchemyModel):
 
     class Manager(BaseModelManager):
         def create_fields_if_missing(self, collection, fields):
-            field_names = fields.keys()
-
-            existing_item_fields = ItemsField.objects(self.db).filter(
-                ItemsField.collection_id == collection.id,
-                ItemsField.field_name.in_(field_names),
-            )
-
-            last_order = max([i.order for i in existing_item_fields] or [0])
-
-            existing = [i.field_name for i in existing_item_fields]
-
-            not_existing = [field for field in field_names if field not in existing]
-
-            if not_existing:
-                for field in not_existing:
-                    last_order += 1
-                    types = fields.get(field) or [ItemsField.DEFAULT_VALUE_TYPE]
-
-                    try:
-                        ItemsField().set(
-                            collection_id=collection.id,
-                            field_name=field,
-                            field_label=field,
-                            order=last_order,
-                            type=types[0],
-                        ).flush(self.db)
-                    except sqlalchemy.exc.IntegrityError:
-                        log("warning", "items_field [%s] exists, skipping" % field)
+            if not fields:
+                return
+
+            field_names = list(fields.keys())
+
+            self.db.execute(sqlalchemy.text("""
+                INSERT INTO items_field (id, collection_id, field_name, field_label, "order", type, created)
+                SELECT new.id, :collection_id, new.field_name, new.field_name,
+                       last."order" + row_number() OVER (ORDER BY new.position), new.type, now()
+                FROM unnest(CAST(:ids AS bigint[]), CAST(:field_names AS varchar[]), CAST(:types AS varchar[]))
+                     WITH ORDINALITY AS new(id, field_name, type, position)
+                CROSS JOIN (
+                    SELECT coalesce(max("order"), 0) AS "order" FROM items_field WHERE collection_id = :collection_id
+                ) AS last
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM items_field existing
+                    WHERE existing.collection_id = :collection_id AND existing.field_name = new.field_name
+                )
+                ON CONFLICT (collection_id, field_name) DO NOTHING
+            """), {
+                "collection_id": collection.id,
+                "ids": default_ns_ids(len(field_names)).tolist(),
+                "field_names": field_names,
+                "types": [(fields.get(field) or [ItemsField.DEFAULT_VALUE_TYPE])[0] for field in field_names],
+            })
 
         def get_fields_of_collection(self, collection_id):
             return (
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from sqlalchemy import Column, String, JSON, BigInteger, DateTime, func, ForeignKey
+from typing import List
+
+from sqlalchemy import Column, String, JSON, BigInteger, DateTime, func, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import BaseModelManager, BaseAlchemyModel
@@ -9,7 +11,7 @@ from app.models.search.items.item import Item
 from app.core.types import SimplePerson
 from app.resources.database import m
 from app.schemas.search.person import PersonSchema
-from app.utils.base import default_ns_id
+from app.utils.base import default_ns_id, default_ns_ids
 from app.utils.cache import cached
 
 
@@ -24,6 +26,10 @@ class Person(BaseAlchemyModel):
     collection_id = Column(BigInteger, ForeignKey(m.Collection.id, ondelete="CASCADE"), primary_key=True, index=True)
     collection = relationship(m.Collection)
 
+    __table_args__ = (
+        Index("person_collection_external_id_idx", "collection_id", "external_id", unique=True),
+    )
+
     class Manager(BaseModelManager):
         def get_by_external_id(self, external_id, collection_id=None):
             query = self.filter(Person.external_id == external_id)
@@ -57,6 +63,18 @@ class Person(BaseAlchemyModel):
                 return obj.external_id
             return None
 
+        def create_missing(self, collection_id, external_ids: List[str]):
+            self.db.execute(text("""
+                INSERT INTO person (id, collection_id, external_id, fields, created, last_update)
+                SELECT new.id, :collection_id, new.external_id, '{}', now(), now()
+                FROM unnest(CAST(:ids AS bigint[]), CAST(:external_ids AS varchar[])) AS new(id, external_id)
+                ON CONFLICT (collection_id, external_id) DO NOTHING
+            """), {
+                "collection_id": collection_id,
+                "ids": default_ns_ids(len(external_ids)).tolist(),
+                "external_ids": external_ids,
+            })
+
     @classmethod
     def objects(cls, db=None) -> Manager:
         return cls.create_objects_manager(cls.Manager, db=db)
@@ -1,4 +1,9 @@
+import asyncio
 import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from pymemcache.client import base
 from pymemcache.client.retrying import RetryingClient
 from pymemcache.exceptions import MemcacheUnexpectedCloseError
@@ -6,6 +11,7 @@ from pymemcache.exceptions import MemcacheUnexpectedCloseError
 from app.settings import get_settings
 
 _client = None
+_async_client = None
 
 
 def get_cache():
@@ -18,6 +24,8 @@ def get_cache():
     def pickle_serializer(key, value):
         if isinstance(value, str):
             return value.encode('utf-8'), 1
+        if isinstance(value, bytes):
+            return value, 3
         return pickle.dumps(value), 2
 
     def pickle_deserializer(key, value, flags):
@@ -25,6 +33,8 @@ def get_cache():
             return value.decode('utf-8')
         elif flags == 2:
             return pickle.loads(value)
+        elif flags == 3:
+            return value
         raise Exception("Unknown flags {}".format(flags))
 
     _client = base.PooledClient((host, int(port)), serializer=pickle_serializer, deserializer=pickle_deserializer)
@@ -47,6 +57,12 @@ def get_fake_cache():
         def set(self, key, value, time):
             pass
 
+        def get_many(self, keys):
+            return {}
+
+        def set_many(self, values, time):
+            pass
+
         def close(self):
             pass
 
@@ -70,6 +86,99 @@ class SafeCache(object):
             print(f"Error getting cache: {e}")
             return None
 
+    def get_many(self, keys):
+        try:
+            return self.cache.get_many(keys) if keys else {}
+        except Exception as e:
+            print(f"Error getting cache: {e}")
+            return {}
+
+    def set_many(self, values, expire=0):
+        try:
+            if values:
+                self.cache.set_many(values, expire)
+        except Exception as e:
+            print(f"Error setting cache: {e}")
+
+    # legacy hits are only served, as copying them to the new key would outlive the expiry they were written with
+    def get_or_legacy(self, key, legacy_key):
+        value = self.get(key)
+        if value is None and legacy_key and get_settings().CACHE_READ_LEGACY_KEYS:
+            value = self.get(legacy_key)
+        return value
+
+
+# pymemcache only speaks blocking sockets, so async callers hand their calls to a fixed set of threads that share the
+# process wide client pool, instead of blocking the event loop on them
+class AsyncCache(object):
+    def __init__(self, cache, workers):
+        self.cache = SafeCache(cache)
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="memcached")
+        # the counters are shared by the loops of every thread and by the workers
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    async def run(self, fn, *args):
+        with self.lock:
+            if self.in_flight >= self.workers:
+                self.waits += 1
+            self.in_flight += 1
+        queued = time.monotonic()
+
+        def execute():
+            waited = time.monotonic() - queued
+            with self.lock:
+                self.wait_seconds += waited
+            return fn(*args)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, execute)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    async def get(self, key):
+        return await self.run(self.cache.get, key)
+
+    async def set(self, key, value, expire=0):
+        await self.run(self.cache.set, key, value, expire)
+
+    async def get_many(self, keys):
+        return await self.run(self.cache.get_many, keys)
+
+    async def set_many(self, values, expire=0):
+        await self.run(self.cache.set_many, values, expire)
+
+    def stats(self):
+        client_pool = self.cache.cache._client.client_pool
+        return {
+            "max_size": self.workers,
+            "size": len(client_pool.used) + len(client_pool.free),
+            "in_use": len(client_pool.used),
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def get_async_cache() -> AsyncCache:
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncCache(get_cache(), get_settings().MEMCACHED_POOL_SIZE)
+    return _async_client
+
+
+def close_async_cache():
+    global _async_client
+    if _async_client is not None:
+        _async_client.close()
+        _async_client = None
+
 
 class Cache:
     def __init__(self, enabled=True):
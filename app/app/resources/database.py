@@ -36,6 +36,21 @@ class ModelsProxy(object):
         from app.models.search.events.event import Event
         return Event
 
+    @property
+    def ItemCooccurrence(self):
+        from app.models.search.events.item_cooccurrence import ItemCooccurrence
+        return ItemCooccurrence
+
+    @property
+    def ItemSimilarity(self):
+        from app.models.search.items.item_similarity import ItemSimilarity
+        return ItemSimilarity
+
+    @property
+    def ItemChange(self):
+        from app.models.search.items.item_change import ItemChange
+        return ItemChange
+
     @property
     def Organization(self):
         from app.models.organization import Organization
@@ -46,5 +61,10 @@ class ModelsProxy(object):
         from app.models.search.history.search_history import SearchHistory
         return SearchHistory
 
+    @property
+    def RetentionRun(self):
+        from app.models.retention_run import RetentionRun
+        return RetentionRun
+
 
 m = ModelsProxy()
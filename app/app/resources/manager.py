@@ -0,0 +1,87 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.resources.cache import close_async_cache, get_async_cache
+from app.resources.rdb import close_redis, get_redis, get_redis_stats
+from app.settings import get_settings
+from app.utils.logging import log
+
+_local = threading.local()
+_loops = set()
+_loops_lock = threading.Lock()
+_engine_executor = None
+
+
+def get_thread_loop():
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _local.loop = asyncio.new_event_loop()
+        with _loops_lock:
+            _loops.add(loop)
+    return loop
+
+
+# every thread that runs coroutines keeps a loop and a redis pool of its own, so searches go to a fixed set of threads
+# instead of asyncio's default executor. Its size also bounds the database connections that engines hold
+def get_engine_executor() -> ThreadPoolExecutor:
+    global _engine_executor
+    if _engine_executor is None:
+        _engine_executor = ThreadPoolExecutor(
+            max_workers=get_settings().SEARCH_ENGINE_CONNECTIONS, thread_name_prefix="engine"
+        )
+    return _engine_executor
+
+
+def close_engine_executor():
+    global _engine_executor
+    if _engine_executor is not None:
+        _engine_executor.shutdown(wait=True, cancel_futures=True)
+        _engine_executor = None
+
+
+# closes the loops of the threads that are done with them, along with their redis pools. The loop of the caller is
+# left to its owner
+def close_thread_loops():
+    with _loops_lock:
+        loops = [loop for loop in _loops if not loop.is_running()]
+        _loops.difference_update(loops)
+
+    for loop in loops:
+        if loop.is_closed():
+            continue
+        try:
+            loop.run_until_complete(close_redis())
+        except Exception as e:
+            log("warning", f"Resources[Could not close the redis pool of a thread loop: {e}]")
+        loop.close()
+
+
+# runs the coroutine on a loop that outlives it, unlike asyncio.run, so that the connections pooled for the loop are
+# reused by the next call of the thread instead of being reopened
+def run_async(coroutine):
+    return get_thread_loop().run_until_complete(coroutine)
+
+
+async def init_resources():
+    try:
+        await get_redis().ping()
+    except Exception as e:
+        log("warning", f"Resources[Redis is not reachable yet: {e}]")
+    get_async_cache()
+    log("info", "Resources[Initialized redis and memcached pools]")
+
+
+async def close_resources():
+    await asyncio.to_thread(close_engine_executor)
+    await asyncio.to_thread(close_thread_loops)
+    await close_redis()
+    close_async_cache()
+    log("info", "Resources[Closed redis and memcached pools]")
+
+
+def get_resources_stats():
+    return {
+        "redis": get_redis_stats(),
+        "memcached": get_async_cache().stats(),
+    }
@@ -1,19 +1,87 @@
+import asyncio
+import time
+import weakref
+
+import redis as sync_redis
 import redis.asyncio as redis
+from redis.asyncio.connection import BlockingConnectionPool
 
 from app.settings import get_settings
 
-_client = None
+# connections are bound to the event loop that opened them, so every loop of the process gets a client of its own
+_clients = weakref.WeakKeyDictionary()
+_sync_client = None
+
+
+class MeteredConnectionPool(BlockingConnectionPool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    async def get_connection(self, command_name, *keys, **options):
+        if not self.pool.empty():
+            return await super().get_connection(command_name, *keys, **options)
+
+        self.waits += 1
+        began = time.monotonic()
+        try:
+            return await super().get_connection(command_name, *keys, **options)
+        finally:
+            self.wait_seconds += time.monotonic() - began
+
+    def stats(self):
+        return {
+            "max_size": self.max_connections,
+            "size": len(self._connections),
+            "in_use": self.max_connections - self.pool.qsize(),
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+def get_redis_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        # clients made outside of a coroutine are going to be used by the thread's loop
+        from app.resources.manager import get_thread_loop
+        return get_thread_loop()
 
 
 def get_redis():
-    # global _client
-    # if _client:
-    #     return _client
+    loop = get_redis_loop()
+    client = _clients.get(loop)
+    if client is None:
+        settings = get_settings()
+        redis_host, redis_port = settings.REDIS_HOST.split(":")
+        client = _clients[loop] = redis.Redis(connection_pool=MeteredConnectionPool(
+            host=redis_host, port=int(redis_port), db=0,
+            max_connections=settings.REDIS_POOL_SIZE, timeout=settings.REDIS_POOL_TIMEOUT
+        ))
+
+    return client
+
+
+# for the few threads that talk to redis without an event loop of their own
+def get_sync_redis():
+    global _sync_client
+    if _sync_client is None:
+        redis_host, redis_port = get_settings().REDIS_HOST.split(":")
+        _sync_client = sync_redis.Redis(host=redis_host, port=int(redis_port), db=0)
+    return _sync_client
+
 
-    redis_connection_string = get_settings().REDIS_HOST
-    redis_port = redis_connection_string.split(":")[-1]
-    redis_host = redis_connection_string.split(":")[0]
+async def close_redis():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.connection_pool.disconnect()
 
-    _client = redis.Redis(host=redis_host, port=int(redis_port), db=0)
 
-    return _client
+def get_redis_stats():
+    stats = {"loops": 0, "max_size": 0, "size": 0, "in_use": 0, "waits": 0, "wait_seconds": 0.0}
+    for client in list(_clients.values()):
+        stats["loops"] += 1
+        for name, value in client.connection_pool.stats().items():
+            stats[name] += value
+    return stats
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Union
+from typing import Union, List, Literal
 from uuid import UUID
 from pydantic import BaseModel
 
@@ -22,7 +22,22 @@ class CollectionUpdate(CollectionBase):
     pass
 
 
+class RedisVectorIndexConfig(BaseModel):
+    algorithm: Literal["FLAT", "HNSW"] = "FLAT"
+    type: Literal["FLOAT32", "FLOAT16"] = "FLOAT32"
+    distance_metric: Literal["COSINE", "IP", "L2"] = "COSINE"
+    m: int = 16
+    ef_construction: int = 200
+    # applied per query, so changing it doesn't rebuild the index
+    ef_runtime: int = 10
+
+    def get_index_signature(self):
+        return self.dict(exclude={"ef_runtime"})
+
+
 class CollectionConfig(BaseModel):
     indexer: str = None
     embeddings_model: str = None
     stemmer = ["english"]
+    item_similarity_algorithms: List[str] = []
+    redis_vector_index: RedisVectorIndexConfig = RedisVectorIndexConfig()
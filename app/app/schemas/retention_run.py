@@ -0,0 +1,13 @@
+import datetime
+
+from pydantic import BaseModel
+
+
+class RetentionRunSchema(BaseModel):
+    id: int
+    collection_id: int
+    policy: str
+    rows_deleted: int
+    batches: int
+    seconds: float
+    started: datetime.datetime
@@ -0,0 +1,11 @@
+import datetime
+
+from pydantic import BaseModel
+
+
+class ItemChangeSchema(BaseModel):
+    id: int
+    collection_id: int
+    item_id: int
+    operation: str
+    created: datetime.datetime
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class ItemCooccurrenceSchema(BaseModel):
+    collection_id: int
+    item_external_id: str
+    other_item_external_id: str
+    score: float
@@ -0,0 +1,12 @@
+import datetime
+
+from pydantic import BaseModel
+
+
+class ItemSimilaritySchema(BaseModel):
+    collection_id: int
+    algorithm: str
+    item_external_id: str
+    other_item_external_id: str
+    score: float
+    updated: datetime.datetime
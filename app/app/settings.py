@@ -9,8 +9,19 @@ class Settings(BaseSettings):
     MEMCACHED_HOST: str = "memcached:11211"
     ENVIRONMENT: str = "production"
     REDIS_HOST: str = "redis:6379"
+    # connections per event loop, callers wait up to REDIS_POOL_TIMEOUT seconds for one when all are in use
+    REDIS_POOL_SIZE: int = 50
+    REDIS_POOL_TIMEOUT: int = 20
+    # seconds a lock outlives a holder that stopped extending it
+    REDIS_LOCK_EXPIRE: int = 60
+    MEMCACHED_POOL_SIZE: int = 16
+    # keep reading cache entries written under the old 32-bit stable_hash keys until they expire
+    CACHE_READ_LEGACY_KEYS: bool = True
 
     INGEST_BATCH_SIZE: int = 500
+    INGEST_STREAM_MAX_LINE_BYTES: int = 1024 * 1024
+    INGEST_JOB_EXPIRE: int = 3600 * 24
+    INGEST_JOB_MAX_ERRORS: int = 100
     DELETE_BATCH_SIZE: int = 100
     COLLABORATIVE_SHARDS_COUNT: int = 4
     COLLABORATIVE_REPLICAS_COUNT: int = 1
@@ -20,6 +31,18 @@ class Settings(BaseSettings):
     EVENTS_CLEANUP_LONE_EVENTS_AFTER: str = "24h"
     EVENTS_CLEANUP_LONE_EVENTS_MIN_COUNT: int = 2
     EVENTS_CLEANUP_MAX_PER_PERSON_AND_TYPE: int = 25
+    RETENTION_BATCH_SIZE: int = 5000
+    # pause after every retention batch for this many times as long as the batch took
+    RETENTION_THROTTLE_RATIO: float = 1.0
+    RETENTION_MAX_SECONDS: int = 600
+    RETENTION_MAX_ROWS_PER_RUN: int = 500000
+    # seconds a replaced redis index generation is kept for searches that still run against it
+    REDIS_INDEX_GENERATION_GC_DELAY: int = 60
+    REDIS_INDEXER_PIPELINE_BYTES: int = 4 * 1024 * 1024
+    REDIS_INDEXER_PIPELINES_IN_FLIGHT: int = 4
+    REDIS_INDEXER_CHANGES_BATCH_SIZE: int = 5000
+    # seconds between comparisons of the redis index checksums with postgres
+    REDIS_INDEXER_RECONCILE_INTERVAL: int = 600
     ORGANIZATION: str = "nextlike-org"
     EVENT_TO_RECOMMENDATION_HISTORY_THRESHOLD_MINUTES = 3600 * 10
 
@@ -32,6 +55,46 @@ class Settings(BaseSettings):
     AGGREGATIONS_LIGHT_MODEL: str = "openai:gpt-4o-mini"
 
     EMBEDDINGS_PROVIDER_URL: str = "http://embeddings_provider:80"
+    EMBEDDINGS_CACHE_DTYPE: str = "float32"
+    EMBEDDINGS_CACHE_EXPIRE: int = 3600 * 24
+    EMBEDDINGS_PIPELINE_BATCH_SIZE: int = 500
+    EMBEDDINGS_PIPELINE_CONCURRENCY: int = 8
+    EMBEDDINGS_PIPELINE_MAX_ATTEMPTS: int = 6
+    # items refreshed per maintain_collection step, large enough to keep the embeddings pipeline busy
+    MAINTAIN_COLLECTION_CHUNK_SIZE: int = 5000
+    # a failed index rebuild is retried after this delay, doubled on every further failure up to the max
+    INDEX_REBUILD_BACKOFF_SECONDS: int = 300
+    INDEX_REBUILD_MAX_BACKOFF_SECONDS: int = 6 * 3600
+
+    ## Memory indexer
+    MEMORY_INDEXER_REFRESH_SECONDS: int = 10
+    MEMORY_INDEXER_REFRESH_OVERLAP_SECONDS: int = 60
+    MEMORY_INDEXER_IVF_MIN_ITEMS: int = 10000
+    MEMORY_INDEXER_IVF_NPROBE: int = 8
+
+    HYDRATION_CACHE_SIZE: int = 50000
+    HYDRATION_CACHE_EXPIRE: int = 300
+    HYDRATION_VERSION_TTL: float = 1
+
+    SEARCH_ENGINE_TIMEOUT_SECONDS: float = 10
+    # threads that search engines run on, each holding a database connection while it runs
+    SEARCH_ENGINE_CONNECTIONS: int = 20
+
+    SEARCH_CACHE_L1_SIZE: int = 10000
+    SEARCH_CACHE_L1_EXPIRE: int = 30
+    SEARCH_CACHE_COMPRESS_ABOVE: int = 2048
+
+    COOCCURRENCE_MAX_NEIGHBOURS: int = 200
+    COOCCURRENCE_MAX_EVENTS_PER_PERSON: int = 500
+    COOCCURRENCE_BUILD_WINDOW: str = "1d"
+    COOCCURRENCE_INGEST_LAG: str = "1m"
+    COOCCURRENCE_FULL_REBUILD_AFTER: str = "7d"
+
+    ITEM_SIMILARITY_MAX_NEIGHBOURS: int = 100
+    ITEM_SIMILARITY_EVENTS_CHUNK_SIZE: int = 100000
+    ITEM_SIMILARITY_BATCH_SIZE: int = 1000
+    ITEM_SIMILARITY_BM25_K1: float = 100
+    ITEM_SIMILARITY_BM25_B: float = 0.8
 
     def is_testing(self):
         return self.ENVIRONMENT == "testing"
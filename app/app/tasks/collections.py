@@ -1,34 +1,82 @@
-import asyncio
-
 from app.celery_app import celery_app
+from app.core.indexers.redis_indexer import drop_generation
+from app.core.retention import RetentionRunner
 from app.db.session import Database
 from app.models import Collection
 from app.resources.database import m
-from app.utils.base import all_query_per_chunk
+from app.resources.manager import run_async
+from app.resources.rdb import get_redis
+from app.settings import get_settings
+from app.utils.base import keyset_query_per_chunk
 from sqlalchemy import text, or_
 
 from app.utils.logging import log
 from app.utils.temporal_lock import RedisTemporalLock
 
 
+# a failing rebuild leaves the collection dirty, and is retried with a growing delay instead of on every run
+async def recreate_index(collection):
+    client = get_redis()
+    backoff_key = f"maintain-collection:{collection.id}:rebuild-backoff"
+    failures_key = f"maintain-collection:{collection.id}:rebuild-failures"
+    if await client.exists(backoff_key):
+        return
+
+    settings = get_settings()
+    try:
+        await collection.get_indexer().recreate()
+    except Exception as e:
+        failures = await client.incr(failures_key)
+        await client.expire(failures_key, 2 * settings.INDEX_REBUILD_MAX_BACKOFF_SECONDS)
+        delay = min(settings.INDEX_REBUILD_BACKOFF_SECONDS * 2 ** (failures - 1),
+                    settings.INDEX_REBUILD_MAX_BACKOFF_SECONDS)
+        await client.set(backoff_key, 1, ex=delay)
+        log("error", f"Beat.maintain_collection: Rebuilding the index of {collection.name} failed {failures} times, "
+                     f"retrying in {delay}s: {e}")
+        return
+
+    await client.delete(failures_key)
+    collection.is_index_dirty = False
+    collection.flush()
+
+
 @celery_app.task
 def maintain_collection(collection_id: int):
     async def execute():
-        async with RedisTemporalLock(f"maintain-collection:{collection_id}", expire=3600 * 12) as unlocked:
+        async with RedisTemporalLock(f"maintain-collection:{collection_id}") as unlocked:
             if unlocked:
                 with Database() as db:
                     collection = Collection.objects(db).get(collection_id)
 
                     if collection.is_index_dirty:
-                        await collection.get_indexer().recreate()
-                        collection.is_index_dirty = False
-                        collection.flush()
+                        await recreate_index(collection)
 
-                    for chunk in all_query_per_chunk(
+                    for chunk in keyset_query_per_chunk(
                             m.Item.objects(db).filter(m.Item.collection_id == collection.id,
                                                       or_(m.Item.is_index_dirty == True,
-                                                          m.Item.is_embeddings_dirty == True)), 500):
+                                                          m.Item.is_embeddings_dirty == True)),
+                            m.Item.id, get_settings().MAINTAIN_COLLECTION_CHUNK_SIZE):
                         await m.Collection.objects(db).refresh_items(collection, chunk)
                         log("info", "Beat.clean_dirty_items: Cleaned %i dirty items" % len(chunk))
 
-    asyncio.run(execute())
+    run_async(execute())
+
+
+@celery_app.task
+def apply_collection_retention(collection_id: int):
+    async def execute():
+        async with RedisTemporalLock(f"apply-collection-retention:{collection_id}") as unlocked:
+            if unlocked:
+                with Database() as db:
+                    collection = Collection.objects(db).get(collection_id)
+                    await RetentionRunner(db, collection).apply_all()
+
+    run_async(execute())
+
+
+@celery_app.task
+def drop_redis_index_generation(collection_id: int, generation: int):
+    async def execute():
+        await drop_generation(get_redis(), collection_id, generation)
+
+    run_async(execute())
@@ -1,16 +1,20 @@
-import asyncio
 from typing import List
 
 from app.celery_app import celery_app
 from app.db.session import Database
 from app.models import Event
 from app.models.collection import Collection
+from app.core.ingest import IngestJob
+from app.core.searcher.item_similarity import ItemSimilarityBuilder
 from app.models.search.bulk_creators import EventsBulkCreator
+from app.models.search.events.item_cooccurrence import ItemCooccurrence
+from app.resources.manager import run_async
+from app.utils.temporal_lock import RedisTemporalLock
 from app.core.types import SimpleEvent
 
 
 @celery_app.task
-async def ingest_events(collection_id: int, events: List[SimpleEvent]):
+def ingest_events(collection_id: int, events: List[SimpleEvent], job_id: str = None):
     async def execute():
         with Database() as db:
             collection = Collection.objects(db).get(collection_id)
@@ -27,7 +31,10 @@ async def ingest_events(collection_id: int, events: List[SimpleEvent]):
                 )
             await creator.flush()
 
-    asyncio.run(execute())
+        if job_id:
+            await IngestJob(job_id).increment(processed=len(events))
+
+    run_async(execute())
 
 
 @celery_app.task
@@ -37,4 +44,29 @@ def cleanup_events(collection_id: int):
             collection = Collection.objects(db).get(collection_id)
             Event.objects(db).filter(Event.collection_id == collection.id).delete()
 
-    asyncio.run(execute())
+    run_async(execute())
+
+
+@celery_app.task
+def build_item_cooccurrences(collection_id: int):
+    async def execute():
+        async with RedisTemporalLock(f"build-item-cooccurrences:{collection_id}") as unlocked:
+            if unlocked:
+                with Database() as db:
+                    collection = Collection.objects(db).get(collection_id)
+                    ItemCooccurrence.objects(db).build(collection)
+
+    run_async(execute())
+
+
+@celery_app.task
+def build_item_similarities(collection_id: int):
+    async def execute():
+        async with RedisTemporalLock(f"build-item-similarities:{collection_id}") as unlocked:
+            if unlocked:
+                with Database() as db:
+                    collection = Collection.objects(db).get(collection_id)
+                    for algorithm in collection.config.item_similarity_algorithms:
+                        ItemSimilarityBuilder(db, collection).build(algorithm)
+
+    run_async(execute())
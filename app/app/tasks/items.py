@@ -1,4 +1,3 @@
-import asyncio
 from typing import List, Union
 
 from app.celery_app import celery_app
@@ -6,13 +5,16 @@ from app.db.session import Database
 from app.models import Item
 from app.models.collection import Collection
 from app.models.search.bulk_creators import ItemsBulkCreator
+from app.core.ingest import IngestJob
+from app.core.searcher.hydration import invalidate_items
 from app.core.types import SimpleItem
 from app.resources.database import m
+from app.resources.manager import run_async
 
 
 @celery_app.task
 def ingest_items(
-    collection_id: int, items: List[SimpleItem], recalculate_vectors: bool, refresh: bool = False
+    collection_id: int, items: List[SimpleItem], recalculate_vectors: bool, refresh: bool = False, job_id: str = None
 ):
     async def execute():
         with Database() as db:
@@ -30,7 +32,10 @@ def ingest_items(
 
             await creator.flush()
 
-    asyncio.run(execute())
+        if job_id:
+            await IngestJob(job_id).increment(processed=len(items), **creator.stats)
+
+    run_async(execute())
 
 
 @celery_app.task
@@ -38,11 +43,15 @@ def delete_items(collection_id: int, external_ids: List[Union[str, int]]):
     async def execute():
         with Database() as db:
             collection = Collection.objects(db).get(collection_id)
-            Item.objects(db).filter(
+            items_query = Item.objects(db).filter(
                 m.Item.collection_id == collection.id,
                 m.Item.external_id.in_(external_ids),
-            ).delete()
+            )
+            deleted_item_ids = [item.id for item in items_query.with_entities(m.Item.id)]
+            items_query.delete()
             db.commit()
             db.flush()
 
-    asyncio.run(execute())
+            invalidate_items(collection.id, deleted_item_ids)
+
+    run_async(execute())
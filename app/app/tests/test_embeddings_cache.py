@@ -0,0 +1,88 @@
+from contextlib import nullcontext
+
+import numpy as np
+
+from app.easytests import EasyTest
+from app.llm.embeddings import EmbeddingsCache, decode_cached_embedding, encode_cached_embedding
+from app.resources.cache import SafeCache
+from app.tests.config import nextlike_easytest_config
+from app.utils.hashing import hashed_key, legacy_hashed_key
+
+
+class DictCache(object):
+    def __init__(self, values):
+        self.values = values
+
+    def get_many(self, keys):
+        return {key: self.values[key] for key in keys if key in self.values}
+
+    def set_many(self, values, expire=0):
+        self.values.update(values)
+
+
+class DictEmbeddingsCache(EmbeddingsCache):
+    def __init__(self, model, values):
+        super().__init__(model)
+        self.cache = SafeCache(DictCache(values))
+
+    def open(self):
+        return nullcontext(self.cache)
+
+
+class TestEmbeddingsCacheCodec(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"dtype": "float32", "dims": 1536, "bytes_per_value": 4, "tolerance": 0},
+            {"dtype": "float16", "dims": 1536, "bytes_per_value": 2, "tolerance": 1e-3},
+            {"dtype": "float32", "dims": 3072, "bytes_per_value": 4, "tolerance": 0},
+        ]
+
+    async def test(self, dtype, dims, bytes_per_value, tolerance):
+        vector = np.random.default_rng(0).uniform(-1, 1, size=dims).astype(np.float32).tolist()
+        value = encode_cached_embedding(vector, dtype)
+
+        self.should("store a marker and the packed values", len(value), 1 + dims * bytes_per_value)
+
+        decoded = decode_cached_embedding(value)
+        self.should("decode as many values", len(decoded), dims)
+        self.should("decode into floats", isinstance(decoded[0], float))
+        self.should("round trip within the precision of the dtype", bool(np.allclose(decoded, vector, rtol=tolerance, atol=tolerance)))
+
+
+class TestEmbeddingsCacheLegacyValues(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"value": [0.1, 0.2, 0.3], "expected": [0.1, 0.2, 0.3]},
+            {"value": b"x" + np.zeros(3, dtype=np.float32).tobytes(), "expected": None},
+            {"value": b"", "expected": None},
+        ]
+
+    async def test(self, value, expected):
+        self.should("pass lists through and skip unknown values", decode_cached_embedding(value), expected)
+
+
+class TestEmbeddingsCacheLegacyKeys(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"model": "text-embedding-3-small", "fresh": {"a car": [0.5, 0.25]}, "legacy": {"a bike": [0.1, 0.2]}},
+            {"model": "text-embedding-3-small", "fresh": {}, "legacy": {}},
+        ]
+
+    async def test(self, model, fresh, legacy):
+        prefix = f"embeddings:{model}"
+        values = {hashed_key(prefix, string): encode_cached_embedding(vector, "float32")
+                  for string, vector in fresh.items()}
+        values.update({legacy_hashed_key(prefix, string): vector for string, vector in legacy.items()})
+        stored = dict(values)
+
+        cache = DictEmbeddingsCache(model, values)
+        embeddings = cache.get_many(list(fresh) + list(legacy) + ["a boat"])
+
+        self.should("serve the new and the legacy hits", embeddings, {**fresh, **legacy})
+        self.should("not copy legacy hits to the new key", cache.cache.cache.values, stored)
@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+from app.easytests import EasyTest
+from app.exceptions.embeddings import EmbeddingsRetryableError
+from app.llm.embeddings_pipeline import (
+    AdaptiveLimiter, EmbeddingsPipeline, RateLimits, parse_rate_limit_headers, parse_reset_duration
+)
+from app.tests.config import nextlike_easytest_config
+
+
+class TestParseResetDuration(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"value": "1s", "seconds": 1},
+            {"value": "120ms", "seconds": 0.12},
+            {"value": "6m0s", "seconds": 360},
+            {"value": "1h2m3.5s", "seconds": 3723.5},
+            {"value": "", "seconds": None},
+            {"value": None, "seconds": None},
+        ]
+
+    async def test(self, value, seconds):
+        parsed = parse_reset_duration(value)
+        self.should("parse the duration", parsed if seconds is None else round(parsed, 6), seconds)
+
+
+class TestParseRateLimitHeaders(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {
+                "headers": {
+                    "x-ratelimit-remaining-requests": "499", "x-ratelimit-remaining-tokens": "999000",
+                    "x-ratelimit-reset-requests": "120ms", "x-ratelimit-reset-tokens": "6m0s",
+                },
+                "limits": RateLimits(
+                    remaining_requests=499, remaining_tokens=999000, reset_requests=0.12, reset_tokens=360, tokens=10
+                ),
+            },
+            {"headers": {"x-ratelimit-remaining-requests": "n/a"}, "limits": RateLimits(tokens=10)},
+        ]
+
+    async def test(self, headers, limits):
+        self.should("read the limits", parse_rate_limit_headers(headers, tokens=10), limits)
+
+
+class TestAdaptiveLimiter(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {
+                "limits": RateLimits(remaining_requests=100, remaining_tokens=10000, tokens=10),
+                "concurrency": 4, "expected": 5, "paused": False,
+            },
+            {
+                "limits": RateLimits(remaining_requests=100, remaining_tokens=10000, tokens=10),
+                "concurrency": 8, "expected": 8, "paused": False,
+            },
+            {
+                "limits": RateLimits(remaining_requests=2, reset_requests=30),
+                "concurrency": 4, "expected": 3, "paused": True,
+            },
+            {
+                "limits": RateLimits(remaining_requests=100, remaining_tokens=30, reset_tokens=30, tokens=10),
+                "concurrency": 4, "expected": 3, "paused": True,
+            },
+            {
+                "limits": RateLimits(remaining_requests=0, reset_requests=30),
+                "concurrency": 1, "expected": 1, "paused": True,
+            },
+        ]
+
+    async def test(self, limits, concurrency, expected, paused):
+        limiter = AdaptiveLimiter(8)
+        limiter.concurrency = concurrency
+
+        limiter.on_success(limits)
+
+        self.should("adapt the concurrency", limiter.concurrency, expected)
+        self.should("pause when the limits run out", limiter.paused_until > time.monotonic(), paused)
+
+
+class TestAdaptiveLimiterRateLimited(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"concurrency": 8, "retry_after": 5, "expected": 4},
+            {"concurrency": 1, "retry_after": None, "expected": 1},
+        ]
+
+    async def test(self, concurrency, retry_after, expected):
+        limiter = AdaptiveLimiter(8)
+        limiter.concurrency = concurrency
+
+        limiter.on_rate_limited(retry_after)
+
+        self.should("halve the concurrency", limiter.concurrency, expected)
+        pause = limiter.paused_until - time.monotonic()
+        self.should("pause for the retry after", 0 < pause <= (retry_after or 1))
+
+
+class TestAdaptiveLimiterConcurrency(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"concurrency": 2, "tasks": 6},
+        ]
+
+    async def test(self, concurrency, tasks):
+        limiter = AdaptiveLimiter(concurrency)
+        active = []
+
+        async def run():
+            await limiter.acquire()
+            try:
+                active.append(limiter.active)
+                await asyncio.sleep(0.01)
+            finally:
+                await limiter.release()
+
+        await asyncio.gather(*[run() for _ in range(tasks)])
+
+        self.should("never run more than the concurrency", max(active), concurrency)
+        self.should("release every slot", limiter.active, 0)
+
+
+class FlakyCalculator(object):
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    async def get_embeddings_from_strings_async(self, strings):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise EmbeddingsRetryableError("rate limited", retry_after=0.01, rate_limited=True)
+        return [[float(len(string))] for string in strings], RateLimits()
+
+
+class TestEmbeddingsPipeline(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"strings": ["a", "bb", "ccc", "dddd", "eeeee"], "batch_size": 2, "failures": 0},
+            {"strings": ["a", "bb", "ccc"], "batch_size": 2, "failures": 2},
+        ]
+
+    async def test(self, strings, batch_size, failures):
+        calculator = FlakyCalculator(failures)
+        pipeline = EmbeddingsPipeline(calculator, batch_size=batch_size, concurrency=2)
+        vectors = [None] * len(strings)
+
+        async def on_batch(indexes, batch_vectors):
+            for index, vector in zip(indexes, batch_vectors):
+                vectors[index] = vector
+
+        await pipeline.run(strings, on_batch)
+
+        self.should("embed every string in place", vectors, [[float(len(string))] for string in strings])
+        self.should("retry the failed batches", calculator.calls, -(-len(strings) // batch_size) + failures)
@@ -0,0 +1,77 @@
+import hashlib
+
+from app.easytests import EasyTest
+from app.resources.cache import SafeCache
+from app.tests.config import nextlike_easytest_config
+from app.utils.base import stable_hash
+from app.utils.hashing import hashed_key, legacy_hashed_key
+
+
+class DictCache(object):
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, expire=0):
+        self.values[key] = value
+
+
+class TestHashedKey(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"prefix": "embeddings:model", "parts": ["a car"]},
+            {"prefix": "llm.function_query:model", "parts": ["a question", "[{'name': 'f'}]"]},
+            {"prefix": "search", "parts": [b"bytes", 12]},
+        ]
+
+    async def test(self, prefix, parts):
+        key = hashed_key(prefix, *parts)
+        digests = key[len(prefix) + 1:].split(":")
+
+        self.should("start with the prefix", key.startswith(prefix + ":"))
+        self.should("hash every part", len(digests), len(parts))
+        self.should("use 128 bit digests", all(len(digest) == 32 for digest in digests))
+        self.should("hash parts as their utf-8 text", digests[0], hashlib.blake2b(
+            parts[0] if isinstance(parts[0], bytes) else str(parts[0]).encode("utf-8"), digest_size=16
+        ).hexdigest())
+        self.should("be stable", key, hashed_key(prefix, *parts))
+        self.should("tell parts apart", key != hashed_key(prefix, *parts[::-1]) or len(set(parts)) == 1)
+
+
+class TestLegacyHashedKey(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"prefix": "llm.single_query:model", "parts": ["a question"]},
+            {"prefix": "GroqLLM.function_query:model", "parts": ["a question", "[]"]},
+        ]
+
+    async def test(self, prefix, parts):
+        self.should(
+            "keep the keys written before the new hashing",
+            legacy_hashed_key(prefix, *parts), ":".join([prefix] + [str(stable_hash(part)) for part in parts])
+        )
+        self.should("differ from the new keys", legacy_hashed_key(prefix, *parts) != hashed_key(prefix, *parts))
+
+
+class TestGetOrLegacy(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"values": {"new": "fresh", "old": "stale"}, "expected": "fresh"},
+            {"values": {"old": "stale"}, "expected": "stale"},
+            {"values": {}, "expected": None},
+        ]
+
+    async def test(self, values, expected):
+        cache = SafeCache(DictCache(dict(values)))
+
+        self.should("prefer the new key over the legacy one", cache.get_or_legacy("new", "old"), expected)
+        self.should("not copy legacy hits to the new key", cache.cache.values, values)
+        self.should("skip the legacy lookup without a legacy key", cache.get_or_legacy("new", None), values.get("new"))
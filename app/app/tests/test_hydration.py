@@ -0,0 +1,54 @@
+from app.core.searcher.hydration import ItemHydrator, get_collection_version, invalidate_items, publish_versions
+from app.easytests import EasyTest
+from app.resources.database import m
+from app.tests.config import nextlike_easytest_config
+
+
+class TestHydrationInvalidation(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {
+                "collection": "hydration_test_collection",
+                "items": [
+                    {"id": "1", "fields": {"make": "BMW"}, "description": "BMW X5"},
+                    {"id": "2", "fields": {"make": "Audi"}, "description": "Audi A4"},
+                    {"id": "3", "fields": {"make": "Fiat"}, "description": "Fiat Panda"},
+                ]
+            },
+        ]
+
+    async def test(self, collection, items):
+        self.destroy_later("collection", lambda: m.Collection.objects(self.db).delete_by_name(collection))
+
+        await self.request(
+            "post",
+            "/api/items",
+            json={"items": items, "collection": collection, "sync": True},
+            expected_status=200
+        )
+
+        collection = m.Collection.objects(self.db).get_by_name(collection)
+        db_items = {item.external_id: item for item in collection.items}
+        hits = [(db_items[item["id"]].id, None) for item in items]
+
+        hydrated = ItemHydrator(self.db, collection).hydrate(hits)
+        self.should("hydrate every item", len(hydrated), len(items))
+
+        # no-op writes, like resyncs of unchanged items, keep the collection version and the cached items
+        version = get_collection_version(collection.id)
+        invalidate_items(collection.id, [])
+        self.should("not publish a version for unchanged items", get_collection_version(collection.id), version)
+
+        # a worker changes the items behind the api process, whose cache it can only reach through the versions
+        updated, deleted, untouched = db_items["1"], db_items["2"], db_items["3"]
+        m.Item.objects(self.db).filter(m.Item.id == updated.id).update({m.Item.fields: {"make": "Mini"}})
+        m.Item.objects(self.db).filter(m.Item.id == deleted.id).delete()
+        self.db.commit()
+        publish_versions(collection.id, [updated.id, deleted.id])
+
+        rehydrated = ItemHydrator(self.db, collection).hydrate(hits)
+        self.should("see the update of the worker", rehydrated[updated.id].fields, {"make": "Mini"})
+        self.should("not return the item deleted by the worker", deleted.id not in rehydrated)
+        self.should("keep the untouched items cached", rehydrated[untouched.id] is hydrated[untouched.id])
@@ -0,0 +1,105 @@
+import gzip
+import json
+
+from fastapi import HTTPException
+
+from app.core.ingest import IngestJob, iter_ndjson_lines, stream_ingest
+from app.core.types import SimpleEvent
+from app.easytests import EasyTest
+from app.settings import get_settings
+from app.tests.config import nextlike_easytest_config
+
+
+async def iter_chunks(body: bytes, chunk_size):
+    for start in range(0, len(body), chunk_size):
+        yield body[start:start + chunk_size]
+
+
+async def read_lines(body, chunk_size, gzipped=False):
+    return [line async for line in iter_ndjson_lines(iter_chunks(body, chunk_size), gzipped)]
+
+
+class RecordedIngestJob(IngestJob):
+    def __init__(self):
+        super().__init__("test")
+        self.counters = {}
+        self.errors = []
+        self.status = "uploading"
+
+    async def increment(self, **counters):
+        for counter, value in counters.items():
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    async def add_errors(self, errors):
+        self.errors.extend(errors)
+
+    async def set_status(self, status):
+        self.status = status
+
+
+LINES = [b'{"person": "1", "item": "a"}', b'{"person": "2", "item": "b"}', b'{"person": "3", "item": "c"}']
+
+
+class TestIterNdjsonLines(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"body": b"\n".join(LINES), "gzipped": False, "chunk_size": 7},
+            {"body": b"\n".join(LINES) + b"\n", "gzipped": False, "chunk_size": 1000},
+            {"body": b"\n\n".join(LINES) + b"\n \n", "gzipped": False, "chunk_size": 3},
+            {"body": gzip.compress(b"\n".join(LINES)), "gzipped": True, "chunk_size": 5},
+            {"body": gzip.compress(b"\n".join(LINES) + b"\n"), "gzipped": True, "chunk_size": 1000},
+        ]
+
+    async def test(self, body, gzipped, chunk_size):
+        self.should("split the body into its non blank lines", await read_lines(body, chunk_size, gzipped), LINES)
+
+
+class TestIterNdjsonLinesLimits(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        long_line = b'{"person": "' + b"x" * get_settings().INGEST_STREAM_MAX_LINE_BYTES + b'"}'
+        return [
+            {"body": b"\n".join([LINES[0], long_line, LINES[1]]), "gzipped": False, "status": 413},
+            {"body": b"\n".join([LINES[0], long_line]), "gzipped": False, "status": 413},
+            {"body": gzip.compress(b"\n".join([long_line, LINES[0]])), "gzipped": True, "status": 413},
+            {"body": b"not gzip at all", "gzipped": True, "status": 400},
+        ]
+
+    async def test(self, body, gzipped, status):
+        try:
+            await read_lines(body, 64 * 1024, gzipped)
+            self.should("reject the body", False)
+        except HTTPException as e:
+            self.should("reject the body with the right status", e.status_code, status)
+
+
+class TestStreamIngest(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {
+                "lines": [LINES[0], b"not json", b'{"item": "no person"}', LINES[1]],
+                "valid": 2, "invalid_lines": [2, 3], "status": "uploaded",
+            },
+            {
+                "lines": [LINES[0], b'{"person": "' + b"x" * get_settings().INGEST_STREAM_MAX_LINE_BYTES + b'"}'],
+                "valid": 0, "invalid_lines": [2], "status": "failed",
+            },
+        ]
+
+    async def test(self, lines, valid, invalid_lines, status):
+        job = RecordedIngestJob()
+        batches = []
+
+        try:
+            await stream_ingest(iter_chunks(b"\n".join(lines), 1024), False, SimpleEvent, job, batches.append)
+        except HTTPException:
+            pass
+
+        self.should("end with the job status", job.status, status)
+        self.should("schedule the valid lines", sum(len(batch) for batch in batches), valid)
+        self.should("record an error per failed line", [json.loads(error)["line"] for error in job.errors], invalid_lines)
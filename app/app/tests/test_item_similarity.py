@@ -0,0 +1,101 @@
+from collections import namedtuple
+
+import numpy as np
+
+from app.core.searcher.item_similarity import ItemSimilarityBuilder
+from app.easytests import EasyTest
+from app.tests.config import nextlike_easytest_config
+
+EventRow = namedtuple("EventRow", ["person_external_id", "item_external_id", "weight"])
+
+
+class EventsItemSimilarityBuilder(ItemSimilarityBuilder):
+    def __init__(self, events, chunk_size=2):
+        super().__init__(db=None, collection=None)
+        self.events = [EventRow(*event) for event in events]
+        self.chunk_size = chunk_size
+
+    def stream_events(self):
+        for start in range(0, len(self.events), self.chunk_size):
+            yield self.events[start:start + self.chunk_size]
+
+    def get_similarities(self, algorithm):
+        vectors = self.get_items_vectors(self.get_persons_items_matrix(), algorithm)
+        similarities = self.get_similarities_block(vectors, 0, vectors.shape[0], algorithm).toarray()
+        return {
+            (item, other): similarities[self.item_indexes[item], self.item_indexes[other]]
+            for item in self.item_indexes for other in self.item_indexes
+        }
+
+
+EVENTS = [
+    ("anna", "a", 1), ("anna", "b", 1), ("anna", "a", 2),
+    ("bob", "a", 1), ("bob", "b", None), ("bob", "c", 1),
+    ("carl", "c", 1), ("carl", "d", 1),
+]
+
+
+class TestItemSimilarityMatrix(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"events": EVENTS, "chunk_size": 1},
+            {"events": EVENTS, "chunk_size": 3},
+            {"events": EVENTS, "chunk_size": 100},
+        ]
+
+    async def test(self, events, chunk_size):
+        builder = EventsItemSimilarityBuilder(events, chunk_size)
+        matrix = builder.get_persons_items_matrix()
+
+        self.should("have a row per person and a column per item", matrix.shape, (3, 4))
+        self.should("sum repeated events", matrix[builder.person_indexes["anna"], builder.item_indexes["a"]], 3)
+        self.should("weigh events without a weight as 1", matrix[builder.person_indexes["bob"], builder.item_indexes["b"]], 1)
+        self.should("hold one entry per person and item", matrix.nnz, 7)
+
+
+class TestItemSimilarityScores(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"algorithm": "jaccard", "pair": ("a", "b"), "expected": 1.0},
+            {"algorithm": "jaccard", "pair": ("a", "c"), "expected": 1 / 3},
+            {"algorithm": "jaccard", "pair": ("a", "d"), "expected": 0.0},
+            {"algorithm": "cosine", "pair": ("c", "d"), "expected": 1 / np.sqrt(2)},
+            {"algorithm": "cosine", "pair": ("a", "d"), "expected": 0.0},
+        ]
+
+    async def test(self, algorithm, pair, expected):
+        similarities = EventsItemSimilarityBuilder(EVENTS).get_similarities(algorithm)
+
+        self.should("score the pair", bool(np.isclose(similarities[pair], expected, atol=1e-6)))
+        self.should("be symmetric", bool(np.isclose(similarities[pair], similarities[pair[::-1]], atol=1e-6)))
+        self.should("not relate items to themselves", all(similarities[(item, item)] == 0 for item in "abcd"))
+
+
+class TestItemSimilarityNeighbours(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"max_neighbours": 1},
+            {"max_neighbours": 100},
+        ]
+
+    async def test(self, max_neighbours):
+        builder = EventsItemSimilarityBuilder(EVENTS)
+        builder.settings = builder.settings.copy(update={"ITEM_SIMILARITY_MAX_NEIGHBOURS": max_neighbours})
+        vectors = builder.get_items_vectors(builder.get_persons_items_matrix(), "jaccard")
+        similarities = builder.get_similarities_block(vectors, 0, vectors.shape[0], "jaccard")
+
+        external_ids = sorted(builder.item_indexes, key=builder.item_indexes.get)
+        neighbours = builder.get_top_neighbours(similarities, 0, external_ids)
+
+        per_item = {}
+        for item, other, score in neighbours:
+            per_item.setdefault(item, []).append((other, score))
+
+        self.should("keep at most max_neighbours per item", max(len(others) for others in per_item.values()) <= max_neighbours)
+        self.should("keep the best neighbour", max(per_item["a"], key=lambda other: other[1])[0], "b")
@@ -0,0 +1,79 @@
+import time
+
+from app.easytests import EasyTest
+from app.tests.config import nextlike_easytest_config
+from app.utils.lru import LRUCache
+
+
+class TestLRUCacheEviction(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"maxsize": 3, "keys": ["a", "b", "c", "d"], "touched": None, "evicted": "a"},
+            {"maxsize": 3, "keys": ["a", "b", "c", "d"], "touched": "a", "evicted": "b"},
+        ]
+
+    async def test(self, maxsize, keys, touched, evicted):
+        cache = LRUCache(maxsize=maxsize)
+        for key in keys[:maxsize]:
+            cache.set(key, key.upper())
+
+        if touched:
+            cache.get(touched)
+
+        for key in keys[maxsize:]:
+            cache.set(key, key.upper())
+
+        self.should("not grow past its size", len(cache), maxsize)
+        self.should("evict the least recently used key", cache.get(evicted), None)
+        self.should("keep the rest", all(cache.get(key) == key.upper() for key in keys if key != evicted))
+
+
+class TestLRUCacheExpiry(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"expire": 0.05, "set_expire": None, "expired": True},
+            {"expire": None, "set_expire": 0.05, "expired": True},
+            {"expire": 0.05, "set_expire": 60, "expired": False},
+            {"expire": None, "set_expire": None, "expired": False},
+            {"expire": 0, "set_expire": None, "expired": True},
+            {"expire": 60, "set_expire": 0, "expired": True},
+        ]
+
+    async def test(self, expire, set_expire, expired):
+        cache = LRUCache(expire=expire)
+        cache.set("key", "value", expire=set_expire)
+        if set_expire == 0 or (set_expire is None and expire == 0):
+            self.should("not store entries that expire at once", len(cache), 0)
+        else:
+            self.should("serve the value before it expires", cache.get("key"), "value")
+
+        time.sleep(0.1)
+        self.should("honour the expiry", cache.get("key") is None, expired)
+
+
+class TestLRUCacheDelete(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"keys": [(1, 1), (1, 2), (2, 1)], "collection_id": 1, "kept": [(2, 1)]},
+        ]
+
+    async def test(self, keys, collection_id, kept):
+        cache = LRUCache()
+        for key in keys:
+            cache.set(key, True)
+
+        cache.delete_where(lambda key: key[0] == collection_id)
+        self.should("delete the matching keys", sorted(cache.entries.keys()), kept)
+
+        cache.get(kept[0])
+        cache.get((collection_id, 1))
+        stats = cache.stats()
+        self.should("count hits", stats["hits"], 1)
+        self.should("count misses", stats["misses"], 1)
+        self.should("report the hit rate", stats["hit_rate"], 0.5)
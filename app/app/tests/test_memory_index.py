@@ -0,0 +1,148 @@
+import numpy as np
+
+from app.core.indexers.memory_indexer import MemoryIndex
+from app.easytests import EasyTest
+from app.resources.database import m
+from app.tests.config import nextlike_easytest_config
+
+
+def get_vectors(count, dims, clusters=16, seed=0):
+    random = np.random.default_rng(seed)
+    centers = random.normal(size=(clusters, dims))
+    return centers[random.integers(0, clusters, size=count)] + random.normal(scale=0.3, size=(count, dims))
+
+
+def fill(index, vectors, first_id=1):
+    for i, vector in enumerate(vectors):
+        index.upsert(first_id + i, str(first_id + i), "item %s" % i, "hash", {"item"}, {"i": i}, vector)
+
+
+class TestMemoryIndexUpsertAndRemove(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"count": 10},
+            {"count": 3000},
+        ]
+
+    async def test(self, count):
+        index = MemoryIndex(8)
+        vectors = get_vectors(count, 8)
+        fill(index, vectors)
+
+        self.should("hold every item", len(index), count)
+        self.should("have grown past its capacity", index.matrix.shape[0] >= count)
+        self.should("normalize the vectors", np.allclose(np.linalg.norm(index.matrix[:count], axis=1), 1, atol=1e-5))
+
+        index.upsert(1, "1", "updated", "other hash", {"updated"}, {"i": -1}, None)
+        self.should("not duplicate updated items", len(index), count)
+        self.should("update in place", index.descriptions[index.rows[1]], "updated")
+        self.should("drop the vector of items without one", not index.has_vector[index.rows[1]])
+
+        index.remove(2)
+        index.remove(2)
+        self.should("not count removed items", len(index), count - 1)
+        self.should("forget removed items", 2 not in index.rows)
+        self.should("keep the rows of removed items until compacted", index.size, count)
+        self.should("sum the id hashes of the live items", index.id_hashes,
+                    sum(m.Item.get_id_hash(item_id) for item_id in index.rows))
+
+        # swapping items for as many others keeps the count, which is why refresh compares the id hashes as well
+        id_hashes = index.id_hashes
+        index.remove(3)
+        fill(index, vectors[:1], first_id=count + 1)
+        self.should("keep the count when items are swapped", len(index), count - 1)
+        self.should("change the id hashes when items are swapped", index.id_hashes != id_hashes)
+
+        index.compact()
+        self.should("keep the id hashes through compaction", index.id_hashes,
+                    sum(m.Item.get_id_hash(item_id) for item_id in index.rows))
+
+
+class TestMemoryIndexCompact(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"count": 100, "removed": range(1, 101, 2)},
+            {"count": 100, "removed": []},
+        ]
+
+    async def test(self, count, removed):
+        index = MemoryIndex(4)
+        vectors = get_vectors(count, 4)
+        fill(index, vectors)
+
+        for item_id in removed:
+            index.remove(item_id)
+
+        index.compact()
+
+        kept_ids = [item_id for item_id in range(1, count + 1) if item_id not in set(removed)]
+        self.should("shrink to the live rows", index.size, len(kept_ids))
+        self.should("keep the live ids in order", index.ids[:index.size].tolist(), kept_ids)
+        self.should("map every id to its row", all(index.ids[index.rows[item_id]] == item_id for item_id in kept_ids))
+
+        for item_id in kept_ids:
+            row = index.rows[item_id]
+            expected = vectors[item_id - 1] / np.linalg.norm(vectors[item_id - 1])
+            self.should("keep the vector with its item", np.allclose(index.matrix[row], expected, atol=1e-5))
+            self.should("keep the fields with their item", index.fields[row], {"i": item_id - 1})
+
+
+class TestMemoryIndexTrain(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"count": 2000, "dims": 16},
+        ]
+
+    async def test(self, count, dims):
+        index = MemoryIndex(dims)
+        fill(index, get_vectors(count, dims))
+        index.train()
+
+        nlist = int(np.sqrt(count))
+        self.should("have sqrt(n) centroids", len(index.centroids), nlist)
+        self.should("record what it was trained on", index.trained_on, count)
+
+        listed = np.concatenate([index.get_list(label) for label in range(nlist)])
+        self.should("list every row exactly once", sorted(listed.tolist()), list(range(count)))
+
+        fill(index, get_vectors(1, dims, seed=1), first_id=count + 1)
+        row = index.rows[count + 1]
+        self.should("assign rows added after training", row in index.get_list(index.assignments[row]).tolist())
+
+        index.remove(count + 1)
+        candidates = index.candidate_rows(index.matrix[row], nlist)
+        self.should("not return removed rows as candidates", row not in candidates.tolist())
+
+
+class TestMemoryIndexRecall(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"count": 5000, "dims": 32, "k": 10, "nprobe": 8, "min_recall": 0.9},
+        ]
+
+    async def test(self, count, dims, k, nprobe, min_recall):
+        index = MemoryIndex(dims)
+        fill(index, get_vectors(count, dims))
+        index.train()
+
+        queries = get_vectors(50, dims, seed=2)
+        queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+        recalls = []
+        for query in queries:
+            exact = set(np.argsort(-(index.matrix[:index.size] @ query))[:k].tolist())
+
+            rows = index.candidate_rows(query, nprobe)
+            approximate = set(rows[np.argsort(-(index.matrix[rows] @ query))[:k]].tolist())
+
+            recalls.append(len(exact & approximate) / k)
+
+        self.should("find most of the exact neighbours", np.mean(recalls) >= min_recall)
@@ -0,0 +1,31 @@
+from sqlalchemy import func
+
+from app.easytests import EasyTest
+from app.tests.config import nextlike_easytest_config
+from app.utils.base import keyset_query_per_chunk
+
+
+class TestKeysetQueryPerChunk(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"count": 25, "chunk_size": 10, "even": False, "sizes": [10, 10, 5]},
+            {"count": 20, "chunk_size": 10, "even": False, "sizes": [10, 10]},
+            {"count": 0, "chunk_size": 10, "even": False, "sizes": []},
+            {"count": 25, "chunk_size": 4, "even": True, "sizes": [4, 4, 4]},
+        ]
+
+    async def test(self, count, chunk_size, even, sizes):
+        series = func.generate_series(1, count).table_valued("n").render_derived()
+        query = self.db.query(series.c.n)
+        if even:
+            query = query.filter(series.c.n % 2 == 0)
+
+        expected = [n for n in range(1, count + 1) if not even or n % 2 == 0]
+
+        for prefetch in [False, True]:
+            chunks = list(keyset_query_per_chunk(query, series.c.n, chunk_size, prefetch=prefetch))
+
+            self.should("split into chunks of chunk_size", [len(chunk) for chunk in chunks], sizes)
+            self.should("return every row once in key order", [row.n for chunk in chunks for row in chunk], expected)
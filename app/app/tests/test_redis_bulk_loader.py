@@ -0,0 +1,127 @@
+import asyncio
+
+import numpy as np
+
+from app.core.indexers.redis_bulk_loader import RedisBulkLoader, encode_vector
+from app.easytests import EasyTest
+from app.tests.config import nextlike_easytest_config
+
+
+class FakePipeline(object):
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    async def execute(self):
+        self.client.in_flight += 1
+        self.client.max_in_flight = max(self.client.max_in_flight, self.client.in_flight)
+        try:
+            await asyncio.sleep(self.client.delay)
+            if self.client.fail:
+                raise ConnectionError("redis went away")
+            self.client.executed.append(self.commands)
+        finally:
+            self.client.in_flight -= 1
+
+
+class FakeClient(object):
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.executed = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+async def hset_script(keys, args, client):
+    client.commands.append((keys, args))
+
+
+class TestEncodeVector(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"vector": np.arange(4, dtype=np.float32), "dtype": np.float32, "size": 16},
+            {"vector": [0.5, 1.5, 2.5], "dtype": np.float32, "size": 12},
+            {"vector": np.arange(4, dtype=np.float32), "dtype": np.float64, "size": 32},
+        ]
+
+    async def test(self, vector, dtype, size):
+        encoded = encode_vector(vector, dtype)
+
+        self.should("measure its length in bytes", len(encoded), size)
+        self.should("hold the packed values", np.frombuffer(encoded, dtype=dtype).tolist(), list(np.asarray(vector, dtype=dtype)))
+
+
+class TestRedisBulkLoaderPipelines(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"documents": 10, "max_pipeline_bytes": 100, "pipelines": 5},
+            {"documents": 10, "max_pipeline_bytes": 10 ** 6, "pipelines": 1},
+            {"documents": 0, "max_pipeline_bytes": 100, "pipelines": 0},
+        ]
+
+    async def test(self, documents, max_pipeline_bytes, pipelines):
+        client = FakeClient()
+
+        # every document is 50 bytes of keys and arguments
+        async with RedisBulkLoader(client, max_pipeline_bytes=max_pipeline_bytes) as loader:
+            for i in range(documents):
+                await loader.run_script(hset_script, ["doc:%08d" % i], [b"x" * 38])
+
+        self.should("send the pipelines", len(client.executed), pipelines)
+        self.should("send every command once", sum(len(pipe) for pipe in client.executed), documents)
+        self.should("count the commands", loader.stats["commands"], documents)
+        self.should("count the bytes", loader.stats["bytes"], documents * 50)
+        self.should("count the pipelines", loader.stats["pipelines"], pipelines)
+
+
+class TestRedisBulkLoaderConcurrency(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"max_in_flight": 1},
+            {"max_in_flight": 3},
+        ]
+
+    async def test(self, max_in_flight):
+        client = FakeClient(delay=0.01)
+        loader = RedisBulkLoader(client, max_pipeline_bytes=1, max_in_flight=max_in_flight)
+
+        for i in range(12):
+            await loader.run_script(hset_script, ["doc:%s" % i], [b"x"])
+        stats = await loader.flush()
+
+        self.should("overlap pipelines up to max_in_flight", client.max_in_flight, max_in_flight)
+        self.should("send every pipeline", stats["pipelines"], 12)
+        self.should("wait for every pipeline", client.in_flight, 0)
+
+
+class TestRedisBulkLoaderErrors(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"documents": 5},
+        ]
+
+    async def test(self, documents):
+        loader = RedisBulkLoader(FakeClient(fail=True), max_pipeline_bytes=1, max_in_flight=2)
+
+        try:
+            for i in range(documents):
+                await loader.run_script(hset_script, ["doc:%s" % i], [b"x"])
+            await loader.flush()
+            self.should("raise the error of a pipeline", False)
+        except ConnectionError:
+            self.should("raise the error of a pipeline", True)
+
+        self.should("keep the first error", isinstance(loader.error, ConnectionError))
+        self.should("count no failed pipeline as sent", loader.stats["pipelines"], 0)
@@ -0,0 +1,97 @@
+import random
+
+from app.core.indexers.redis_indexer import CHECKSUM_RANGES, ID_SPACE, get_id_range, get_id_range_bounds
+from app.easytests import EasyTest
+from app.resources.database import m
+from app.tests.config import nextlike_easytest_config
+
+
+class TestIdRanges(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"id_ranges": [0, 1, 2, 1000, CHECKSUM_RANGES - 2, CHECKSUM_RANGES - 1]},
+        ]
+
+    async def test(self, id_ranges):
+        self.should("start the first range at 0", get_id_range_bounds(0)[0], 0)
+        self.should("end the last range at the end of the id space", get_id_range_bounds(CHECKSUM_RANGES - 1)[1],
+                    ID_SPACE)
+        self.should("put the largest id in the last range", get_id_range(ID_SPACE - 1), CHECKSUM_RANGES - 1)
+
+        for id_range in id_ranges:
+            low, high = get_id_range_bounds(id_range)
+            self.should("not leave gaps between ranges", id_range == 0 or get_id_range_bounds(id_range - 1)[1] == low)
+            self.should("put the lowest id of a range in it", get_id_range(low), id_range)
+            self.should("put the highest id of a range in it", get_id_range(high - 1), id_range)
+            self.should("put the next id in the next range", get_id_range(high), id_range + 1)
+
+        for item_id in random.Random(0).sample(range(ID_SPACE), 1000):
+            low, high = get_id_range_bounds(get_id_range(item_id))
+            self.should("put ids within the bounds of their range", low <= item_id < high)
+
+
+class TestIdHashes(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"item_ids": [0, 1, 2, 4294967296, ID_SPACE - 1]},
+            {"item_ids": random.Random(1).sample(range(ID_SPACE), 1000)},
+        ]
+
+    async def test(self, item_ids):
+        hashes = [m.Item.get_id_hash(item_id) for item_id in item_ids]
+        self.should("fit the hashes in 32 bits", all(0 <= id_hash < 4294967296 for id_hash in hashes))
+
+        # the scripts add a created document to the checksums of its range, and take it out once it's removed
+        checksums = {}
+        for item_id, sign in [(item_id, 1) for item_id in item_ids] + [(item_id, -1) for item_id in item_ids[::2]]:
+            count, id_hashes = checksums.get(get_id_range(item_id), (0, 0))
+            checksums[get_id_range(item_id)] = (count + sign, id_hashes + sign * m.Item.get_id_hash(item_id))
+
+        expected = {}
+        for item_id in item_ids[1::2]:
+            count, id_hashes = expected.get(get_id_range(item_id), (0, 0))
+            expected[get_id_range(item_id)] = (count + 1, id_hashes + m.Item.get_id_hash(item_id))
+
+        self.should("cancel out removed documents",
+                    {id_range: value for id_range, value in checksums.items() if value != (0, 0)}, expected)
+
+
+class TestIdChecksums(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {
+                "collection": "checksums_test_collection",
+                "items": [{"id": str(i), "fields": {"i": i}, "description": "item %s" % i} for i in range(50)],
+            },
+        ]
+
+    async def test(self, collection, items):
+        self.destroy_later("collection", lambda: m.Collection.objects(self.db).delete_by_name(collection))
+
+        await self.request(
+            "post",
+            "/api/items",
+            json={"items": items, "collection": collection, "sync": True},
+            expected_status=200
+        )
+
+        collection = m.Collection.objects(self.db).get_by_name(collection)
+
+        expected = {}
+        for item in collection.items:
+            count, id_hashes = expected.get(get_id_range(item.id), (0, 0))
+            expected[get_id_range(item.id)] = (count + 1, id_hashes + m.Item.get_id_hash(item.id))
+
+        checksums = m.Item.objects(self.db).get_id_checksums(collection.id, CHECKSUM_RANGES, ID_SPACE)
+        self.should("compute the checksums of postgres like the indexer", checksums, expected)
+        self.should("count every item", sum(count for count, _ in checksums.values()), len(items))
+
+        # collections use the postgres indexer by default, which doesn't consume the change log
+        self.should("not log changes of collections the redis indexer doesn't index",
+                    m.ItemChange.objects(self.db).get_batch(collection.id, 1), [])
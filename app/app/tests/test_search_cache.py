@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+from app.core.searcher.cache import SearchCache, deserialize_search_result, serialize_search_result
+from app.core.types import SearchItem, SearchResult
+from app.easytests import EasyTest
+from app.tests.config import nextlike_easytest_config
+from app.utils.lru import LRUCache
+
+
+class MemorySearchCache(SearchCache):
+    def __init__(self, l2, l1_expire=30):
+        super().__init__()
+        self.l1 = LRUCache(maxsize=100, expire=l1_expire)
+        self.l2 = l2
+
+    async def get_from_l2(self, key):
+        return self.l2.get(key)
+
+    async def set_in_l2(self, key, value, expire):
+        self.l2[key] = value
+
+
+class CountingSearch(object):
+    def __init__(self, delay=0, partial=False):
+        self.delay = delay
+        self.partial = partial
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return SearchResult(items=[SearchItem(id="1", fields={"make": "BMW"}, score=1)], id=10, partial=self.partial)
+
+
+class TestSearchCacheSerialization(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"descriptions": 1, "compressed": False},
+            {"descriptions": 1000, "compressed": True},
+        ]
+
+    async def test(self, descriptions, compressed):
+        result = SearchResult(items=[SearchItem(id=str(i), fields={}, description="car " * 10) for i in range(descriptions)], id=1)
+        value = serialize_search_result(result)
+
+        self.should("compress large results only", value[:1] == b"z", compressed)
+        self.should("round trip the items", deserialize_search_result(value).items, result.items)
+        self.should("not cache the search id", deserialize_search_result(value).id, None)
+
+
+class TestSearchCacheLevels(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"collection_id": 1, "key": "search:1"},
+        ]
+
+    async def test(self, collection_id, key):
+        l2 = {}
+        search = CountingSearch()
+        cache = MemorySearchCache(l2)
+
+        first = await cache.get_or_compute(collection_id, key, 60, search)
+        second = await cache.get_or_compute(collection_id, key, 60, search)
+        self.should("compute once", search.calls, 1)
+        self.should("serve the same items from l1", second.items, first.items)
+        self.should("write through to l2", key in l2)
+
+        other_process = MemorySearchCache(l2)
+        await other_process.get_or_compute(collection_id, key, 60, search)
+        self.should("fall through to l2 on an l1 miss", search.calls, 1)
+        self.should("fill l1 from l2", other_process.l1.get(key), l2[key])
+
+        stats = other_process.stats()[str(collection_id)]
+        self.should("count the l2 hit", stats["l2_hits"], 1)
+        self.should("count no l1 hit", stats["l1_hits"], 0)
+        self.should("count the l1 hit", cache.stats()[str(collection_id)]["l1_hits"], 1)
+
+
+class TestSearchCacheCoalescing(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"requests": 5},
+        ]
+
+    async def test(self, requests):
+        search = CountingSearch(delay=0.05)
+        cache = MemorySearchCache({})
+
+        results = await asyncio.gather(*[cache.get_or_compute(1, "search:1", 60, search) for _ in range(requests)])
+
+        self.should("compute concurrent misses once", search.calls, 1)
+        self.should("answer every request", len(results), requests)
+        self.should("count the coalesced requests", cache.stats()["1"]["coalesced"], requests - 1)
+        self.should("forget the finished computation", cache.inflight, {})
+
+
+class TestSearchCacheExpiry(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"l1_expire": 0.05, "expire": 60, "cached_in_l1": True},
+            {"l1_expire": 60, "expire": 0.05, "cached_in_l1": True},
+            {"l1_expire": 0, "expire": 60, "cached_in_l1": False},
+            {"l1_expire": None, "expire": 60, "cached_in_l1": True},
+        ]
+
+    async def test(self, l1_expire, expire, cached_in_l1):
+        cache = MemorySearchCache({}, l1_expire=l1_expire)
+        await cache.get_or_compute(1, "search:1", expire, CountingSearch())
+
+        self.should("cache in l1 unless l1 is disabled", cache.l1.get("search:1") is not None, cached_in_l1)
+
+        time.sleep(0.1)
+        expires = l1_expire is not None and min(l1_expire, expire) < 0.1
+        self.should("expire l1 entries by the shorter expiry", cache.l1.get("search:1") is None, expires or not cached_in_l1)
+
+
+class TestSearchCachePartialResults(EasyTest):
+    config = nextlike_easytest_config
+
+    async def get_cases(self):
+        return [
+            {"collection_id": 1, "key": "search:partial"},
+        ]
+
+    async def test(self, collection_id, key):
+        l2 = {}
+        search = CountingSearch(delay=0.05, partial=True)
+        cache = MemorySearchCache(l2)
+
+        results = await asyncio.gather(*[cache.get_or_compute(collection_id, key, 60, search) for _ in range(3)])
+        self.should("share the partial result with the waiting requests", search.calls, 1)
+        self.should("mark the result as partial", all(result.partial for result in results))
+        self.should("not store partial results in l2", key not in l2)
+        self.should("not store partial results in l1", cache.l1.get(key), None)
+
+        await cache.get_or_compute(collection_id, key, 60, search)
+        self.should("compute partial results again", search.calls, 2)
+
+        search.partial = False
+        await cache.get_or_compute(collection_id, key, 60, search)
+        await cache.get_or_compute(collection_id, key, 60, search)
+        self.should("store the complete result", search.calls, 3)
@@ -4,6 +4,8 @@ import random
 
 import time
 
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from typing import List, Any, Union
 
 import json
@@ -11,6 +13,7 @@ import re
 from datetime import datetime, timedelta
 from json import JSONDecodeError
 
+import numpy as np
 from deepmerge import Merger
 from pydantic import BaseModel
 from starlette.datastructures import MultiDict
@@ -24,22 +27,57 @@ def await_if_coroutine(obj):
     return obj
 
 
-def query_per_chunk(query, chunk_size):
-    offset = 0
-    while True:
-        chunk = query.limit(chunk_size).offset(offset).all()
-        if not chunk:
-            break
-        yield chunk
-        offset += chunk_size
-
-
-def all_query_per_chunk(query, chunk_size):
-    while True:
-        chunk = query.limit(chunk_size).all()
-        if not chunk:
-            break
-        yield chunk
+# seeks past the last key of every chunk instead of using OFFSET, so each chunk costs the same and rows deleted or
+# updated by the loop body don't shift the following chunks
+def keyset_query_per_chunk(query, key, chunk_size, prefetch=False):
+    def fetch(chunk_query, after):
+        if after is not None:
+            chunk_query = chunk_query.filter(key > after)
+        return chunk_query.order_by(key).limit(chunk_size).all()
+
+    if not prefetch:
+        after = None
+        while True:
+            chunk = fetch(query, after)
+            if not chunk:
+                break
+            yield chunk
+            if len(chunk) < chunk_size:
+                break
+            after = getattr(chunk[-1], key.key)
+        return
+
+    # the next chunk is read in a thread, through its own session, while the caller processes the current one. The
+    # chunks belong to that session, so the caller must not lazy load from them or add them to its own session
+    from app.db.session import Database
+
+    with Database() as prefetch_db, ThreadPoolExecutor(max_workers=1) as executor:
+        prefetch_query = query.with_session(prefetch_db)
+        future = executor.submit(fetch, prefetch_query, None)
+        while future:
+            chunk = future.result()
+            if not chunk:
+                break
+
+            future = None
+            if len(chunk) == chunk_size:
+                future = executor.submit(fetch, prefetch_query, getattr(chunk[-1], key.key))
+
+            yield chunk
+
+
+# streams the query from a server side cursor, which reads a single snapshot but holds a transaction open meanwhile
+def stream_query_per_chunk(query, chunk_size):
+    from app.db.session import SessionLocal, engine
+
+    # named cursors need a transaction, which the autocommit engine never opens
+    session = SessionLocal(bind=engine.execution_options(isolation_level="REPEATABLE READ"))
+    try:
+        rows = iter(query.with_session(session).yield_per(chunk_size))
+        while chunk := list(islice(rows, chunk_size)):
+            yield chunk
+    finally:
+        session.close()
 
 
 def replace_variables_in_string(text, context):
@@ -152,6 +190,10 @@ def default_ns_id():
     return random.SystemRandom().randint(0, 1000000000000)
 
 
+def default_ns_ids(count):
+    return np.random.default_rng().integers(0, 1000000000000, size=count, endpoint=True)
+
+
 def multimerge(*dicts):
     rv = dicts[0]
     for d in dicts[1:]:
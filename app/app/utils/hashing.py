@@ -0,0 +1,28 @@
+import hashlib
+from typing import Iterable, List
+
+from app.utils.base import stable_hash
+
+DIGEST_SIZE = 16
+
+
+def fast_hash(text) -> str:
+    if not isinstance(text, bytes):
+        text = str(text).encode("utf-8")
+    return hashlib.blake2b(text, digest_size=DIGEST_SIZE).hexdigest()
+
+
+def fast_hash_many(texts: Iterable) -> List[str]:
+    blake2b = hashlib.blake2b
+    return [
+        blake2b(text if isinstance(text, bytes) else str(text).encode("utf-8"), digest_size=DIGEST_SIZE).hexdigest()
+        for text in texts
+    ]
+
+
+def hashed_key(prefix, *parts) -> str:
+    return ":".join([prefix] + fast_hash_many(parts))
+
+
+def legacy_hashed_key(prefix, *parts) -> str:
+    return ":".join([prefix] + [str(stable_hash(part)) for part in parts])
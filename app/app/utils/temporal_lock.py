@@ -1,24 +1,62 @@
-from app.resources.rdb import get_redis
+import threading
+import uuid
 
+from app.resources.rdb import get_redis, get_sync_redis
+from app.settings import get_settings
 from app.utils.logging import log
 
+EXTEND_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
 
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+# the lock expires shortly after its holder stops extending it, so a crashed holder only keeps it for a moment. It is
+# extended from a thread, as holders block their event loop with synchronous work for minutes at a time
 class RedisTemporalLock(object):
-    def __init__(self, name, expire=3600 * 24 * 30):
+    def __init__(self, name, expire=None):
         self.name = name
-        self.expire = expire
+        self.key = "rtl:%s" % name
+        self.expire = expire or get_settings().REDIS_LOCK_EXPIRE
+        self.token = uuid.uuid4().hex
+        self.acquired = False
+        self.released = threading.Event()
 
     async def __aenter__(self):
-        rdb = get_redis()
-        locked = await rdb.get("rtl:%s" % self.name)
-        rdb.setex("rtl:%s" % self.name, 1, self.expire)
+        self.acquired = bool(await get_redis().set(self.key, self.token, ex=self.expire, nx=True))
+        locked = not self.acquired
 
         if locked:
             log("warning", "RedisTemporalLock(%s) is locked!" % self.name)
         else:
             log("warning", "RedisTemporalLock(%s) is unlocked!" % self.name)
+            threading.Thread(target=self.extend_until_released, name=self.key, daemon=True).start()
 
         return not bool(locked)
 
+    def extend_until_released(self):
+        client = get_sync_redis()
+        while not self.released.wait(self.expire / 3):
+            try:
+                if not client.eval(EXTEND_SCRIPT, 1, self.key, self.token, self.expire):
+                    log("warning", "RedisTemporalLock(%s) expired while it was held!" % self.name)
+                    return
+            except Exception as e:
+                log("warning", "RedisTemporalLock(%s) could not be extended: %s" % (self.name, e))
+
+    async def is_locked(self):
+        return bool(await get_redis().exists(self.key))
+
     async def __aexit__(self, type, value, traceback):
-        await get_redis().delete("rtl:%s" % self.name)
+        if self.acquired:
+            self.released.set()
+            await get_redis().eval(RELEASE_SCRIPT, 1, self.key, self.token)
@@ -0,0 +1,112 @@
+import argparse
+import time
+
+import numpy as np
+import redis
+from redis.commands.search.field import VectorField
+from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+from redis.commands.search.query import Query
+
+from app.core.indexers.redis_indexer import VECTOR_DTYPES
+
+CONFIGS = [
+    {"algorithm": "FLAT", "type": "FLOAT32"},
+    {"algorithm": "HNSW", "type": "FLOAT32", "m": 16, "ef_construction": 200, "ef_runtime": 10},
+    {"algorithm": "HNSW", "type": "FLOAT32", "m": 16, "ef_construction": 200, "ef_runtime": 50},
+    {"algorithm": "HNSW", "type": "FLOAT32", "m": 32, "ef_construction": 400, "ef_runtime": 100},
+    {"algorithm": "HNSW", "type": "FLOAT16", "m": 16, "ef_construction": 200, "ef_runtime": 50},
+]
+
+
+def get_vectors(count, dims, clusters=64):
+    # clustered like real embeddings, so that approximate search has neighbours worth missing
+    random = np.random.default_rng(42)
+    centers = random.normal(size=(clusters, dims))
+    vectors = centers[random.integers(0, clusters, size=count)] + random.normal(scale=0.3, size=(count, dims))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def load(client, prefix, vectors, dtype):
+    pipe = client.pipeline(transaction=False)
+    for i, vector in enumerate(vectors):
+        pipe.hset(f"{prefix}{i}", mapping={"embedding": vector.astype(dtype).tobytes()})
+        if i % 1000 == 999:
+            pipe.execute()
+    pipe.execute()
+
+
+def create_index(client, name, prefix, dims, config):
+    attributes = {"TYPE": config["type"], "DIM": dims, "DISTANCE_METRIC": "COSINE"}
+    if config["algorithm"] == "HNSW":
+        attributes.update({"M": config["m"], "EF_CONSTRUCTION": config["ef_construction"]})
+
+    began = time.monotonic()
+    client.ft(name).create_index(
+        [VectorField("embedding", config["algorithm"], attributes)],
+        definition=IndexDefinition(prefix=[prefix], index_type=IndexType.HASH)
+    )
+    while int(client.ft(name).info().get("indexing", 0)):
+        time.sleep(0.1)
+    return time.monotonic() - began
+
+
+def search(client, name, queries, k, config):
+    ef_runtime = f" EF_RUNTIME {config['ef_runtime']}" if config["algorithm"] == "HNSW" else ""
+    query = Query(f"*=>[KNN {k} @embedding $vec{ef_runtime} as vector_score]") \
+        .sort_by("vector_score").return_field("vector_score").paging(0, k).dialect(2)
+
+    results, latencies = [], []
+    for vector in queries:
+        began = time.monotonic()
+        query_vector = vector.astype(VECTOR_DTYPES[config["type"]]).tobytes()
+        docs = client.ft(name).search(query, query_params={"vec": query_vector}).docs
+        latencies.append(time.monotonic() - began)
+        results.append({doc.id for doc in docs})
+
+    return results, np.asarray(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="recall@k and latency of redis vector index configurations")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    client = redis.Redis(host=args.host, port=args.port)
+    vectors = get_vectors(args.count + args.queries, args.dims)
+    vectors, queries = vectors[:args.count], vectors[args.count:]
+
+    baseline = None
+    try:
+        for vector_type in sorted({config["type"] for config in CONFIGS}):
+            load(client, f"bench:{vector_type}:", vectors, VECTOR_DTYPES[vector_type])
+
+        for i, config in enumerate(CONFIGS):
+            name = f"bench_index_{i}"
+            build_seconds = create_index(client, name, f"bench:{config['type']}:", args.dims, config)
+            results, latencies = search(client, name, queries, args.k, config)
+            client.ft(name).dropindex()
+
+            # FLAT is exact, its neighbours are the ground truth (document ids match across the two prefixes)
+            results = [{doc_id.split(":")[-1] for doc_id in result} for result in results]
+            if baseline is None:
+                baseline = results
+
+            recall = np.mean([len(result & expected) / len(expected) for result, expected in zip(results, baseline)])
+            print(
+                f"{config}: recall@{args.k}={recall:.3f}, p50={np.percentile(latencies, 50):.2f}ms, "
+                f"p95={np.percentile(latencies, 95):.2f}ms, build={build_seconds:.1f}s"
+            )
+    finally:
+        for vector_type in {config["type"] for config in CONFIGS}:
+            keys = list(client.scan_iter(match=f"bench:{vector_type}:*", count=1000))
+            for start in range(0, len(keys), 1000):
+                client.delete(*keys[start:start + 1000])
+
+
+if __name__ == "__main__":
+    main()
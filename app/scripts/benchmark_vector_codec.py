@@ -0,0 +1,24 @@
+import timeit
+
+import numpy as np
+from pgvector.utils import from_db
+
+from app.db.vectors import encode_vector, decode_vector
+
+ROUNDS = 500
+
+for dims in [768, 1536, 3072]:
+    vector = np.random.default_rng(0).normal(size=dims).astype(np.float32)
+    as_list = vector.tolist()
+    literal = "[%s]" % (",".join(map(str, as_list)))
+
+    timings = {
+        "encode(before)": timeit.timeit(lambda: "[%s]" % (",".join(map(str, as_list))), number=ROUNDS),
+        "encode(after)": timeit.timeit(lambda: encode_vector(vector), number=ROUNDS),
+        "decode(before)": timeit.timeit(lambda: list(from_db(literal)), number=ROUNDS),
+        "decode(after)": timeit.timeit(lambda: decode_vector(literal), number=ROUNDS),
+    }
+
+    print(f"dims={dims}, literal size before={len(literal)} bytes, after={len(encode_vector(vector))} bytes")
+    for name, took in timings.items():
+        print(f"  {name}: {took / ROUNDS * 1000 * 1000:.1f} micros per vector")
@@ -0,0 +1,30 @@
+from sentence_transformers import SentenceTransformer
+
+BACKENDS = ["torch", "int8", "onnx"]
+
+
+def load_torch_model(name) -> SentenceTransformer:
+    return SentenceTransformer(name, device="cpu")
+
+
+def load_int8_model(name) -> SentenceTransformer:
+    import torch
+
+    model = SentenceTransformer(name, device="cpu")
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_onnx_model(name) -> SentenceTransformer:
+    # needs the onnx extra (optimum[onnxruntime]), exports the model on first load
+    return SentenceTransformer(name, device="cpu", backend="onnx")
+
+
+def load_model(name, backend="torch") -> SentenceTransformer:
+    if backend == "torch":
+        return load_torch_model(name)
+    elif backend == "int8":
+        return load_int8_model(name)
+    elif backend == "onnx":
+        return load_onnx_model(name)
+    else:
+        raise ValueError(f"Unknown backend {backend}, expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,108 @@
+import asyncio
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+# queues the documents of concurrent requests per model and encodes them together in a worker thread
+class EmbeddingBatcher(object):
+    def __init__(self, model_provider, max_batch_size=64, max_wait_ms=5, workers=1):
+        self.model_provider = model_provider
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.workers = workers
+        self.queues: Dict[Tuple[str, str], asyncio.Queue] = {}
+        # the loop only keeps weak references to its tasks
+        self.tasks = set()
+        self.stats = {"requests": 0, "documents": 0, "batches": 0, "encode_seconds": 0.0}
+
+    def get_queue(self, model_name, backend) -> asyncio.Queue:
+        if (model_name, backend) not in self.queues:
+            queue = self.queues[(model_name, backend)] = asyncio.Queue()
+            for _ in range(self.workers):
+                task = asyncio.create_task(self.process(model_name, backend, queue))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+        return self.queues[(model_name, backend)]
+
+    async def embed(self, model_name, backend, documents: List[str]) -> List[np.ndarray]:
+        if not documents:
+            return []
+
+        loop = asyncio.get_running_loop()
+        queue = self.get_queue(model_name, backend)
+
+        futures = []
+        for document in documents:
+            future = loop.create_future()
+            queue.put_nowait((document, future))
+            futures.append(future)
+
+        self.stats["requests"] += 1
+        self.stats["documents"] += len(documents)
+
+        return await asyncio.gather(*futures)
+
+    async def collect(self, queue: asyncio.Queue):
+        batch = [await queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # whatever queued up while waiting goes along, up to the batch size
+        while len(batch) < self.max_batch_size and not queue.empty():
+            batch.append(queue.get_nowait())
+
+        return batch
+
+    def encode(self, model_name, backend, documents):
+        began = time.monotonic()
+        embeddings = self.model_provider.get_model(model_name, backend).encode(
+            documents, batch_size=len(documents), convert_to_numpy=True
+        )
+        self.stats["encode_seconds"] += time.monotonic() - began
+        return embeddings
+
+    async def process(self, model_name, backend, queue: asyncio.Queue):
+        while True:
+            try:
+                await self.process_batch(model_name, backend, queue)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print(f"Embedding worker of {model_name} ({backend}) failed, restarting it")
+                traceback.print_exc()
+
+    async def process_batch(self, model_name, backend, queue: asyncio.Queue):
+        batch = await self.collect(queue)
+
+        try:
+            documents = list(dict.fromkeys(document for document, _ in batch))
+            embeddings = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.encode, model_name, backend, documents
+            )
+            self.stats["batches"] += 1
+
+            embeddings_by_document = dict(zip(documents, embeddings))
+            for document, future in batch:
+                if not future.done():
+                    future.set_result(embeddings_by_document[document])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
@@ -0,0 +1,54 @@
+import argparse
+import time
+
+import numpy as np
+
+from backends import BACKENDS, load_model
+
+
+def get_documents(count):
+    words = "cheap spacious apartment near the center with two bedrooms balcony parking garden sea view renovated " \
+            "kitchen quiet neighbourhood close to metro station fully furnished pets allowed".split()
+    random = np.random.default_rng(42)
+    return [" ".join(random.choice(words, size=random.integers(8, 64))) for _ in range(count)]
+
+
+def benchmark(model_name, backend, documents, batch_size):
+    model = load_model(model_name, backend)
+    model.encode(documents[:batch_size], batch_size=batch_size)
+
+    began = time.monotonic()
+    embeddings = model.encode(documents, batch_size=batch_size, convert_to_numpy=True)
+    took = time.monotonic() - began
+
+    return embeddings, len(documents) / took
+
+
+def cosine(a, b):
+    return np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare embedding throughput and drift of the model backends")
+    parser.add_argument("model")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    documents = get_documents(args.documents)
+    reference = None
+
+    print(f"{'backend':<8} {'docs/sec':>10} {'mean cos':>10} {'min cos':>10}")
+    for backend in ["torch"] + [backend for backend in args.backends if backend != "torch"]:
+        try:
+            embeddings, docs_per_second = benchmark(args.model, backend, documents, args.batch_size)
+        except Exception as e:
+            print(f"{backend:<8} failed: {e}")
+            continue
+
+        if reference is None:
+            reference = embeddings
+
+        similarities = cosine(reference, embeddings)
+        print(f"{backend:<8} {docs_per_second:>10.1f} {similarities.mean():>10.5f} {similarities.min():>10.5f}")
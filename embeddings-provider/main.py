@@ -1,9 +1,17 @@
+import asyncio
+import os
+
+import numpy as np
+
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from sentence_transformers import SentenceTransformer, util
-from functools import lru_cache
 from typing import List
 
+from backends import BACKENDS, load_model
+from batcher import EmbeddingBatcher
+from store import EmbeddingStore
+
 app = FastAPI()
 
 
@@ -11,43 +19,82 @@ class ModelProvider(object):
     def __init__(self):
         self.models = {}
 
-    def get_model(self, name):
-        if name not in self.models:
-            print(f"Loading model {name}")
-            self.models[name] = SentenceTransformer(name)
-            print(f"Model {name} loaded")
-        return self.models[name]
+    def get_model(self, name, backend="torch") -> SentenceTransformer:
+        if (name, backend) not in self.models:
+            print(f"Loading model {name} ({backend})")
+            self.models[(name, backend)] = load_model(name, backend)
+            print(f"Model {name} ({backend}) loaded")
+        return self.models[(name, backend)]
 
 
 class EmbeddingRequest(BaseModel):
     documents: List[str]
     model: str
+    backend: str = "torch"
 
 
 class SemanticSearchRequest(BaseModel):
     query: str
     documents: List[str]
     model: str
+    backend: str = "torch"
 
 
 model_provider = ModelProvider()
+store = EmbeddingStore(
+    os.environ.get("EMBEDDINGS_STORE_PATH", "data/embeddings.sqlite3"),
+    max_size_mb=int(os.environ.get("EMBEDDINGS_STORE_MAX_SIZE_MB", 2048)),
+    memo_size=int(os.environ.get("EMBEDDINGS_STORE_MEMO_SIZE", 20000)),
+)
+batcher = EmbeddingBatcher(
+    model_provider,
+    max_batch_size=int(os.environ.get("EMBEDDINGS_MAX_BATCH_SIZE", 64)),
+    max_wait_ms=float(os.environ.get("EMBEDDINGS_MAX_WAIT_MS", 5)),
+    workers=int(os.environ.get("EMBEDDINGS_WORKERS", 1)),
+)
+
+
+async def embed(documents: List[str], model_name: str, backend: str = "torch") -> List[np.ndarray]:
+    if backend not in BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unknown backend {backend}")
+
+    store_model_name = model_name if backend == "torch" else f"{model_name}:{backend}"
+    embeddings = await asyncio.to_thread(store.get_many, store_model_name, documents)
 
+    missing = list(dict.fromkeys(document for document in documents if document not in embeddings))
+    if missing:
+        calculated = dict(zip(missing, await batcher.embed(model_name, backend, missing)))
+        await asyncio.to_thread(store.set_many, store_model_name, calculated)
+        embeddings.update(calculated)
 
-@lru_cache(maxsize=2048)
-def no_batch_embed(sentence: str, model_name: str) -> List[float]:
-    model = model_provider.get_model(model_name)
-    return model.encode(sentence).tolist()
+    return [embeddings[document] for document in documents]
+
+
+@app.on_event("startup")
+async def warm_up_store():
+    await asyncio.to_thread(store.warm_up)
+
+
+@app.on_event("shutdown")
+async def close_store():
+    await asyncio.to_thread(store.close)
 
 
 @app.post("/embedding")
 async def embedding(request: EmbeddingRequest):
-    embeddings = [no_batch_embed(document, request.model) for document in request.documents]
-    return {"embeddings": embeddings}
+    embeddings = await embed(request.documents, request.model, request.backend)
+    return {"embeddings": [embedding.tolist() for embedding in embeddings]}
 
 
 @app.post("/search")
 async def semantic_search(request: SemanticSearchRequest):
-    query_embedding = no_batch_embed(request.query)
-    document_embeddings = [no_batch_embed(document, request.model) for document in request.documents]
-    scores = util.dot_score(query_embedding, document_embeddings).squeeze()
+    query_embedding, *document_embeddings = await embed(
+        [request.query] + request.documents, request.model, request.backend
+    )
+    scores = util.dot_score(query_embedding, np.stack(document_embeddings)).squeeze()
     return {"similarities": [float(s) for s in scores]}
+
+
+@app.get("/stats")
+async def stats():
+    return {"batcher": batcher.stats, "store": await asyncio.to_thread(store.stats)}
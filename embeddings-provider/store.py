@@ -0,0 +1,189 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+import numpy as np
+
+
+class EmbeddingsMemo(object):
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        embedding = self.entries.get(key)
+        if embedding is not None:
+            self.entries.move_to_end(key)
+        return embedding
+
+    def set(self, key, embedding):
+        self.entries[key] = embedding
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+def get_document_key(model_name, document) -> bytes:
+    return hashlib.blake2b(f"{model_name}\0{document}".encode("utf-8"), digest_size=16).digest()
+
+
+# content addressed (model, text hash) -> float32 vector store, with a hot in-memory tier in front of sqlite
+class EmbeddingStore(object):
+    def __init__(self, path, max_size_mb=2048, memo_size=20000, access_flush_size=1000, access_flush_seconds=60):
+        self.path = path
+        self.max_size = max_size_mb * 1024 * 1024
+        self.memo = EmbeddingsMemo(maxsize=memo_size)
+        self.lock = threading.Lock()
+        self.writes_since_eviction = 0
+        # reads only note their access time, which is written in batches instead of a transaction per read
+        self.accesses: Dict[bytes, int] = {}
+        self.access_flush_size = access_flush_size
+        self.access_flush_seconds = access_flush_seconds
+        self.accesses_flushed = time.monotonic()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access INTEGER NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+
+    def warm_up(self):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT key, vector FROM embeddings ORDER BY last_access DESC LIMIT ?", (self.memo.maxsize,)
+            ).fetchall()
+
+            for key, vector in reversed(rows):
+                self.memo.set(key, np.frombuffer(vector, dtype=np.float32))
+
+        print(f"Warmed up {len(rows)} embeddings from {self.path}")
+
+    def get_many(self, model_name, documents: List[str]) -> Dict[str, np.ndarray]:
+        embeddings = {}
+        missing_keys = {}
+        now = int(time.time())
+
+        with self.lock:
+            for document in documents:
+                key = get_document_key(model_name, document)
+                embedding = self.memo.get(key)
+                if embedding is not None:
+                    embeddings[document] = embedding
+                    self.accesses[key] = now
+                else:
+                    missing_keys[key] = document
+
+            keys = list(missing_keys.keys())
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self.connection.execute(
+                    "SELECT key, vector FROM embeddings WHERE key IN (%s)" % ",".join("?" * len(chunk)), chunk
+                ).fetchall()
+
+                for key, vector in rows:
+                    embedding = np.frombuffer(vector, dtype=np.float32)
+                    self.memo.set(key, embedding)
+                    self.accesses[key] = now
+                    embeddings[missing_keys[key]] = embedding
+
+            if (
+                len(self.accesses) >= self.access_flush_size
+                or time.monotonic() - self.accesses_flushed >= self.access_flush_seconds
+            ):
+                self.flush_accesses()
+
+        return embeddings
+
+    def set_many(self, model_name, embeddings: Dict[str, np.ndarray]):
+        now = int(time.time())
+        vectors = {
+            get_document_key(model_name, document): np.array(embedding, dtype=np.float32)
+            for document, embedding in embeddings.items()
+        }
+        rows = [(key, model_name, vector.tobytes(), now) for key, vector in vectors.items()]
+
+        with self.lock:
+            for key, vector in vectors.items():
+                self.memo.set(key, vector)
+                self.accesses.pop(key, None)
+
+            self.execute_many_in_transaction(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_access) VALUES (?, ?, ?, ?)", rows
+            )
+
+            self.writes_since_eviction += len(rows)
+            if self.writes_since_eviction >= 1000:
+                self.writes_since_eviction = 0
+                self.flush_accesses()
+                self.evict()
+
+    def flush_accesses(self):
+        accesses, self.accesses = self.accesses, {}
+        self.accesses_flushed = time.monotonic()
+
+        if accesses:
+            self.execute_many_in_transaction(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                [(last_access, key) for key, last_access in accesses.items()]
+            )
+
+    def close(self):
+        with self.lock:
+            self.flush_accesses()
+            self.connection.close()
+
+    def execute_many_in_transaction(self, query, rows):
+        self.connection.execute("BEGIN")
+        try:
+            self.connection.executemany(query, rows)
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def get_size(self):
+        page_count = self.connection.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = self.connection.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = self.connection.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - freelist_count) * page_size
+
+    def evict(self):
+        size = self.get_size()
+        if size <= self.max_size:
+            return
+
+        count = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        # drop the least recently used entries, plus a tenth of the store so that eviction doesn't run on every write
+        to_delete = int(count * (1 - self.max_size / size)) + count // 10
+
+        self.connection.execute("""
+            DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM embeddings ORDER BY last_access LIMIT ?
+            )
+        """, (to_delete,))
+
+        print(f"Evicted {to_delete} embeddings from {self.path}")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0],
+                "size": self.get_size(),
+                "max_size": self.max_size,
+                "memo_entries": len(self.memo.entries),
+                "pending_accesses": len(self.accesses),
+            }
@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+from batcher import EmbeddingBatcher
+
+
+class FakeModel(object):
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.batches = []
+
+    def encode(self, documents, batch_size, convert_to_numpy):
+        self.batches.append(list(documents))
+        if self.fail_on in documents:
+            raise RuntimeError("cannot encode %s" % self.fail_on)
+        return np.asarray([[len(document), 1] for document in documents], dtype=np.float32)
+
+
+class FakeModelProvider(object):
+    def __init__(self, model):
+        self.model = model
+
+    def get_model(self, name, backend="torch"):
+        return self.model
+
+
+class FlakyEmbeddingBatcher(EmbeddingBatcher):
+    def __init__(self, *args, failures=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = failures
+
+    async def collect(self, queue):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("unexpected")
+        return await super().collect(queue)
+
+
+class TestEmbeddingBatcher(unittest.IsolatedAsyncioTestCase):
+    async def test_batches_concurrent_requests(self):
+        model = FakeModel()
+        batcher = EmbeddingBatcher(FakeModelProvider(model), max_batch_size=64, max_wait_ms=20)
+
+        results = await asyncio.gather(
+            batcher.embed("model", "torch", ["a", "bb"]),
+            batcher.embed("model", "torch", ["bb", "ccc"]),
+        )
+
+        self.assertEqual([[embedding.tolist() for embedding in result] for result in results], [[[1, 1], [2, 1]], [[2, 1], [3, 1]]])
+        self.assertEqual(results[0][0].dtype, np.float32)
+        self.assertEqual(model.batches, [["a", "bb", "ccc"]])
+        self.assertEqual(batcher.stats["batches"], 1)
+        self.assertEqual(batcher.stats["documents"], 4)
+
+    async def test_splits_batches_by_size(self):
+        model = FakeModel()
+        batcher = EmbeddingBatcher(FakeModelProvider(model), max_batch_size=2, max_wait_ms=20)
+
+        await batcher.embed("model", "torch", ["a", "b", "c", "d", "e"])
+
+        self.assertEqual([len(batch) for batch in model.batches], [2, 2, 1])
+
+    async def test_keeps_references_to_its_workers(self):
+        batcher = EmbeddingBatcher(FakeModelProvider(FakeModel()), workers=2)
+
+        await batcher.embed("model", "torch", ["a"])
+        await batcher.embed("other model", "torch", ["a"])
+
+        self.assertEqual(len(batcher.tasks), 4)
+        self.assertTrue(all(not task.done() for task in batcher.tasks))
+
+    async def test_fails_the_requests_of_a_failed_batch(self):
+        model = FakeModel(fail_on="bad")
+        batcher = EmbeddingBatcher(FakeModelProvider(model), max_wait_ms=1)
+
+        with self.assertRaises(RuntimeError):
+            await batcher.embed("model", "torch", ["good", "bad"])
+
+        self.assertEqual((await batcher.embed("model", "torch", ["good"]))[0].tolist(), [4, 1])
+
+    async def test_restarts_after_unexpected_errors(self):
+        batcher = FlakyEmbeddingBatcher(FakeModelProvider(FakeModel()), max_wait_ms=1, failures=2)
+
+        result = await asyncio.wait_for(batcher.embed("model", "torch", ["a"]), 1)
+
+        self.assertEqual(result[0].tolist(), [1, 1])
+        self.assertEqual(len(batcher.tasks), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
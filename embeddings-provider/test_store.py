@@ -0,0 +1,107 @@
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from store import EmbeddingStore, get_document_key
+
+
+def get_last_access(store, model_name, document):
+    return store.connection.execute(
+        "SELECT last_access FROM embeddings WHERE key = ?", (get_document_key(model_name, document),)
+    ).fetchone()[0]
+
+
+class TestEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "embeddings.sqlite3")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trips_float32_vectors(self):
+        store = EmbeddingStore(self.path)
+        store.set_many("model", {"a": [0.1, 0.2], "b": np.asarray([0.3, 0.4], dtype=np.float64)})
+
+        embeddings = store.get_many("model", ["a", "b", "c"])
+
+        self.assertEqual(sorted(embeddings.keys()), ["a", "b"])
+        self.assertEqual(embeddings["a"].dtype, np.float32)
+        self.assertTrue(np.allclose(embeddings["b"], [0.3, 0.4]))
+        self.assertEqual(store.get_many("other model", ["a"]), {})
+        store.close()
+
+    def test_reads_vectors_back_from_disk(self):
+        store = EmbeddingStore(self.path)
+        store.set_many("model", {"a": [0.1, 0.2]})
+        store.close()
+
+        store = EmbeddingStore(self.path)
+        embeddings = store.get_many("model", ["a"])
+
+        self.assertEqual(embeddings["a"].dtype, np.float32)
+        self.assertTrue(np.allclose(embeddings["a"], [0.1, 0.2]))
+        self.assertEqual(len(store.memo.entries), 1)
+        store.close()
+
+    def test_writes_access_times_in_batches(self):
+        store = EmbeddingStore(self.path, access_flush_size=3, access_flush_seconds=3600)
+        store.set_many("model", {"a": [1], "b": [2], "c": [3]})
+        store.connection.execute("UPDATE embeddings SET last_access = 0")
+
+        store.get_many("model", ["a", "b"])
+        self.assertEqual(get_last_access(store, "model", "a"), 0)
+        self.assertEqual(len(store.accesses), 2)
+
+        store.get_many("model", ["c"])
+        self.assertEqual(store.accesses, {})
+        self.assertGreaterEqual(get_last_access(store, "model", "a"), int(time.time()) - 1)
+        self.assertGreaterEqual(get_last_access(store, "model", "c"), int(time.time()) - 1)
+        store.close()
+
+    def test_flushes_access_times_on_close(self):
+        store = EmbeddingStore(self.path, access_flush_size=1000, access_flush_seconds=3600)
+        store.set_many("model", {"a": [1]})
+        store.connection.execute("UPDATE embeddings SET last_access = 0")
+        store.get_many("model", ["a"])
+        store.close()
+
+        store = EmbeddingStore(self.path)
+        self.assertGreater(get_last_access(store, "model", "a"), 0)
+        store.close()
+
+    def test_evicts_the_least_recently_used_vectors(self):
+        store = EmbeddingStore(self.path)
+        store.set_many("model", {str(i): np.zeros(256) for i in range(100)})
+        store.connection.execute("UPDATE embeddings SET last_access = 1")
+        store.connection.execute("UPDATE embeddings SET last_access = 10 WHERE key = ?", (get_document_key("model", "99"),))
+        store.max_size = store.get_size() // 2
+
+        store.evict()
+
+        count = store.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.assertLess(count, 100)
+        self.assertGreater(count, 0)
+        self.assertIsNotNone(store.connection.execute(
+            "SELECT 1 FROM embeddings WHERE key = ?", (get_document_key("model", "99"),)
+        ).fetchone())
+        store.close()
+
+    def test_warms_up_the_memo(self):
+        store = EmbeddingStore(self.path)
+        store.set_many("model", {"a": [1], "b": [2]})
+        store.close()
+
+        store = EmbeddingStore(self.path, memo_size=1)
+        store.warm_up()
+
+        self.assertEqual(len(store.memo.entries), 1)
+        self.assertEqual(next(iter(store.memo.entries.values())).dtype, np.float32)
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()